@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException, Query, status
@@ -10,12 +10,14 @@ from app.core.security import (
     create_access_token,
     create_email_verification_token,
     decode_token,
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
 )
 from app.db.mongo import collection
 from app.schemas.auth import LoginRequest, SignupRequest, TokenResponse, UserOut
-from app.services.emailer import send_verification_email, send_password_reset_email
+from app.services import user_cache
+from app.services import email_outbox
+from app.services.emailer import can_send_email
 from app.core.security import create_password_reset_token
 
 
@@ -40,13 +42,14 @@ async def signup(payload: SignupRequest):
         else:
             # Overwrite unverified user if they try to sign up again within the 5m TTL
             await users.delete_one({'_id': exists['_id']})
+            user_cache.invalidate(exists['_id'])
 
     doc = {
         'first_name': payload.first_name.strip(),
         'last_name': payload.last_name.strip(),
         'company_name': payload.company_name,
         'email': payload.email.lower(),
-        'password_hash': hash_password(payload.password),
+        'password_hash': await hash_password_async(payload.password),
         'email_verified': False,
         'evaluation_count': 0,
         'evaluation_limit': settings.DEFAULT_EVALUATION_LIMIT,
@@ -57,28 +60,21 @@ async def signup(payload: SignupRequest):
     verify_token = create_email_verification_token(user_id)
     verify_link = f"{settings.FRONTEND_URL}/verify-email?token={verify_token}"
 
-    error_msg = None
-    try:
-        email_sent = send_verification_email(doc['email'], verify_link)
-        if not email_sent:
-            error_msg = "Please ensure your SMTP settings (PORT, PASSWORD, etc.) are configured."
-    except Exception as exc:
-        email_sent = False
-        error_msg = str(exc)
-
-    if not email_sent:
+    if not can_send_email():
         # User requested the record be kept in DB for manual verification
         # just raise the HTTP error to the frontend.
+        error_msg = "Please ensure your SMTP settings (PORT, PASSWORD, etc.) are configured."
         raise HTTPException(status_code=400, detail=f"Failed to send verification email: {error_msg}")
 
-    await collection('email_logs').insert_one(
-        {
-            'user_id': user_id,
-            'email': doc['email'],
-            'verify_link': verify_link,
-            'email_sent': email_sent,
-            'created_at': datetime.now(timezone.utc),
-        }
+    # Delivery happens in the background sender; email_logs tracks its state (see /verification-preview).
+    # The link is useless once the unverified account has been deleted, so it is not sent or retried after that.
+    await email_outbox.enqueue(
+        'verification',
+        doc['email'],
+        verify_link,
+        user_id=user_id,
+        log_fields={'verify_link': verify_link},
+        deliver_by=doc['created_at'] + timedelta(seconds=settings.UNVERIFIED_USER_TTL_SECONDS),
     )
 
     token = create_access_token(user_id)
@@ -94,7 +90,8 @@ async def signup(payload: SignupRequest):
             'evaluation_count': doc['evaluation_count'],
             'evaluation_limit': doc['evaluation_limit'],
             'created_at': doc['created_at'],
-            'verification_email_sent': email_sent,
+            # Queued, not yet delivered: the background sender reports delivery in email_logs.
+            'verification_email_status': 'queued',
         },
     }
 
@@ -102,7 +99,7 @@ async def signup(payload: SignupRequest):
 @router.post('/login', response_model=TokenResponse)
 async def login(payload: LoginRequest):
     user = await collection('users').find_one({'email': payload.email.lower()})
-    if not user or not verify_password(payload.password, user['password_hash']):
+    if not user or not await verify_password_async(payload.password, user['password_hash']):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid credentials')
 
     user_id = str(user['_id'])
@@ -128,21 +125,17 @@ async def login(payload: LoginRequest):
 
 @router.get('/me', response_model=UserOut)
 async def get_me(current_user=Depends(get_current_user)):
-    user = await collection('users').find_one({'_id': ObjectId(current_user['id'])})
-    if not user:
-        raise HTTPException(status_code=404, detail='User not found')
-        
     return {
-        'id': str(user['_id']),
-        'first_name': user.get('first_name', ''),
-        'last_name': user.get('last_name', ''),
-        'company_name': user.get('company_name', ''),
-        'email': user['email'],
-        'email_verified': user.get('email_verified', False),
-        'evaluation_count': user.get('evaluation_count', 0),
-        'evaluation_limit': user.get('evaluation_limit', settings.DEFAULT_EVALUATION_LIMIT),
+        'id': current_user['id'],
+        'first_name': current_user.get('first_name', ''),
+        'last_name': current_user.get('last_name', ''),
+        'company_name': current_user.get('company_name', ''),
+        'email': current_user['email'],
+        'email_verified': current_user.get('email_verified', False),
+        'evaluation_count': current_user.get('evaluation_count', 0),
+        'evaluation_limit': current_user.get('evaluation_limit', settings.DEFAULT_EVALUATION_LIMIT),
         'support_email': settings.SUPPORT_EMAIL,
-        'created_at': user.get('created_at'),
+        'created_at': current_user.get('created_at'),
     }
 
 
@@ -157,6 +150,7 @@ async def verify_email(token: str = Query(...)):
         raise HTTPException(status_code=404, detail='User not found')
 
     await collection('users').update_one({'_id': result['_id']}, {'$set': {'email_verified': True}})
+    user_cache.invalidate(result['_id'])
     return {'message': 'Email verified successfully'}
 
 
@@ -164,6 +158,8 @@ async def verify_email(token: str = Query(...)):
 async def verification_preview(current_user=Depends(get_current_user)):
     cursor = collection('email_logs').find({'user_id': current_user['id']}).sort('created_at', -1)
     async for item in cursor:
+        if item.get('kind') == 'password_reset':
+            continue
         item['id'] = str(item.pop('_id'))
         return item
     raise HTTPException(status_code=404, detail='No verification email log found')
@@ -182,10 +178,14 @@ async def forgot_password(payload: ForgotPasswordRequest):
         user_id = str(user['_id'])
         reset_token = create_password_reset_token(user_id)
         reset_link = f"{settings.FRONTEND_URL}/reset-password?token={reset_token}"
-        try:
-            send_password_reset_email(user['email'], reset_link)
-        except Exception:
-            pass
+        if can_send_email():
+            await email_outbox.enqueue(
+                'password_reset',
+                user['email'],
+                reset_link,
+                user_id=user_id,
+                deliver_by=datetime.now(timezone.utc) + timedelta(minutes=settings.EMAIL_VERIFY_EXPIRE_MINUTES),
+            )
         await collection('password_resets').insert_one({
             'user_id': user_id,
             'token': reset_token,
@@ -204,9 +204,10 @@ async def reset_password(payload: ResetPasswordRequest):
     user = await collection('users').find_one({'_id': ObjectId(user_id)})
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
-    new_hash = hash_password(payload.new_password)
+    new_hash = await hash_password_async(payload.new_password)
     await collection('users').update_one(
         {'_id': user['_id']},
         {'$set': {'password_hash': new_hash, 'email_verified': True}}
     )
+    user_cache.invalidate(user['_id'])
     return {'message': 'Password reset successfully. You can now log in.'}
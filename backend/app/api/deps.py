@@ -1,21 +1,26 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from bson import ObjectId
 
-from app.core.security import decode_token
-from app.db.mongo import collection
+from app.services import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/api/auth/login')
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
-    payload = decode_token(token)
-    if not payload or 'sub' not in payload:
+    payload = user_cache.decode_access_token(token)
+    if not payload or 'sub' not in payload or not ObjectId.is_valid(payload['sub']):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid token')
 
-    user = await collection('users').find_one({'_id': ObjectId(payload['sub'])})
+    user = await user_cache.get_user(payload['sub'])
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User not found')
-
-    user['id'] = str(user.pop('_id'))
     return user
+
+
+def allow_cached_response(cache_control: str | None = Header(default=None)) -> bool:
+    """False when the client sent ``Cache-Control: no-cache`` (or ``no-store``)."""
+    if not cache_control:
+        return True
+    directives = {part.strip().lower() for part in cache_control.split(',')}
+    return not ({'no-cache', 'no-store'} & directives)
@@ -1,14 +1,27 @@
-import json
-from datetime import datetime, timezone
+import asyncio
+import base64
+from typing import Literal
+from datetime import date, datetime, time, timedelta, timezone
 
 from bson import ObjectId
 from bson.errors import InvalidId
-from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Form, Query, Response, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from app.api.deps import get_current_user
+from app.api.deps import allow_cached_response, get_current_user
 from app.core.config import settings
 from app.db.mongo import collection
-from app.services.mistral import call_agent
+from app.services import evaluation_jobs, quota, similarity
+from app.services.agent_cache import call_agent_cached
+from app.services.evaluation_bulk import apply_bulk
+from app.services.evaluation_export import gzip_stream, iter_csv, iter_ndjson, parse_fields
+from app.services.evaluation_payloads import RAW_FIELDS, delete_payload, load_payload, save_payload
+from app.services.evaluation_search import search_evaluations
+from app.services.evaluation_summary import build_summary
+from app.services.mistral import extract_content
+from app.services.rollups import ROLLUP_PROJECTION, record_evaluations
+from app.services.sop import SopDocument, SopLimitError, read_sop_document, run_in_pool
+from app.services.sop_compaction import compact_sop
 
 router = APIRouter(prefix='/api/evaluations', tags=['evaluations'])
 
@@ -38,49 +51,12 @@ def fallback_content(process_name, description, frequency, exception_rate, risk_
     }
 
 
-def extract_content(agent_json: dict):
+async def _read_sop_document(sop_file: UploadFile) -> SopDocument:
+    """Read an uploaded SOP file (PDF or TXT), mapping processing limits to HTTP errors."""
     try:
-        content = agent_json['choices'][0]['message']['content']
-        if isinstance(content, str):
-            text = content.strip()
-            if text.startswith('```'):
-                text = text.split('\n', 1)[1] if '\n' in text else text
-                if text.endswith('```'):
-                    text = text[:-3]
-                text = text.strip()
-            try:
-                parsed = json.loads(text)
-                if isinstance(parsed, dict):
-                    if 'process_characteristics' not in parsed and isinstance(parsed.get('dimensions'), dict):
-                        parsed['process_characteristics'] = parsed['dimensions']
-                    return parsed
-                return {'raw_text': content}
-            except json.JSONDecodeError:
-                return {'raw_text': content}
-        return content
-    except Exception:
-        return None
-
-
-async def _read_sop_text(sop_file: UploadFile) -> str:
-    """Read text content from an uploaded SOP file (PDF or TXT)."""
-    content_bytes = await sop_file.read()
-    filename = (sop_file.filename or '').lower()
-    if filename.endswith('.pdf'):
-        try:
-            import io
-            from PyPDF2 import PdfReader
-            reader = PdfReader(io.BytesIO(content_bytes))
-            pages_text = [page.extract_text() or '' for page in reader.pages]
-            return '\n'.join(pages_text).strip()
-        except Exception:
-            return ''
-    else:
-        # .txt or other text files
-        try:
-            return content_bytes.decode('utf-8', errors='replace').strip()
-        except Exception:
-            return ''
+        return await read_sop_document(sop_file)
+    except SopLimitError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
 
 
 @router.post('')
@@ -96,55 +72,51 @@ async def submit_evaluation(
     decision_points: str = Form(''),
     sop_file: UploadFile | None = File(None),
     current_user=Depends(get_current_user),
+    use_cache: bool = Depends(allow_cached_response),
+    mode: str = Query(default='sync', pattern='^(sync|job)$'),
+    reuse_similar: bool = Form(False),
 ):
-    # Enforce evaluation limits
-    users_col = collection('users')
-    user = await users_col.find_one({'_id': ObjectId(current_user['id'])})
-    if not user:
-        raise HTTPException(status_code=404, detail='User not found')
-    
-    evaluation_count = user.get('evaluation_count', 0)
-    evaluation_limit = user.get('evaluation_limit', 20)
-    if evaluation_count >= evaluation_limit:
-        raise HTTPException(status_code=403, detail='You have reached your evaluation limit.')
-
-    # Read SOP file content if provided
-    sop_text = ''
-    sop_metadata = None
-    if sop_file and sop_file.filename:
-        sop_text = await _read_sop_text(sop_file)
-        sop_metadata = {
-            'filename': sop_file.filename,
-            'content_type': sop_file.content_type or 'application/octet-stream',
-            'size': len(sop_text),
-        }
-
-    formatted = (
-        f"{process_name}\n"
-        f"{description}\n"
-        f"process_volume: {volume}\n"
-        f"process_frequency: {frequency}\n"
-        f"exception_rate: {exception_rate}%\n"
-        f"process_complexity: {complexity}\n"
-        f"risk_tolerance: {risk_tolerance}\n"
-        f"compliance_sensitivity: {compliance_sensitivity}\n"
-        f"decision_points: {decision_points}"
-    )
-    if sop_text:
-        formatted += f"\n\n--- SOP Document Content ---\n{sop_text}"
+    # Reserve one evaluation before any work; it is given back if nothing gets stored or queued.
+    async with quota.reserved(quota.EVALUATIONS, current_user):
+        # Read SOP file content if provided
+        sop_text = ''
+        sop_metadata = None
+        sop_compaction = None
+        if sop_file and sop_file.filename:
+            sop_document = await _read_sop_document(sop_file)
+            sop_text = sop_document.text
+            sop_metadata = {
+                'filename': sop_file.filename,
+                'content_type': sop_file.content_type or 'application/octet-stream',
+                'size': sop_document.size,
+                'sha256': sop_document.sha256,
+                'text_length': len(sop_text),
+            }
+            if sop_text:
+                try:
+                    compaction = await run_in_pool(
+                        compact_sop, sop_text, f'{process_name}\n{description}', settings.SOP_TOKEN_BUDGET
+                    )
+                except SopLimitError as exc:
+                    raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
+                sop_text = compaction.text
+                sop_compaction = compaction.as_metadata()
 
-    agent_response = None
-    content = None
-    try:
-        agent_response = await call_agent(settings.PROCESS_AGENT_ID, formatted)
-        content = extract_content(agent_response)
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail="The AI service is temporarily unavailable. Please try again later.") from exc
+        formatted = (
+            f"{process_name}\n"
+            f"{description}\n"
+            f"process_volume: {volume}\n"
+            f"process_frequency: {frequency}\n"
+            f"exception_rate: {exception_rate}%\n"
+            f"process_complexity: {complexity}\n"
+            f"risk_tolerance: {risk_tolerance}\n"
+            f"compliance_sensitivity: {compliance_sensitivity}\n"
+            f"decision_points: {decision_points}"
+        )
+        if sop_text:
+            formatted += f"\n\n--- SOP Document Content ---\n{sop_text}"
 
-    doc = {
-        'user_id': current_user['id'],
-        'process_name': process_name,
-        'submitted_payload': {
+        submitted_payload = {
             'process_name': process_name,
             'description': description,
             'volume': volume,
@@ -155,72 +127,361 @@ async def submit_evaluation(
             'compliance_sensitivity': compliance_sensitivity,
             'decision_points': decision_points,
             'sop_metadata': sop_metadata,
-        },
-        'formatted_message': formatted,
-        'agent_response': agent_response,
-        'parsed_content': content,
+        }
+
+        if reuse_similar:
+            # A near-identical earlier evaluation answers this one without an agent call.
+            reused = await _reuse_similar(current_user, submitted_payload, formatted, sop_compaction)
+            if reused is not None:
+                if mode == 'job':
+                    return JSONResponse(
+                        content={k: reused[k] for k in ('id', 'status', 'reused_from', 'similarity')}
+                    )
+                return reused
+
+        if mode == 'job':
+            # Job mode: persist now, let the worker pool call the agent, and report progress via /events.
+            if evaluation_jobs.is_full():
+                raise HTTPException(status_code=503, detail='Too many evaluations are queued. Please try again shortly.')
+            oid = ObjectId()
+            await save_payload(oid, current_user['id'], {'formatted_message': formatted})
+            doc = {
+                '_id': oid,
+                'user_id': current_user['id'],
+                'process_name': process_name,
+                'submitted_payload': submitted_payload,
+                'sop_compaction': sop_compaction,
+                'summary': build_summary(None),
+                'agent_error': None,
+                'status': 'Queued',
+                'is_shortlisted': False,
+                'created_at': datetime.now(timezone.utc),
+            }
+            await collection('evaluations').insert_one(doc)
+            evaluation_id = str(oid)
+            try:
+                evaluation_jobs.enqueue(evaluation_id, use_cache=use_cache)
+            except asyncio.QueueFull as exc:
+                # The queue filled up while the job was being stored; undo it (the quota is released on the way out).
+                await collection('evaluations').delete_one({'_id': oid})
+                await delete_payload(oid)
+                raise HTTPException(status_code=503, detail='Too many evaluations are queued. Please try again shortly.') from exc
+            return JSONResponse(status_code=202, content={'id': evaluation_id, 'status': 'Queued'})
+
+        try:
+            agent_response = await call_agent_cached(settings.PROCESS_AGENT_ID, formatted, use_cache=use_cache)
+            content = extract_content(agent_response)
+        except Exception as exc:
+            raise HTTPException(status_code=502, detail="The AI service is temporarily unavailable. Please try again later.") from exc
+
+        payload = {'formatted_message': formatted, 'agent_response': agent_response, 'parsed_content': content}
+        return await _store_completed(current_user, submitted_payload, sop_compaction, payload)
+
+
+# Bookkeeping of the job workers and rollups, never returned by the API.
+INTERNAL_FIELDS = ('in_rollups', 'started_at', 'completed_at', 'lease_id', 'lease_until')
+
+
+async def _store_completed(current_user: dict, submitted_payload: dict, sop_compaction, payload: dict, **extra) -> dict:
+    # Large blobs go to evaluation_payloads; the hot document only keeps what lists and dashboards read.
+    oid = ObjectId()
+    await save_payload(oid, current_user['id'], payload)
+    doc = {
+        '_id': oid,
+        'user_id': current_user['id'],
+        'process_name': submitted_payload['process_name'],
+        'submitted_payload': submitted_payload,
+        'sop_compaction': sop_compaction,
+        'summary': build_summary(payload['parsed_content']),
         'agent_error': None,
         'status': 'Completed',
         'is_shortlisted': False,
+        'in_rollups': True,
         'created_at': datetime.now(timezone.utc),
+        **extra,
     }
-    result = await collection('evaluations').insert_one(doc)
-    doc['id'] = str(result.inserted_id)
-    doc.pop('_id', None)
-    
-    # Increment user's evaluation count
-    await users_col.update_one(
-        {'_id': ObjectId(current_user['id'])},
-        {'$inc': {'evaluation_count': 1}}
-    )
-    
+    await collection('evaluations').insert_one(doc)
+    await record_evaluations([doc])
+    doc['id'] = str(doc.pop('_id'))
+    similarity.add(current_user['id'], doc['id'], submitted_payload['process_name'], submitted_payload['description'])
+    doc.pop('in_rollups')
+    doc.update(payload)
     return doc
 
 
+# Form inputs besides the text that go into the agent prompt; reuse requires them to be identical.
+REUSE_MATCH_FIELDS = (
+    'volume',
+    'frequency',
+    'exception_rate',
+    'complexity',
+    'risk_tolerance',
+    'compliance_sensitivity',
+    'decision_points',
+)
+
+
+def _sop_sha256(submitted_payload: dict | None):
+    return ((submitted_payload or {}).get('sop_metadata') or {}).get('sha256')
+
+
+def _same_inputs(prior_payload: dict | None, submitted_payload: dict) -> bool:
+    prior_payload = prior_payload or {}
+    if any(prior_payload.get(field) != submitted_payload.get(field) for field in REUSE_MATCH_FIELDS):
+        return False
+    # The SOP shapes the result too: only reuse when both used the same document (or none).
+    return _sop_sha256(prior_payload) == _sop_sha256(submitted_payload)
+
+
+async def _reuse_similar(current_user: dict, submitted_payload: dict, formatted: str, sop_compaction) -> dict | None:
+    matches = await similarity.find_similar(
+        current_user['id'], submitted_payload['process_name'], submitted_payload['description'], k=3
+    )
+    for evaluation_id, score in matches:
+        if score < settings.SIMILARITY_REUSE_THRESHOLD:
+            break
+        prior = await collection('evaluations').find_one({'_id': ObjectId(evaluation_id), 'user_id': current_user['id']})
+        if not prior or prior.get('status', 'Completed') not in similarity.REUSABLE_STATUSES:
+            continue
+        # Only the description may differ: scores computed for other inputs are not an answer.
+        if not _same_inputs(prior.get('submitted_payload'), submitted_payload):
+            continue
+        prior_payload = await load_payload(prior['_id'], prior)
+        if prior_payload.get('parsed_content') is None:
+            continue
+        payload = {
+            'formatted_message': formatted,
+            'agent_response': prior_payload.get('agent_response'),
+            'parsed_content': prior_payload['parsed_content'],
+        }
+        return await _store_completed(
+            current_user, submitted_payload, sop_compaction, payload,
+            reused_from=evaluation_id, similarity=round(score, 4),
+        )
+    return None
+
+
+LIST_PROJECTION = {
+    'process_name': 1,
+    'created_at': 1,
+    'status': 1,
+    'is_shortlisted': 1,
+    'summary': 1,
+}
+
+
+def _list_row(item: dict) -> dict:
+    summary = item.get('summary') or {}
+    return {
+        'id': str(item['_id']),
+        'process_name': item.get('process_name'),
+        'created_at': item.get('created_at'),
+        'automation_score': summary.get('automation_score'),
+        'feasibility_score': summary.get('feasibility_score'),
+        'fitment': summary.get('fitment'),
+        'llm_type': summary.get('llm_type'),
+        'status': item.get('status', 'Completed'),
+        'is_shortlisted': item.get('is_shortlisted', False),
+    }
+
+
+def _encode_cursor(item: dict) -> str:
+    raw = f"{item['created_at'].isoformat()}|{item['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        created_at, oid = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(created_at), ObjectId(oid)
+    except (ValueError, InvalidId) as exc:
+        raise HTTPException(status_code=400, detail='Invalid cursor') from exc
+
+
 @router.get('')
-async def my_evaluations(current_user=Depends(get_current_user)):
-    cursor = collection('evaluations').find({'user_id': current_user['id']}).sort('created_at', -1)
+async def my_evaluations(
+    response: Response,
+    current_user=Depends(get_current_user),
+    limit: int | None = Query(default=None, ge=1, le=200),
+    after: str | None = Query(default=None),
+    status: str | None = Query(default=None),
+    fitment: str | None = Query(default=None),
+    is_shortlisted: bool | None = Query(default=None),
+):
+    """List the user's evaluations, newest first.
+
+    With ``limit`` set, at most that many rows are returned and, when more
+    exist, ``X-Next-Cursor`` carries the value to pass as ``after`` for the
+    next page (keyset on ``created_at``, ``_id``).
+    """
+    query: dict = {'user_id': current_user['id']}
+    if status is not None:
+        query['status'] = status
+    if fitment is not None:
+        query['summary.fitment'] = fitment
+    if is_shortlisted is not None:
+        query['is_shortlisted'] = is_shortlisted
+    if after:
+        created_at, oid = _decode_cursor(after)
+        query['$or'] = [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': oid}},
+        ]
+
+    cursor = collection('evaluations').find(query, LIST_PROJECTION).sort([('created_at', -1), ('_id', -1)])
+    if limit is not None:
+        cursor = cursor.limit(limit + 1)
     rows = []
+    last = None
     async for item in cursor:
-        content = item.get('parsed_content') if isinstance(item.get('parsed_content'), dict) else {}
-        # feasibility_score can be a dict like { 'score': 65 } or a plain number
-        feas = content.get('business_benefit_score')
-        if isinstance(feas, dict):
-            feas = feas.get('score') or feas.get('value') or 0
-        # llm_type from recommendations
-        recs = content.get('recommendations') or {}
-        llm_type = recs.get('llm_recommendation') or recs.get('llm_type')
-        rows.append(
-            {
-                'id': str(item['_id']),
-                'process_name': item.get('process_name'),
-                'created_at': item.get('created_at'),
-                'automation_score': content.get('automation_feasibility_score'),
-                'feasibility_score': feas,
-                'fitment': content.get('fitment'),
-                'llm_type': llm_type,
-                'status': item.get('status', 'Completed'),
-                'is_shortlisted': item.get('is_shortlisted', False),
-            }
-        )
+        if limit is not None and len(rows) == limit:
+            response.headers['X-Next-Cursor'] = _encode_cursor(last)
+            break
+        last = item
+        rows.append(_list_row(item))
     return rows
 
 
+@router.get('/search')
+async def search(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    current_user=Depends(get_current_user),
+):
+    """Rank the user's evaluations against ``q`` (Mongo ``$search`` syntax: terms, "phrases", -exclusions)."""
+    return await search_evaluations(current_user['id'], q, limit)
+
+
+EXPORT_MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+@router.get('/export')
+async def export_evaluations(
+    current_user=Depends(get_current_user),
+    format: str = Query(default='ndjson', pattern='^(ndjson|csv)$'),
+    fields: str | None = Query(default=None),
+    start: date | None = Query(default=None, alias='from'),
+    end: date | None = Query(default=None, alias='to'),
+    is_shortlisted: bool | None = Query(default=None),
+    gzip: bool = Query(default=False),
+):
+    """Stream all of the user's evaluations, newest first, as NDJSON or CSV.
+
+    ``fields`` is a comma-separated subset of the export columns; ``from`` and
+    ``to`` are inclusive UTC dates. ``gzip=true`` compresses the stream.
+    """
+    try:
+        columns = parse_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    query: dict = {'user_id': current_user['id']}
+    created_at: dict = {}
+    if start:
+        created_at['$gte'] = datetime.combine(start, time.min, timezone.utc)
+    if end:
+        created_at['$lt'] = datetime.combine(end + timedelta(days=1), time.min, timezone.utc)
+    if created_at:
+        query['created_at'] = created_at
+    if is_shortlisted is not None:
+        query['is_shortlisted'] = is_shortlisted
+
+    body = iter_csv(query, columns) if format == 'csv' else iter_ndjson(query, columns)
+    filename = f'evaluations.{format}'
+    media_type = EXPORT_MEDIA_TYPES[format]
+    if gzip:
+        body = gzip_stream(body)
+        filename += '.gz'
+        media_type = 'application/gzip'
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
 
 @router.get('/{evaluation_id}')
-async def get_evaluation(evaluation_id: str, current_user=Depends(get_current_user)):
+async def get_evaluation(
+    evaluation_id: str,
+    current_user=Depends(get_current_user),
+    include: str | None = Query(default=None, pattern='^raw$'),
+):
+    """Return one evaluation with its ``parsed_content``.
+
+    ``?include=raw`` also returns the raw ``agent_response`` and the
+    ``formatted_message`` sent to the agent.
+    """
     try:
         oid = ObjectId(evaluation_id)
     except InvalidId as exc:
         raise HTTPException(status_code=400, detail='Invalid evaluation id') from exc
 
-    item = await collection('evaluations').find_one({'_id': oid, 'user_id': current_user['id']})
+    item = await collection('evaluations').find_one(
+        {'_id': oid, 'user_id': current_user['id']}, {field: 0 for field in INTERNAL_FIELDS}
+    )
     if not item:
         raise HTTPException(status_code=404, detail='Evaluation not found')
+    payload = await load_payload(oid, item)
+    item['parsed_content'] = payload.get('parsed_content')
+    for field in RAW_FIELDS:
+        # Evaluations stored before the payload split carry these inline; only return them on request.
+        if include == 'raw':
+            item[field] = payload.get(field)
+        else:
+            item.pop(field, None)
     item['id'] = str(item.pop('_id'))
     return item
 
 
+@router.get('/{evaluation_id}/events')
+async def evaluation_events(evaluation_id: str, current_user=Depends(get_current_user)):
+    """Server-sent events stream of status changes for a job-mode evaluation."""
+    try:
+        oid = ObjectId(evaluation_id)
+    except InvalidId as exc:
+        raise HTTPException(status_code=400, detail='Invalid evaluation id') from exc
+
+    item = await collection('evaluations').find_one({'_id': oid, 'user_id': current_user['id']})
+    if not item:
+        raise HTTPException(status_code=404, detail='Evaluation not found')
+
+    return StreamingResponse(
+        evaluation_jobs.status_events(evaluation_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.get('/{evaluation_id}/similar')
+async def similar_evaluations(
+    evaluation_id: str,
+    current_user=Depends(get_current_user),
+    k: int = Query(default=5, ge=1, le=50),
+):
+    """The user's completed evaluations most similar to this one, with their cosine similarity."""
+    try:
+        oid = ObjectId(evaluation_id)
+    except InvalidId as exc:
+        raise HTTPException(status_code=400, detail='Invalid evaluation id') from exc
+
+    item = await collection('evaluations').find_one({'_id': oid, 'user_id': current_user['id']})
+    if not item:
+        raise HTTPException(status_code=404, detail='Evaluation not found')
+
+    description = (item.get('submitted_payload') or {}).get('description')
+    matches = await similarity.find_similar(
+        current_user['id'], item.get('process_name'), description, k=k, exclude_id=evaluation_id
+    )
+    scores = dict(matches)
+    cursor = collection('evaluations').find(
+        {'_id': {'$in': [ObjectId(match_id) for match_id in scores]}, 'user_id': current_user['id']},
+        LIST_PROJECTION,
+    )
+    rows = [{**_list_row(doc), 'similarity': round(scores[str(doc['_id'])], 4)} async for doc in cursor]
+    rows.sort(key=lambda row: -row['similarity'])
+    return rows
+
+
 @router.delete('/{evaluation_id}')
 async def delete_evaluation(evaluation_id: str, current_user=Depends(get_current_user)):
     try:
@@ -228,48 +489,46 @@ async def delete_evaluation(evaluation_id: str, current_user=Depends(get_current
     except InvalidId as exc:
         raise HTTPException(status_code=400, detail='Invalid evaluation id') from exc
 
-    result = await collection('evaluations').delete_one({'_id': oid, 'user_id': current_user['id']})
-    if result.deleted_count == 0:
+    item = await collection('evaluations').find_one_and_delete(
+        {'_id': oid, 'user_id': current_user['id']}, projection=ROLLUP_PROJECTION
+    )
+    if item is None:
         raise HTTPException(status_code=404, detail='Evaluation not found or not authorized')
+    await delete_payload(oid)
+    similarity.remove(current_user['id'], evaluation_id)
+    if item.get('in_rollups'):
+        await record_evaluations([item], sign=-1)
     return {'message': 'Evaluation deleted successfully'}
 
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class ShortlistRequest(BaseModel):
-    evaluation_ids: list[str]
+    evaluation_ids: list[str] = Field(max_length=settings.BULK_MAX_IDS)
     shortlist_status: bool
 
+
+class BulkRequest(BaseModel):
+    action: Literal['shortlist', 'unshortlist', 'delete']
+    evaluation_ids: list[str] = Field(min_length=1, max_length=settings.BULK_MAX_IDS)
+
+
 @router.put('/shortlist')
 async def update_shortlist_status(payload: ShortlistRequest, current_user=Depends(get_current_user)):
-    try:
-        oids = [ObjectId(eid) for eid in payload.evaluation_ids]
-    except InvalidId as exc:
-        raise HTTPException(status_code=400, detail='One or more invalid evaluation ids') from exc
-
-    # Check if any of these evaluations are already shortlisted
-    existing = await collection('evaluations').find(
-        {'_id': {'$in': oids}, 'user_id': current_user['id'], 'is_shortlisted': True}
-    ).to_list(length=1)
-    
-    if existing:
-        raise HTTPException(status_code=400, detail='This evaluation is already shortlisted.')
-
-    result = await collection('evaluations').update_many(
-        {
-            '_id': {'$in': oids},
-            'user_id': current_user['id']
-        },
-        {
-            '$set': {
-                'is_shortlisted': True,
-                'status': 'Shortlisted'
-            }
-        }
-    )
-    
-    if result.matched_count == 0:
+    if not all(ObjectId.is_valid(eid) for eid in payload.evaluation_ids):
+        raise HTTPException(status_code=400, detail='One or more invalid evaluation ids')
+
+    action = 'shortlist' if payload.shortlist_status else 'unshortlist'
+    result = await apply_bulk(current_user['id'], action, payload.evaluation_ids)
+    counts = result['counts']
+    if counts.get('not_found') == len(result['results']):
         raise HTTPException(status_code=404, detail='No evaluations found or not authorized')
-        
-    return {'message': f'Shortlist status updated for {result.modified_count} evaluations'}
 
+    updated = counts.get('shortlisted' if payload.shortlist_status else 'unshortlisted', 0)
+    return {'message': f'Shortlist status updated for {updated} evaluations'}
+
+
+@router.post('/bulk')
+async def bulk_update(payload: BulkRequest, current_user=Depends(get_current_user)):
+    """Shortlist, unshortlist or delete up to ``BULK_MAX_IDS`` evaluations; reports an outcome per id."""
+    return await apply_bulk(current_user['id'], payload.action, payload.evaluation_ids)
@@ -3,10 +3,11 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
-from app.api.deps import get_current_user
+from app.api.deps import allow_cached_response, get_current_user
 from app.core.config import settings
 from app.db.mongo import collection
-from app.services.mistral import call_agent
+from app.services import quota
+from app.services.agent_cache import call_agent_cached
 
 router = APIRouter(prefix='/api/use-cases', tags=['use-cases'])
 
@@ -22,12 +23,17 @@ class CompanyRequest(BaseModel):
 
 
 @router.post('/domain')
-async def discover_domain(payload: DomainRequest, current_user=Depends(get_current_user)):
+async def discover_domain(
+    payload: DomainRequest,
+    current_user=Depends(get_current_user),
+    use_cache: bool = Depends(allow_cached_response),
+):
     message = f'domain: {payload.domain},user_role: {payload.user_role},objective: {payload.objective}'
-    try:
-        response = await call_agent(settings.USE_CASE_AGENT_ID, message)
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail="The AI service is temporarily unavailable. Please try again later.") from exc
+    async with quota.reserved(quota.USE_CASES, current_user):
+        try:
+            response = await call_agent_cached(settings.USE_CASE_AGENT_ID, message, use_cache=use_cache)
+        except Exception as exc:
+            raise HTTPException(status_code=502, detail="The AI service is temporarily unavailable. Please try again later.") from exc
         
     doc = {
         'user_id': current_user['id'],
@@ -44,11 +50,16 @@ async def discover_domain(payload: DomainRequest, current_user=Depends(get_curre
 
 
 @router.post('/company')
-async def discover_company(payload: CompanyRequest, current_user=Depends(get_current_user)):
-    try:
-        response = await call_agent(settings.COMPANY_USE_CASE_AGENT_ID, payload.company_name)
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail="The AI service is temporarily unavailable. Please try again later.") from exc
+async def discover_company(
+    payload: CompanyRequest,
+    current_user=Depends(get_current_user),
+    use_cache: bool = Depends(allow_cached_response),
+):
+    async with quota.reserved(quota.USE_CASES, current_user):
+        try:
+            response = await call_agent_cached(settings.COMPANY_USE_CASE_AGENT_ID, payload.company_name, use_cache=use_cache)
+        except Exception as exc:
+            raise HTTPException(status_code=502, detail="The AI service is temporarily unavailable. Please try again later.") from exc
         
     doc = {
         'user_id': current_user['id'],
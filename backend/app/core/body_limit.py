@@ -0,0 +1,47 @@
+"""Request body size limit, enforced before a body is parsed.
+
+Starlette receives and spools a whole multipart body before a route sees its
+``UploadFile``, so a cap applied while reading the upload only limits what is
+processed, not what the server accepts. This middleware refuses bodies with a
+``Content-Length`` over the limit without reading them, and stops chunked
+bodies as soon as they cross it.
+"""
+
+from __future__ import annotations
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _detail(self) -> str:
+        return f'Request body exceeds the limit of {self.max_bytes} bytes.'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope['headers']).get(b'content-length')
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse(status_code=413, content={'detail': self._detail()}, headers={'Connection': 'close'})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    # Raised inside body parsing, so the app's exception handling turns it into a 413 response.
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
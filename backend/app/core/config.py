@@ -16,13 +16,76 @@ class Settings(BaseSettings):
     COMPANY_USE_CASE_AGENT_ID: str
     FRONTEND_URL: str = 'http://localhost:5173'
     DEFAULT_EVALUATION_LIMIT: int = 20
+    DEFAULT_USE_CASE_LIMIT: int | None = None
     SUPPORT_EMAIL: str = 'support@avagama.com'
     EMAIL_VERIFY_EXPIRE_MINUTES: int = 1440
+    # Unverified accounts are deleted this long after signup (TTL index on users.created_at)
+    UNVERIFIED_USER_TTL_SECONDS: int = 300
     SMTP_HOST: str | None = None
     SMTP_PORT: int = 587
     SMTP_USERNAME: str | None = None
     SMTP_PASSWORD: str | None = None
     SMTP_FROM: str | None = None
+    SMTP_USE_TLS: bool = True
+    SMTP_TIMEOUT_SECONDS: float = 10.0
+    SMTP_IDLE_SECONDS: float = 60.0
+    EMAIL_BATCH_SIZE: int = 20
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: float = 30.0
+    EMAIL_RETRY_MAX_SECONDS: float = 3600.0
+    EMAIL_POLL_SECONDS: float = 5.0
+    EMAIL_CLAIM_SECONDS: float = 300.0
+    # Sent and failed outbox messages are deleted this long after they finish (email_logs keeps the history)
+    EMAIL_OUTBOX_RETENTION_SECONDS: int = 7 * 24 * 3600
+    MISTRAL_MAX_CONNECTIONS: int = 100
+    MISTRAL_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    MISTRAL_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    MISTRAL_HTTP2: bool = False
+    MISTRAL_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    MISTRAL_READ_TIMEOUT_SECONDS: float = 300.0
+    MISTRAL_WRITE_TIMEOUT_SECONDS: float = 30.0
+    MISTRAL_POOL_TIMEOUT_SECONDS: float = 30.0
+    # Comma-separated agent ids whose responses may be cached ('*' caches every agent)
+    AGENT_CACHE_AGENTS: str = ''
+    AGENT_CACHE_TTL_SECONDS: int = 86400
+    AGENT_CACHE_MAX_ENTRIES: int = 256
+    EVALUATION_WORKERS: int = 4
+    EVALUATION_QUEUE_SIZE: int = 100
+    EVALUATION_EVENTS_POLL_SECONDS: float = 5.0
+    # How long a worker owns a claimed job; a Running job past its lease is picked up again
+    EVALUATION_JOB_LEASE_SECONDS: float = 900.0
+    # How often each process looks for Running jobs whose lease ran out
+    EVALUATION_REQUEUE_INTERVAL_SECONDS: float = 60.0
+    SOP_EXTRACT_WORKERS: int = 2
+    SOP_MAX_PAGES: int = 500
+    SOP_PAGES_PER_CHUNK: int = 25
+    SOP_CPU_LIMIT_SECONDS: float = 30.0
+    # Wall-clock limit for extracting one PDF; workers still busy past it are killed and the pool restarted
+    SOP_EXTRACT_TIMEOUT_SECONDS: float = 60.0
+    SOP_MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    # Whole request bodies above this are refused before they are read (must leave room for the SOP plus form fields)
+    MAX_REQUEST_BODY_BYTES: int = 21 * 1024 * 1024
+    SOP_READ_CHUNK_BYTES: int = 64 * 1024
+    SOP_SPOOL_DIR: str | None = None
+    SOP_TEXT_CACHE_ENTRIES: int = 32
+    # Approximate token budget for SOP text in the agent prompt (0 disables compaction)
+    SOP_TOKEN_BUDGET: int = 6000
+    DASHBOARD_CACHE_ENTRIES: int = 2048
+    USER_CACHE_ENTRIES: int = 4096
+    TOKEN_CACHE_ENTRIES: int = 8192
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    # Serve cache and executor stats at /metrics; they are unauthenticated, so only enable behind a private network
+    METRICS_ENABLED: bool = False
+    SIMILARITY_DIMENSIONS: int = 1024
+    SIMILARITY_MAX_USERS: int = 256
+    SIMILARITY_REUSE_THRESHOLD: float = 0.97
+    BULK_MAX_IDS: int = 200
+    # Data directory for the in-memory backend (MONGO_URI=memory://); unset keeps it purely in memory
+    MEMORY_DB_PATH: str | None = None
+    MEMORY_DB_COMMIT_WINDOW_MS: float = 2.0
+    MEMORY_DB_SNAPSHOT_OPS: int = 50000
 
 
 settings = Settings()
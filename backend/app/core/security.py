@@ -1,5 +1,8 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
+from fastapi import HTTPException
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
@@ -7,6 +10,11 @@ from app.core.config import settings
 
 pwd_context = CryptContext(schemes=['pbkdf2_sha256'], deprecated='auto')
 
+# Key derivation is CPU-bound (hashlib releases the GIL while it runs), so request
+# handlers run it on a small dedicated pool instead of blocking the event loop.
+_hash_executor: ThreadPoolExecutor | None = None
+_hash_pending = 0
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -16,6 +24,52 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash'
+        )
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def _run_hashing(fn, *args):
+    global _hash_pending
+    # Shed load instead of queueing without bound: past the limit, a fast 503 beats a timeout.
+    if _hash_pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=503, detail='Too many sign-in requests. Please try again shortly.', headers={'Retry-After': '1'}
+        )
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_executor(), fn, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+def hash_executor_stats() -> dict:
+    return {
+        'workers': settings.PASSWORD_HASH_WORKERS,
+        'max_pending': settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE,
+        'pending': _hash_pending,
+    }
+
+
 def create_access_token(subject: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.JWT_EXPIRE_MINUTES)
     payload = {'sub': subject, 'exp': expire, 'type': 'access'}
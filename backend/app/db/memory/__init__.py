@@ -0,0 +1,77 @@
+"""In-process stand-in for the Motor database, used when MongoDB is unreachable and in load tests."""
+
+import os
+
+from app.db.memory.collection import InMemoryCollection
+from app.db.memory.cursor import InMemoryCursor  # noqa: F401
+from app.db.memory.persistence import Journal, load_snapshot, replay_log
+from app.db.memory.results import (  # noqa: F401
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+
+class InMemoryDB:
+    """Collections by name; with ``path`` set, every write is journaled to that directory and reloaded on start."""
+
+    def __init__(self, path: str | None = None, commit_window: float = 0.002, snapshot_ops: int = 50_000):
+        self._cols: dict[str, InMemoryCollection] = {}
+        self._journal: Journal | None = None
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            snapshot_lsn, collections = load_snapshot(path)
+            for meta, docs in collections:
+                self[meta['name']].load(docs, [(spec['keys'], spec['options']) for spec in meta['indexes']])
+            lsn = replay_log(path, snapshot_lsn, self._replay)
+            self._journal = Journal(path, lsn, commit_window, snapshot_ops, self._capture)
+            self._journal.ops_since_snapshot = lsn - snapshot_lsn
+            for collection in self._cols.values():
+                collection._journal = self._journal
+
+    def _replay(self, record: dict) -> None:
+        if record['op'] == 'drop_collection':
+            self._cols.pop(record['c'], None)
+        else:
+            self[record['c']].apply_logged(record)
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._cols:
+            self._cols[name] = InMemoryCollection(name, self._journal)
+        return self._cols[name]
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        # Attribute access (db.users) like Motor, so init_db also runs against this backend.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self) -> list[str]:
+        return list(self._cols)
+
+    async def drop_collection(self, name: str) -> None:
+        if self._cols.pop(name, None) is not None and self._journal is not None:
+            self._journal.append({'op': 'drop_collection', 'c': name})
+            await self._journal.commit()
+
+    def _capture(self) -> list[dict]:
+        return [collection.snapshot() for collection in self._cols.values()]
+
+    async def snapshot(self) -> None:
+        """Write a snapshot now and drop the log segments it covers."""
+        if self._journal is not None:
+            await self._journal.snapshot()
+
+    async def close(self) -> None:
+        if self._journal is not None:
+            await self._journal.close()
+            self._journal = None
+            for collection in self._cols.values():
+                collection._journal = None
+
+    def journal_stats(self) -> dict | None:
+        if self._journal is None:
+            return None
+        return {**self._journal.stats, 'lsn': self._journal.lsn, 'ops_since_snapshot': self._journal.ops_since_snapshot}
@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import functools
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Iterator
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, WriteError
+
+from app.db.memory.cursor import InMemoryCursor, normalize_sort, project, sort_documents
+from app.db.memory.indexes import Index, plan
+from app.db.memory.query import is_operator_dict, matches
+from app.db.memory.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+from app.db.memory.update import apply_update, seed_from_query, validate_replacement, validate_update
+from app.db.memory.values import MISSING, clone, get_field, sort_key, type_rank, values_equal
+from app.db.text_index import TextIndex
+
+# Mongo's TTL monitor runs once a minute; expired documents here go at most this long after their deadline.
+TTL_SWEEP_SECONDS = 1.0
+
+
+def _index_keys(keys) -> list[tuple[str, Any]]:
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    if isinstance(keys, dict):
+        return list(keys.items())
+    return [(key, 1) if isinstance(key, str) else tuple(key) for key in keys]
+
+
+def _durable(method):
+    """Wait for the operation log to be on disk before a write returns, when the database is durable."""
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            if self._journal is not None:
+                await self._journal.commit()
+
+    return wrapper
+
+
+class InMemoryCollection:
+    """A Motor-compatible collection held in process memory.
+
+    Documents live in a dict keyed by ``sort_key(_id)``. Reads go through the
+    planner in ``indexes`` and are re-checked by the query matcher; every
+    method runs without awaiting, so each call is atomic with respect to other
+    coroutines, like a single-document operation in Mongo.
+
+    Stored documents are never modified in place: writes store a new image
+    that shares unchanged subtrees with the old one. Reads therefore hand out
+    shallow copies, whose nested values belong to the store and must be
+    treated as read-only, as ``user_cache`` does with its cached users.
+    """
+
+    def __init__(self, name: str = '', journal=None):
+        self.name = name
+        self._docs: dict[tuple, dict] = {}
+        self._indexes: dict[str, Index] = {'_id_': Index('_id_', [('_id', 1)], unique=True)}
+        # name -> (keys, options) as passed to create_index, replayed from snapshots and the log
+        self._index_specs: dict[str, tuple[list, dict]] = {}
+        self.text_index: TextIndex | None = None
+        self._text_index_name: str | None = None
+        self._swept_at = 0.0
+        self._journal = journal
+
+    def _log(self, record: dict) -> None:
+        if self._journal is not None:
+            self._journal.append({'c': self.name, **record})
+
+    def _create_index(self, keys: list, options: dict) -> str:
+        keys = _index_keys(keys)
+        name = options.get('name') or '_'.join(f'{field}_{direction}' for field, direction in keys)
+        if any(direction == 'text' for _field, direction in keys):
+            if self._text_index_name == name:
+                return name
+            if self._text_index_name is not None:
+                raise OperationFailure('only one text index per collection is allowed', code=85)
+            self.text_index = TextIndex([field for field, direction in keys if direction == 'text'], options.get('weights'))
+            self._text_index_name = name
+            for doc in self._docs.values():
+                self.text_index.add(doc)
+        else:
+            if name in self._indexes:
+                return name
+            partial = options.get('partialFilterExpression')
+            if options.get('sparse'):
+                exists = {field: {'$exists': True} for field, _direction in keys}
+                partial = {'$and': [partial, exists]} if partial else exists
+            index = Index(name, keys, bool(options.get('unique')), partial, options.get('expireAfterSeconds'))
+            index.build(self._docs)
+            if index.has_duplicates():
+                raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} index: {name}', 11000)
+            self._indexes[name] = index
+        self._index_specs[name] = ([list(key) for key in keys], options)
+        self._log({'op': 'index', 'keys': [list(key) for key in keys], 'options': options})
+        return name
+
+    @_durable
+    async def create_index(self, keys, **kwargs) -> str:
+        return self._create_index(keys, kwargs)
+
+    def _drop_index(self, name: str) -> None:
+        if name == self._text_index_name:
+            self.text_index = self._text_index_name = None
+        elif name == '_id_' or self._indexes.pop(name, None) is None:
+            raise OperationFailure(f'index not found with name [{name}]', code=27)
+        self._index_specs.pop(name, None)
+        self._log({'op': 'drop_index', 'name': name})
+
+    @_durable
+    async def drop_index(self, name: str) -> None:
+        self._drop_index(name)
+
+    async def index_information(self) -> dict:
+        info = {}
+        for index in self._indexes.values():
+            entry: dict = {'key': index.keys}
+            if index.unique and index.name != '_id_':
+                entry['unique'] = True
+            if index.partial_filter is not None:
+                entry['partialFilterExpression'] = index.partial_filter
+            if index.expire_after_seconds is not None:
+                entry['expireAfterSeconds'] = index.expire_after_seconds
+            info[index.name] = entry
+        if self.text_index is not None:
+            info[self._text_index_name] = {'key': [(field, 'text') for field in self.text_index.fields]}
+        return info
+
+    def _check_unique(self, doc: dict, doc_key: tuple) -> None:
+        for index in self._indexes.values():
+            if index.conflicts(doc, doc_key):
+                dup = {field: get_field(doc, field) for field in index.fields}
+                raise DuplicateKeyError(
+                    f'E11000 duplicate key error collection: {self.name} index: {index.name} dup key: {dup}', 11000
+                )
+
+    def _store(self, doc_key: tuple, doc: dict) -> None:
+        self._log({'op': 'put', 'd': doc})
+        self._docs[doc_key] = doc
+        for index in self._indexes.values():
+            index.add(doc_key, doc)
+        if self.text_index is not None:
+            self.text_index.add(doc)
+
+    def _unstore(self, doc_key: tuple, logged: bool = True) -> dict:
+        doc = self._docs.pop(doc_key)
+        if logged:
+            self._log({'op': 'del', 'id': doc['_id']})
+        for index in self._indexes.values():
+            index.remove(doc_key)
+        if self.text_index is not None:
+            self.text_index.remove(doc['_id'])
+        return doc
+
+    def _insert(self, doc: dict) -> None:
+        doc_key = sort_key(doc['_id'])
+        self._check_unique(doc, doc_key)
+        self._store(doc_key, doc)
+
+    def _replace_stored(self, old: dict, new: dict) -> bool:
+        if sort_key(new) == sort_key(old):
+            return False
+        doc_key = sort_key(old['_id'])
+        self._check_unique(new, doc_key)
+        # The logged put of the new image replaces the old one on replay.
+        self._unstore(doc_key, logged=False)
+        self._store(doc_key, new)
+        return True
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        if now - self._swept_at < TTL_SWEEP_SECONDS:
+            return
+        self._swept_at = now
+        for index in list(self._indexes.values()):
+            if index.expire_after_seconds is None or len(index.fields) != 1:
+                continue
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=index.expire_after_seconds)
+            expired = [
+                doc_key
+                for doc_key in index.scan((), (type_rank(cutoff),), True, sort_key(cutoff), True)
+                if isinstance(get_field(self._docs[doc_key], index.fields[0]), datetime)
+            ]
+            for doc_key in expired:
+                self._unstore(doc_key)
+
+    def _candidates(self, query: dict):
+        _id = query.get('_id', MISSING)
+        if _id is not MISSING and not isinstance(_id, (dict, list, re.Pattern)):
+            return [sort_key(_id)]
+        if is_operator_dict(_id) and set(_id) == {'$in'}:
+            return list(dict.fromkeys(sort_key(value) for value in _id['$in']))
+        return plan(self._indexes.values(), query)
+
+    def _matching(self, query: dict | None) -> tuple[Iterator[dict], dict | None]:
+        """Stream the stored documents matching ``query`` (not copies), plus the text scores for ``$text`` queries.
+
+        Candidate keys are fixed up front and documents are looked up as the
+        stream is consumed, so a cursor read between other coroutines' writes
+        skips deleted documents and sees current images.
+        """
+        self._expire()
+        query = query or {}
+        scores = None
+        if '$text' in query:
+            if self.text_index is None:
+                raise OperationFailure('text index required for $text query', code=27)
+            scores = self.text_index.search(query['$text']['$search'])
+            keys = [sort_key(_id) for _id in scores]
+        else:
+            keys = self._candidates(query)
+            keys = list(self._docs) if keys is None else list(keys)
+        docs = (self._docs.get(key) for key in keys)
+        return (doc for doc in docs if doc is not None and matches(doc, query)), scores
+
+    def _select(self, query: dict | None, limit: int = 0) -> tuple[list[dict], dict | None]:
+        docs, scores = self._matching(query)
+        return list(islice(docs, limit or None)), scores
+
+    def _select_one(self, query: dict | None, sort=None) -> dict | None:
+        if sort:
+            docs, scores = self._matching(query)
+            docs = sort_documents(docs, normalize_sort(sort), scores, 1)
+        else:
+            docs, _scores = self._select(query, limit=1)
+        return docs[0] if docs else None
+
+    def find(self, filter: dict | None = None, projection: Any = None, **kwargs) -> InMemoryCursor:
+        cursor = InMemoryCursor(self, filter, projection)
+        if kwargs.get('sort'):
+            cursor.sort(kwargs['sort'])
+        if kwargs.get('skip'):
+            cursor.skip(kwargs['skip'])
+        if kwargs.get('limit'):
+            cursor.limit(kwargs['limit'])
+        return cursor
+
+    async def find_one(self, filter: Any = None, projection: Any = None, **kwargs) -> dict | None:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        cursor = self.find(filter, projection, **kwargs).limit(1)
+        docs = await cursor.to_list(length=1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter: dict, skip: int = 0, limit: int = 0, **kwargs) -> int:
+        docs = self._matching(filter)[0]
+        return sum(1 for _doc in islice(docs, skip, skip + limit if limit else None))
+
+    @_durable
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        # Like pymongo, the caller's document gets the generated _id.
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        self._insert(clone(document))
+        return InsertOneResult(inserted_id=document['_id'])
+
+    @_durable
+    async def insert_many(self, documents, ordered: bool = True, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        await self.bulk_write([InsertOne(document) for document in documents], ordered=ordered)
+        return InsertManyResult(inserted_ids=[document['_id'] for document in documents])
+
+    def _upsert(self, filter: dict, update: dict, replace: bool) -> Any:
+        seed = seed_from_query(filter)
+        if replace:
+            validate_replacement(update)
+            doc = clone(update)
+        else:
+            doc = seed
+            apply_update(doc, update, inserting=True)
+        _id = doc.pop('_id', seed.get('_id', MISSING))
+        doc = {'_id': ObjectId() if _id is MISSING else _id, **doc}
+        self._insert(doc)
+        return doc['_id']
+
+    def _modified(self, doc: dict, update: dict, replace: bool) -> dict:
+        if not replace:
+            new = dict(doc)
+            apply_update(new, update)
+            return new
+        validate_replacement(update)
+        if '_id' in update and not values_equal(update['_id'], doc['_id']):
+            raise WriteError("After applying the update, the (immutable) field '_id' was found to have been altered", code=66)
+        return {'_id': doc['_id'], **{key: clone(value) for key, value in update.items() if key != '_id'}}
+
+    def _update(self, filter: dict, update: dict, upsert: bool, multi: bool, replace: bool = False) -> UpdateResult:
+        if replace:
+            validate_replacement(update)
+        else:
+            validate_update(update)
+        docs = self._select(filter, limit=0 if multi else 1)[0]
+        result = UpdateResult(matched_count=len(docs))
+        for doc in docs:
+            if self._replace_stored(doc, self._modified(doc, update, replace)):
+                result.modified_count += 1
+        if not docs and upsert:
+            result.upserted_id = self._upsert(filter, update, replace)
+        return result
+
+    @_durable
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, update, upsert, multi=False)
+
+    @_durable
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, update, upsert, multi=True)
+
+    @_durable
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, replacement, upsert, multi=False, replace=True)
+
+    def _delete(self, filter: dict, multi: bool) -> DeleteResult:
+        docs = self._select(filter, limit=0 if multi else 1)[0]
+        for doc in docs:
+            self._unstore(sort_key(doc['_id']))
+        return DeleteResult(deleted_count=len(docs))
+
+    @_durable
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        return self._delete(filter, multi=False)
+
+    @_durable
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        return self._delete(filter, multi=True)
+
+    def _find_and_modify(self, filter, update, replace, projection, sort, upsert, return_document) -> dict | None:
+        if replace:
+            validate_replacement(update)
+        else:
+            validate_update(update)
+        doc = self._select_one(filter, sort)
+        if doc is None:
+            if not upsert:
+                return None
+            _id = self._upsert(filter, update, replace)
+            return project(self._docs[sort_key(_id)], projection) if return_document else None
+        new = self._modified(doc, update, replace)
+        self._replace_stored(doc, new)
+        return project(new if return_document else doc, projection)
+
+    @_durable
+    async def find_one_and_update(
+        self, filter: dict, update: dict, projection: Any = None, sort=None, upsert: bool = False,
+        return_document: bool = False, **kwargs,
+    ) -> dict | None:
+        return self._find_and_modify(filter, update, False, projection, sort, upsert, return_document)
+
+    @_durable
+    async def find_one_and_delete(self, filter: dict, projection: Any = None, sort=None, **kwargs) -> dict | None:
+        doc = self._select_one(filter, sort)
+        if doc is None:
+            return None
+        return project(self._unstore(sort_key(doc['_id'])), projection)
+
+    @_durable
+    async def bulk_write(self, requests, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        result = BulkWriteResult()
+        errors = []
+        for position, request in enumerate(requests):
+            try:
+                self._bulk_one(position, request, result)
+            except (DuplicateKeyError, WriteError) as exc:
+                errors.append({'index': position, 'code': exc.code, 'errmsg': str(exc), 'op': getattr(request, '_doc', None)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError(result.details(errors))
+        return result
+
+    def _bulk_one(self, position: int, request, result: BulkWriteResult) -> None:
+        if isinstance(request, InsertOne):
+            document = request._doc
+            if '_id' not in document:
+                document['_id'] = ObjectId()
+            self._insert(clone(document))
+            result.inserted_count += 1
+        elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+            outcome = self._update(
+                request._filter,
+                request._doc,
+                bool(request._upsert),
+                multi=isinstance(request, UpdateMany),
+                replace=isinstance(request, ReplaceOne),
+            )
+            result.matched_count += outcome.matched_count
+            result.modified_count += outcome.modified_count
+            if outcome.upserted_id is not None:
+                result.upserted_ids[position] = outcome.upserted_id
+        elif isinstance(request, (DeleteOne, DeleteMany)):
+            result.deleted_count += self._delete(request._filter, multi=isinstance(request, DeleteMany)).deleted_count
+        else:
+            raise TypeError(f'{request!r} is not a valid bulk write request')
+
+    def _drop(self) -> None:
+        self._docs.clear()
+        self._indexes = {'_id_': Index('_id_', [('_id', 1)], unique=True)}
+        self._index_specs.clear()
+        self.text_index = self._text_index_name = None
+        self._log({'op': 'drop'})
+
+    @_durable
+    async def drop(self, **kwargs) -> None:
+        self._drop()
+
+    def apply_logged(self, record: dict) -> None:
+        """Replay one operation-log record (journaling must be detached)."""
+        op = record['op']
+        if op == 'put':
+            doc = record['d']
+            doc_key = sort_key(doc['_id'])
+            if doc_key in self._docs:
+                self._unstore(doc_key)
+            self._store(doc_key, doc)
+        elif op == 'del':
+            doc_key = sort_key(record['id'])
+            if doc_key in self._docs:
+                self._unstore(doc_key)
+        elif op == 'index':
+            self._create_index(record['keys'], record['options'])
+        elif op == 'drop_index':
+            self._drop_index(record['name'])
+        elif op == 'drop':
+            self._drop()
+
+    def load(self, docs, index_specs: list[tuple[list, dict]]) -> None:
+        """Bulk-load snapshot documents, then build the indexes once over all of them."""
+        for doc in docs:
+            self._docs[sort_key(doc['_id'])] = doc
+        self._indexes['_id_'] = Index('_id_', [('_id', 1)], unique=True)
+        self._indexes['_id_'].build(self._docs)
+        for keys, options in index_specs:
+            self._create_index(keys, options)
+
+    def snapshot(self) -> dict:
+        return {
+            'name': self.name,
+            'indexes': [{'keys': keys, 'options': options} for keys, options in self._index_specs.values()],
+            'docs': list(self._docs.values()),
+        }
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import heapq
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+
+from pymongo.errors import InvalidOperation, OperationFailure
+
+from app.db.memory.values import MISSING, get_field, own_path, sort_key, unset_field
+
+if TYPE_CHECKING:
+    from app.db.memory.collection import InMemoryCollection
+
+
+def normalize_sort(key, direction=None) -> list[tuple[str, Any]]:
+    if key is None:
+        return []
+    if isinstance(key, str):
+        return [(key, 1 if direction is None else direction)]
+    if isinstance(key, dict):
+        return list(key.items())
+    return [tuple(item) for item in key]
+
+
+class _Descending:
+    """Inverts the order of a sort key, so mixed-direction sorts use one composite key."""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other: _Descending) -> bool:
+        return other.key < self.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.key == other.key
+
+
+def _sort_value(doc: dict, field: str, descending: bool) -> tuple:
+    value = get_field(doc, field)
+    if value is MISSING:
+        value = None
+    if isinstance(value, list) and value:
+        # Arrays sort by their smallest element ascending and their largest descending.
+        keys = [sort_key(item) for item in value]
+        return max(keys) if descending else min(keys)
+    return sort_key(value)
+
+
+def sort_documents(
+    docs: Iterable[dict], spec: list[tuple[str, Any]], scores: dict | None = None, limit: int | None = None
+) -> list[dict]:
+    """Order ``docs`` by a sort spec; with ``limit`` only the first ``limit`` are kept, via a bounded heap."""
+    if any(isinstance(direction, dict) for _field, direction in spec) and scores is None:
+        raise OperationFailure('$meta sort by textScore requires a $text query')
+
+    def key(doc: dict) -> tuple:
+        parts = []
+        for field, direction in spec:
+            if isinstance(direction, dict):  # {'$meta': 'textScore'}: best match first
+                parts.append(_Descending(scores.get(doc['_id'], 0.0)))
+            elif direction < 0:
+                parts.append(_Descending(_sort_value(doc, field, True)))
+            else:
+                parts.append(_sort_value(doc, field, False))
+        return tuple(parts)
+
+    # Both are stable, so ties keep the collection's order.
+    if limit:
+        return heapq.nsmallest(limit, docs, key=key)
+    return sorted(docs, key=key)
+
+
+def _copy_path(source: dict, target: dict, parts: list[str]) -> None:
+    head, rest = parts[0], parts[1:]
+    if head not in source:
+        return
+    value = source[head]
+    if not rest:
+        target[head] = value
+    elif isinstance(value, dict):
+        child = target.get(head)
+        if not isinstance(child, dict):
+            child = target[head] = {}
+        _copy_path(value, child, rest)
+    elif isinstance(value, list):
+        items = [item for item in value if isinstance(item, dict)]
+        projected = target.get(head)
+        if not isinstance(projected, list):
+            projected = target[head] = [{} for _item in items]
+        for item, child in zip(items, projected):
+            _copy_path(item, child, rest)
+
+
+def project(doc: dict, projection: Any, score: float | None = None) -> dict:
+    """A find result for ``doc`` shaped by a projection (inclusion, exclusion or ``$meta``).
+
+    Only the result's own structure is new: projected values are shared with
+    the stored document, which is never modified in place (see
+    ``InMemoryCollection``), so a row costs a shallow copy at most.
+    """
+    if not projection:
+        return dict(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    meta = [key for key, value in projection.items() if isinstance(value, dict)]
+    fields = {key: value for key, value in projection.items() if key != '_id' and not isinstance(value, dict)}
+    included = [key for key, value in fields.items() if value]
+    excluded = [key for key, value in fields.items() if not value]
+    if included and excluded:
+        raise OperationFailure('Cannot do exclusion on field in inclusion projection')
+    keep_id = bool(projection.get('_id', 1))
+
+    if included or (not excluded and '_id' in projection and keep_id and not meta):
+        out = {'_id': doc['_id']} if keep_id and '_id' in doc else {}
+        for path in included:
+            _copy_path(doc, out, path.split('.'))
+    else:
+        out = dict(doc)
+        for path in excluded:
+            own_path(out, path)
+            unset_field(out, path)
+        if not keep_id:
+            out.pop('_id', None)
+    for key in meta:
+        out[key] = score if score is not None else 0.0
+    return out
+
+
+class InMemoryCursor:
+    """Lazy find cursor.
+
+    Nothing runs until the first document is requested. Matches then stream
+    from the collection through skip/limit, or through a bounded heap when a
+    sort is combined with a limit, so a page costs memory proportional to the
+    page. Each row is projected as it is yielded.
+    """
+
+    def __init__(self, collection: InMemoryCollection, query: dict | None, projection: Any = None):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort: list[tuple[str, Any]] = []
+        self._skip = 0
+        self._limit = 0
+        self._rows: Iterator[dict] | None = None
+
+    def _check_unstarted(self) -> None:
+        if self._rows is not None:
+            raise InvalidOperation('cannot set options after executing query')
+
+    def sort(self, key, direction: int | None = None):
+        self._check_unstarted()
+        self._sort = normalize_sort(key, direction)
+        return self
+
+    def skip(self, count: int):
+        self._check_unstarted()
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._check_unstarted()
+        self._limit = abs(count)
+        return self
+
+    def batch_size(self, _size: int):
+        return self
+
+    def _execute(self) -> Iterator[dict]:
+        docs, scores = self._collection._matching(self._query)
+        end = self._skip + self._limit if self._limit else None
+        if self._sort:
+            docs = sort_documents(docs, self._sort, scores, end)[self._skip:]
+        else:
+            docs = islice(docs, self._skip, end)
+        for doc in docs:
+            yield project(doc, self._projection, scores.get(doc['_id']) if scores else None)
+
+    def _next(self) -> dict | None:
+        if self._rows is None:
+            self._rows = self._execute()
+        return next(self._rows, None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        row = self._next()
+        if row is None:
+            raise StopAsyncIteration
+        return row
+
+    async def to_list(self, length: int | None = None) -> list[dict]:
+        rows = []
+        while length is None or len(rows) < length:
+            row = self._next()
+            if row is None:
+                break
+            rows.append(row)
+        return rows
+
+    async def close(self) -> None:
+        self._rows = iter(())
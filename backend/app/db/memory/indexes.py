@@ -0,0 +1,227 @@
+"""Secondary indexes and the query planner for the in-memory backend.
+
+Each ``Index`` keeps its entries twice: a hash map from the full key to the
+documents holding it (exact-match lookups, unique checks) and a sorted list of
+``(key, doc_key)`` pairs (prefix and range scans). Keys are tuples of
+``sort_key`` values, so ordering and equality follow Mongo's BSON rules.
+Documents with an array at an indexed field are kept in a separate multikey
+set and returned by every lookup; the planner's candidates are always
+re-checked against the full query, so indexes only ever narrow a scan.
+"""
+
+from __future__ import annotations
+
+import itertools
+import re
+from bisect import bisect_left, insort
+from typing import Any, Iterable, Iterator
+
+from app.db.memory.query import is_operator_dict, matches
+from app.db.memory.values import MAX_KEY, get_field, sort_key, type_rank
+
+# Above this many equality combinations ($in on several fields) a scan is cheaper than probing.
+MAX_PROBES = 1000
+
+_MULTIKEY = object()
+
+
+class Index:
+    def __init__(
+        self,
+        name: str,
+        keys: list[tuple[str, Any]],
+        unique: bool = False,
+        partial_filter: dict | None = None,
+        expire_after_seconds: float | None = None,
+    ):
+        self.name = name
+        self.keys = keys
+        self.fields = [field for field, _direction in keys]
+        self.unique = unique
+        self.partial_filter = partial_filter
+        self.expire_after_seconds = expire_after_seconds
+        self._entries: list[tuple[tuple, tuple]] = []
+        self._hash: dict[tuple, set] = {}
+        self._doc_keys: dict[tuple, Any] = {}
+        self._multikey: set = set()
+
+    def key_for(self, doc: dict):
+        if self.partial_filter is not None and not matches(doc, self.partial_filter):
+            return None
+        values = [get_field(doc, field) for field in self.fields]
+        if any(isinstance(value, list) for value in values):
+            return _MULTIKEY
+        # A missing field is indexed as null, as in Mongo.
+        return tuple(sort_key(value) for value in values)
+
+    def add(self, doc_key: tuple, doc: dict) -> None:
+        key = self.key_for(doc)
+        if key is None:
+            return
+        self._doc_keys[doc_key] = key
+        if key is _MULTIKEY:
+            self._multikey.add(doc_key)
+            return
+        insort(self._entries, (key, doc_key))
+        self._hash.setdefault(key, set()).add(doc_key)
+
+    def build(self, docs: dict[tuple, dict]) -> None:
+        """Index ``docs`` into this empty index with one sort instead of an insertion per document."""
+        for doc_key, doc in docs.items():
+            key = self.key_for(doc)
+            if key is None:
+                continue
+            self._doc_keys[doc_key] = key
+            if key is _MULTIKEY:
+                self._multikey.add(doc_key)
+                continue
+            self._entries.append((key, doc_key))
+            self._hash.setdefault(key, set()).add(doc_key)
+        self._entries.sort()
+
+    def has_duplicates(self) -> bool:
+        return self.unique and any(len(holders) > 1 for holders in self._hash.values())
+
+    def remove(self, doc_key: tuple) -> None:
+        key = self._doc_keys.pop(doc_key, None)
+        if key is None:
+            return
+        if key is _MULTIKEY:
+            self._multikey.discard(doc_key)
+            return
+        del self._entries[bisect_left(self._entries, (key, doc_key))]
+        holders = self._hash[key]
+        holders.discard(doc_key)
+        if not holders:
+            del self._hash[key]
+
+    def conflicts(self, doc: dict, doc_key: tuple) -> bool:
+        """Whether storing ``doc`` under ``doc_key`` would break this index's uniqueness."""
+        if not self.unique:
+            return False
+        key = self.key_for(doc)
+        if key is None or key is _MULTIKEY:
+            return False
+        return any(holder != doc_key for holder in self._hash.get(key, ()))
+
+    def __len__(self) -> int:
+        return len(self._doc_keys)
+
+    def lookup(self, key: tuple) -> Iterator[tuple]:
+        """Documents whose full key equals ``key``."""
+        yield from self._hash.get(key, ())
+        yield from self._multikey
+
+    def scan(
+        self,
+        prefix: tuple,
+        low: tuple | None = None,
+        low_inclusive: bool = True,
+        high: tuple | None = None,
+        high_inclusive: bool = True,
+    ) -> Iterator[tuple]:
+        """Documents whose key starts with ``prefix`` and whose next component lies within the bounds."""
+        if low is None:
+            start = bisect_left(self._entries, (prefix,))
+        else:
+            start = bisect_left(self._entries, (prefix + ((low,) if low_inclusive else (low, MAX_KEY)),))
+        if high is None:
+            end = bisect_left(self._entries, (prefix + (MAX_KEY,),))
+        else:
+            end = bisect_left(self._entries, (prefix + ((high, MAX_KEY) if high_inclusive else (high,)),))
+        for position in range(start, end):
+            yield self._entries[position][1]
+        yield from self._multikey
+
+
+def _plannable(value: Any) -> bool:
+    return not isinstance(value, (dict, list, re.Pattern))
+
+
+def _predicates(query: dict, equalities: dict, ranges: dict) -> None:
+    for key, condition in query.items():
+        if key == '$and':
+            for sub in condition:
+                _predicates(sub, equalities, ranges)
+        elif key.startswith('$'):
+            continue
+        elif not is_operator_dict(condition):
+            if _plannable(condition):
+                equalities[key] = [condition]
+        elif '$eq' in condition and _plannable(condition['$eq']):
+            equalities[key] = [condition['$eq']]
+        elif '$in' in condition and all(_plannable(value) for value in condition['$in']):
+            equalities[key] = list(condition['$in'])
+        else:
+            bounds = {op: condition[op] for op in ('$gt', '$gte', '$lt', '$lte') if op in condition}
+            if bounds and all(_plannable(value) and value is not None for value in bounds.values()):
+                ranges[key] = bounds
+
+
+def _range_bounds(bounds: dict) -> tuple:
+    low_op = '$gte' if '$gte' in bounds else '$gt' if '$gt' in bounds else None
+    high_op = '$lte' if '$lte' in bounds else '$lt' if '$lt' in bounds else None
+    low = sort_key(bounds[low_op]) if low_op else None
+    high = sort_key(bounds[high_op]) if high_op else None
+    # Comparisons never cross BSON types, so an open side stops at the edge of the bound's type.
+    if low is None:
+        low, low_inclusive = (type_rank(bounds[high_op]),), True
+    else:
+        low_inclusive = low_op == '$gte'
+    if high is None:
+        high, high_inclusive = (type_rank(bounds[low_op]) + 1,), False
+    else:
+        high_inclusive = high_op == '$lte'
+    return low, low_inclusive, high, high_inclusive
+
+
+def plan(indexes: Iterable[Index], query: dict) -> Iterator[tuple] | None:
+    """Candidate document keys for ``query`` from the best index, or None when a full scan is needed.
+
+    The best index is the one whose leading fields are covered by the most
+    equality (or ``$in``) predicates, optionally followed by one range field.
+    """
+    equalities: dict[str, list] = {}
+    ranges: dict[str, dict] = {}
+    _predicates(query, equalities, ranges)
+    if not equalities and not ranges:
+        return None
+
+    best = None
+    best_score = None
+    for index in indexes:
+        if index.partial_filter is not None:
+            continue
+        covered = 0
+        while covered < len(index.fields) and index.fields[covered] in equalities:
+            covered += 1
+        ranged = covered < len(index.fields) and index.fields[covered] in ranges
+        if not covered and not ranged:
+            continue
+        score = (covered, ranged, index.unique, -len(index.fields))
+        if best_score is None or score > best_score:
+            best, best_score = index, score
+    if best is None:
+        return None
+
+    covered, ranged = best_score[0], best_score[1]
+    choices = [sorted({sort_key(value) for value in equalities[field]}) for field in best.fields[:covered]]
+    probes = 1
+    for values in choices:
+        probes *= len(values)
+    if probes > MAX_PROBES:
+        return None
+    return _probe(best, choices, best.fields[covered] if ranged else None, ranges)
+
+
+def _probe(index: Index, choices: list[list], range_field: str | None, ranges: dict) -> Iterator[tuple]:
+    seen = set()
+    full = range_field is None and len(choices) == len(index.fields)
+    bounds = _range_bounds(ranges[range_field]) if range_field else (None, True, None, True)
+    for prefix in itertools.product(*choices):
+        found = index.lookup(prefix) if full else index.scan(prefix, *bounds)
+        for doc_key in found:
+            # Multikey documents come back from every probe.
+            if doc_key not in seen:
+                seen.add(doc_key)
+                yield doc_key
@@ -0,0 +1,274 @@
+"""Optional on-disk durability for the in-memory backend.
+
+A data directory holds BSON files:
+
+- ``oplog-<lsn>.bson`` is an operation log segment whose first record has
+  log sequence number ``lsn``. Each record is one BSON document followed by
+  the CRC32 of its bytes. Records are physical: the after-image of a stored
+  document (``put``), a deleted ``_id`` (``del``), or an index/drop change,
+  so replay never re-evaluates queries or regenerates ids.
+- ``snapshot-<lsn>.bson`` is a compact image of every collection as of
+  ``lsn``. It contains a header, then per collection its index specs and
+  documents.
+
+Writes append to an in-memory buffer synchronously, so every collection
+call stays atomic. Before acknowledging, the write awaits ``commit``. The
+first committer sleeps ``commit_window`` seconds so concurrent writers can
+join, then writes and fsyncs everyone's records at once (group commit).
+Startup memory-maps the newest snapshot, decodes it record by record, and
+replays the log segments that follow it. A torn record at the end of the
+last segment is cut off.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import mmap
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from typing import Callable, Iterator
+
+import bson
+from bson.codec_options import CodecOptions
+
+CODEC_OPTIONS = CodecOptions(tz_aware=True, tzinfo=timezone.utc)
+SNAPSHOT_FORMAT = 1
+
+_SEGMENT_RE = re.compile(r'^oplog-(\d+)\.bson$')
+_SNAPSHOT_RE = re.compile(r'^snapshot-(\d+)\.bson$')
+
+
+def encode_record(record: dict) -> bytes:
+    data = bson.encode(record, codec_options=CODEC_OPTIONS)
+    return data + zlib.crc32(data).to_bytes(4, 'little')
+
+
+def _iter_buffer(buffer, checked: bool) -> Iterator[tuple[int, dict]]:
+    """Yield ``(end_offset, record)`` pairs; stops at the first truncated or corrupt record."""
+    offset = 0
+    size = len(buffer)
+    trailer = 4 if checked else 0
+    while offset + 4 <= size:
+        length = int.from_bytes(buffer[offset:offset + 4], 'little')
+        end = offset + length
+        if length < 5 or end + trailer > size:
+            return
+        data = buffer[offset:end]
+        if checked and zlib.crc32(data) != int.from_bytes(buffer[end:end + 4], 'little'):
+            return
+        try:
+            record = bson.decode(data, codec_options=CODEC_OPTIONS)
+        except bson.errors.InvalidBSON:
+            return
+        offset = end + trailer
+        yield offset, record
+
+
+def _mapped(path: str):
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _numbered(path: str, pattern: re.Pattern) -> list[tuple[int, str]]:
+    found = []
+    for name in os.listdir(path):
+        match = pattern.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(path, name)))
+    return sorted(found)
+
+
+def write_snapshot(path: str, lsn: int, collections: list[dict]) -> str:
+    """Write a snapshot of ``collections`` (name, indexes, docs) as of ``lsn``; returns its path."""
+    final = os.path.join(path, f'snapshot-{lsn:016d}.bson')
+    temp = final + '.tmp'
+    with open(temp, 'wb') as handle:
+        handle.write(bson.encode({'format': SNAPSHOT_FORMAT, 'lsn': lsn, 'collections': len(collections)}))
+        for collection in collections:
+            docs = collection['docs']
+            handle.write(
+                bson.encode({'name': collection['name'], 'indexes': collection['indexes'], 'count': len(docs)})
+            )
+            for doc in docs:
+                handle.write(bson.encode(doc, codec_options=CODEC_OPTIONS))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp, final)
+    _fsync_dir(path)
+    return final
+
+
+def load_snapshot(path: str) -> tuple[int, Iterator[tuple[dict, Iterator[dict]]]]:
+    """Return the newest snapshot's lsn and an iterator of ``(collection header, documents)``."""
+    snapshots = _numbered(path, _SNAPSHOT_RE)
+    if not snapshots:
+        return 0, iter(())
+    lsn, snapshot_path = snapshots[-1]
+    buffer = _mapped(snapshot_path)
+    records = _iter_buffer(buffer, checked=False)
+    _offset, header = next(records)
+    if header.get('format') != SNAPSHOT_FORMAT or header.get('lsn') != lsn:
+        raise ValueError(f'unrecognised snapshot {snapshot_path}')
+
+    def collections():
+        for _ in range(header['collections']):
+            _offset, meta = next(records)
+            yield meta, (doc for _index, (_offset, doc) in zip(range(meta['count']), records))
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+    return lsn, collections()
+
+
+def replay_log(path: str, after_lsn: int, apply: Callable[[dict], None]) -> int:
+    """Apply every logged record with an lsn above ``after_lsn``; returns the last lsn applied."""
+    lsn = after_lsn
+    segments = [(start, segment) for start, segment in _numbered(path, _SEGMENT_RE) if start > after_lsn]
+    for position, (start, segment) in enumerate(segments):
+        buffer = _mapped(segment)
+        good = 0
+        lsn = start - 1
+        for good, record in _iter_buffer(buffer, checked=True):
+            lsn += 1
+            apply(record)
+        size = len(buffer)
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+        if good < size:
+            if position != len(segments) - 1:
+                raise ValueError(f'corrupt operation log segment {segment}')
+            # A crash mid-append leaves a torn record at the end of the newest segment.
+            with open(segment, 'r+b') as handle:
+                handle.truncate(good)
+    return lsn
+
+
+class Journal:
+    """Group-committed operation log for one data directory."""
+
+    def __init__(
+        self, path: str, lsn: int, commit_window: float, snapshot_ops: int, capture: Callable[[], list[dict]]
+    ):
+        self.path = path
+        # Returns every collection's name, index specs and document references for a snapshot.
+        self.capture = capture
+        self.commit_window = commit_window
+        self.snapshot_ops = snapshot_ops
+        self.lsn = lsn
+        self.durable_lsn = lsn
+        self.ops_since_snapshot = 0
+        self._buffer = bytearray()
+        self._flushing: asyncio.Future | None = None
+        self._snapshotting: asyncio.Task | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='memory-db-log')
+        self._handle = self._open_segment(lsn + 1)
+        self.stats = {'commits': 0, 'fsyncs': 0, 'records': 0, 'snapshots': 0}
+
+    def _open_segment(self, start: int):
+        handle = open(os.path.join(self.path, f'oplog-{start:016d}.bson'), 'ab')
+        _fsync_dir(self.path)
+        return handle
+
+    def append(self, record: dict) -> None:
+        self._buffer += encode_record(record)
+        self.lsn += 1
+        self.ops_since_snapshot += 1
+        self.stats['records'] += 1
+
+    @staticmethod
+    def _write(handle, data: bytes) -> None:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    def _retire(self, handle, data: bytes) -> None:
+        self._write(handle, data)
+        handle.close()
+
+    async def _flush(self) -> None:
+        try:
+            if self.commit_window:
+                await asyncio.sleep(self.commit_window)
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            upto = self.lsn
+            # The log thread runs jobs in order, so a write queued here lands after any earlier segment's.
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, self._handle, data)
+            self.durable_lsn = upto
+            self.stats['fsyncs'] += 1
+        finally:
+            self._flushing = None
+
+    async def commit(self) -> None:
+        """Return once every record appended so far is on disk."""
+        target = self.lsn
+        self.stats['commits'] += 1
+        while self.durable_lsn < target:
+            if self._flushing is None:
+                self._flushing = asyncio.ensure_future(self._flush())
+            await asyncio.shield(self._flushing)
+        if self.ops_since_snapshot >= self.snapshot_ops and self._snapshotting is None:
+            self._snapshotting = asyncio.ensure_future(self._snapshot())
+
+    async def snapshot(self) -> None:
+        """Write a snapshot of the current state and drop the log it makes redundant."""
+        while self._snapshotting is not None:
+            await self._snapshotting
+        self._snapshotting = asyncio.ensure_future(self._snapshot())
+        await self._snapshotting
+
+    async def _snapshot(self) -> None:
+        try:
+            # Capture and rotate without yielding, so the snapshot matches the log exactly at ``lsn``.
+            # Stored documents are never modified in place, so capturing references is enough.
+            lsn = self.lsn
+            collections = self.capture()
+            pending = bytes(self._buffer)
+            self._buffer.clear()
+            old_handle, self._handle = self._handle, self._open_segment(lsn + 1)
+            self.ops_since_snapshot = 0
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._retire, old_handle, pending)
+            self.durable_lsn = max(self.durable_lsn, lsn)
+            await loop.run_in_executor(self._executor, write_snapshot, self.path, lsn, collections)
+            await loop.run_in_executor(self._executor, self._prune, lsn)
+            self.stats['snapshots'] += 1
+        finally:
+            self._snapshotting = None
+
+    def _prune(self, lsn: int) -> None:
+        for start, segment in _numbered(self.path, _SEGMENT_RE):
+            if start <= lsn:
+                os.remove(segment)
+        for snapshot_lsn, snapshot in _numbered(self.path, _SNAPSHOT_RE):
+            if snapshot_lsn < lsn:
+                os.remove(snapshot)
+
+    async def close(self) -> None:
+        if self._snapshotting is not None:
+            await self._snapshotting
+        await self.commit()
+        # The final commit may have started a snapshot; it still needs the handle and the log thread.
+        if self._snapshotting is not None:
+            await self._snapshotting
+        empty = self._handle.tell() == 0
+        self._handle.close()
+        if empty:
+            # Nothing was written since the last rotation; don't leave an empty segment behind.
+            os.remove(self._handle.name)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,142 @@
+"""Query-document matching and ``$expr`` evaluation for the in-memory backend.
+
+Only the operators the app sends are implemented; anything else raises
+``OperationFailure`` rather than matching wrongly. Query operators: ``$and``,
+``$or``, ``$expr``, ``$text`` (resolved by the collection), ``$eq``, ``$ne``,
+``$gt``, ``$gte``, ``$lt``, ``$lte``, ``$in``, ``$exists`` and ``$not``.
+``$expr`` supports field paths, ``$ifNull``, ``$and``, ``$or`` and the
+comparison operators.
+"""
+
+from __future__ import annotations
+
+import operator
+from typing import Any
+
+from pymongo.errors import OperationFailure
+
+from app.db.memory.values import MISSING, get_field, resolve, sort_key, type_rank, values_equal
+
+_COMPARISONS = {
+    '$eq': operator.eq,
+    '$ne': operator.ne,
+    '$gt': operator.gt,
+    '$gte': operator.ge,
+    '$lt': operator.lt,
+    '$lte': operator.le,
+}
+
+
+def is_operator_dict(value: Any) -> bool:
+    return isinstance(value, dict) and bool(value) and all(str(k).startswith('$') for k in value)
+
+
+def matches(doc: dict, query: dict | None) -> bool:
+    """Whether ``doc`` satisfies ``query``; ``$text`` is resolved by the collection, not here."""
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$expr':
+            if not truthy(evaluate(condition, doc)):
+                return False
+        elif key == '$text':
+            continue
+        elif key.startswith('$'):
+            raise OperationFailure(f'unknown top level operator: {key}')
+        elif not match_field(doc, key, condition):
+            return False
+    return True
+
+
+def match_field(doc: dict, path: str, condition: Any) -> bool:
+    values = resolve(doc, path)
+    if is_operator_dict(condition):
+        return _match_operators(values, condition)
+    return _equals(values, condition)
+
+
+def _candidates(values: list):
+    # A query on an array field matches the array itself or any of its elements.
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+
+def _equals(values: list, target: Any) -> bool:
+    if target is None and not values:
+        return True
+    return any(values_equal(v, target) for v in _candidates(values))
+
+
+def _compare(values: list, target: Any, test) -> bool:
+    target_key = sort_key(target)
+    rank = type_rank(target)
+    # Comparison operators only match values of the same BSON type bracket.
+    return any(type_rank(v) == rank and test(sort_key(v), target_key) for v in _candidates(values))
+
+
+def _match_operators(values: list, condition: dict) -> bool:
+    return all(_match_operator(values, op, arg) for op, arg in condition.items())
+
+
+def _match_operator(values: list, op: str, arg: Any) -> bool:
+    if op == '$eq':
+        return _equals(values, arg)
+    if op == '$ne':
+        return not _equals(values, arg)
+    if op in ('$gt', '$lt'):
+        return _compare(values, arg, _COMPARISONS[op])
+    if op in ('$gte', '$lte'):
+        # {'$gte': None} matches a missing field, like equality with None.
+        return _compare(values, arg, _COMPARISONS[op]) or (arg is None and not values)
+    if op == '$in':
+        return any(_equals(values, item) for item in arg)
+    if op == '$exists':
+        return bool(values) == bool(arg)
+    if op == '$not':
+        if not is_operator_dict(arg):
+            raise OperationFailure('$not needs a document of operators')
+        return not _match_operators(values, arg)
+    raise OperationFailure(f'unknown operator: {op}')
+
+
+def truthy(value: Any) -> bool:
+    if value is None or value is MISSING or value is False:
+        return False
+    if type_rank(value) == type_rank(0):
+        return value != 0
+    return True
+
+
+def evaluate(expression: Any, doc: dict) -> Any:
+    """Evaluate the aggregation-expression subset used in ``$expr`` filters."""
+    if isinstance(expression, str) and expression.startswith('$'):
+        if expression.startswith('$$'):
+            raise OperationFailure(f'unsupported variable in $expr: {expression}')
+        value = get_field(doc, expression[1:])
+        return None if value is MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(item, doc) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1 or not next(iter(expression)).startswith('$'):
+        return {key: evaluate(value, doc) for key, value in expression.items()}
+
+    op, raw = next(iter(expression.items()))
+    args = [evaluate(item, doc) for item in (raw if isinstance(raw, list) else [raw])]
+    if op == '$ifNull':
+        return next((arg for arg in args[:-1] if arg is not None), args[-1])
+    if op in _COMPARISONS:
+        # Aggregation comparisons order across types by BSON order instead of failing to match.
+        left, right = args
+        return _COMPARISONS[op](sort_key(left), sort_key(right))
+    if op == '$and':
+        return all(truthy(arg) for arg in args)
+    if op == '$or':
+        return any(truthy(arg) for arg in args)
+    raise OperationFailure(f'unsupported $expr operator: {op}')
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class InsertOneResult:
+    inserted_id: Any
+    acknowledged: bool = True
+
+
+@dataclass
+class InsertManyResult:
+    inserted_ids: list
+    acknowledged: bool = True
+
+
+@dataclass
+class UpdateResult:
+    matched_count: int = 0
+    modified_count: int = 0
+    upserted_id: Any = None
+    acknowledged: bool = True
+
+
+@dataclass
+class DeleteResult:
+    deleted_count: int = 0
+    acknowledged: bool = True
+
+
+@dataclass
+class BulkWriteResult:
+    inserted_count: int = 0
+    matched_count: int = 0
+    modified_count: int = 0
+    deleted_count: int = 0
+    upserted_ids: dict = field(default_factory=dict)
+    acknowledged: bool = True
+
+    @property
+    def upserted_count(self) -> int:
+        return len(self.upserted_ids)
+
+    def details(self, write_errors: list) -> dict:
+        return {
+            'writeErrors': write_errors,
+            'writeConcernErrors': [],
+            'nInserted': self.inserted_count,
+            'nUpserted': self.upserted_count,
+            'nMatched': self.matched_count,
+            'nModified': self.modified_count,
+            'nRemoved': self.deleted_count,
+            'upserted': [{'index': index, '_id': _id} for index, _id in self.upserted_ids.items()],
+        }
@@ -0,0 +1,85 @@
+"""Update-operator application and upsert seeding for the in-memory backend.
+
+Supports the update operators the app sends: ``$set``, ``$unset``, ``$inc``
+and ``$setOnInsert``.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from pymongo.errors import WriteError
+
+from app.db.memory.query import is_operator_dict
+from app.db.memory.values import MISSING, clone, get_field, own_path, set_field, type_rank, unset_field, values_equal
+
+
+def is_update_document(update: dict) -> bool:
+    return bool(update) and all(key.startswith('$') for key in update)
+
+
+def validate_replacement(replacement: dict) -> None:
+    if any(key.startswith('$') for key in replacement):
+        raise ValueError('replacement can not include $ operators')
+
+
+def validate_update(update: dict) -> None:
+    if not is_update_document(update):
+        raise ValueError('update only works with $ operators')
+
+
+def _number(value: Any, op: str, path: str) -> Any:
+    if type_rank(value) != type_rank(0):
+        raise WriteError(f"Cannot apply {op} to a value of non-numeric type at '{path}'", code=14)
+    return value
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False) -> None:
+    """Apply an update document to ``doc`` in place; ``inserting`` enables ``$setOnInsert``.
+
+    ``doc`` only needs to be a private copy at the top level: nested containers
+    are copied along each written path before they are modified.
+    """
+    validate_update(update)
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            if path == '_id' or path.startswith('_id.'):
+                allowed = op == '$setOnInsert' or (op == '$set' and (inserting or values_equal(get_field(doc, path), arg)))
+                if not allowed:
+                    raise WriteError("Performing an update on the path '_id' would modify the immutable field '_id'", code=66)
+            _apply_one(doc, op, path, arg, inserting)
+
+
+def _apply_one(doc: dict, op: str, path: str, arg: Any, inserting: bool) -> None:
+    own_path(doc, path)
+    if op == '$set':
+        set_field(doc, path, clone(arg))
+    elif op == '$setOnInsert':
+        if inserting:
+            set_field(doc, path, clone(arg))
+    elif op == '$unset':
+        unset_field(doc, path)
+    elif op == '$inc':
+        current = get_field(doc, path)
+        base = 0 if current is MISSING else _number(current, op, path)
+        set_field(doc, path, base + _number(arg, op, path))
+    else:
+        raise WriteError(f'Unknown modifier: {op}', code=9)
+
+
+def seed_from_query(query: dict | None) -> dict:
+    """The equality fields of ``query``, which an upsert copies into the inserted document."""
+    seed: dict = {}
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            for sub in condition:
+                for sub_key, value in seed_from_query(sub).items():
+                    set_field(seed, sub_key, value)
+        elif key.startswith('$'):
+            continue
+        elif is_operator_dict(condition):
+            if '$eq' in condition:
+                set_field(seed, key, clone(condition['$eq']))
+        else:
+            set_field(seed, key, clone(condition))
+    return seed
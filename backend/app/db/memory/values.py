@@ -0,0 +1,203 @@
+"""BSON-style value ordering and dotted-path helpers for the in-memory backend."""
+
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+from typing import Any
+
+from bson import ObjectId
+
+MISSING = object()
+
+# Greater than every ``sort_key``; used as an open upper bound in index ranges.
+MAX_KEY = (99,)
+
+# Canonical BSON comparison order (MinKey < null < numbers < string < object < array < ...).
+_NULL, _NUMBER, _STRING, _OBJECT, _ARRAY, _BINARY, _OBJECT_ID, _BOOL, _DATE, _REGEX, _OTHER = range(1, 12)
+
+
+def type_rank(value: Any) -> int:
+    if value is None or value is MISSING:
+        return _NULL
+    if isinstance(value, bool):
+        return _BOOL
+    if isinstance(value, (int, float)):
+        return _NUMBER
+    if isinstance(value, str):
+        return _STRING
+    if isinstance(value, dict):
+        return _OBJECT
+    if isinstance(value, (list, tuple)):
+        return _ARRAY
+    if isinstance(value, (bytes, bytearray)):
+        return _BINARY
+    if isinstance(value, ObjectId):
+        return _OBJECT_ID
+    if isinstance(value, datetime):
+        return _DATE
+    if isinstance(value, re.Pattern):
+        return _REGEX
+    return _OTHER
+
+
+def _utc_naive(value: datetime) -> datetime:
+    # Mongo stores datetimes as UTC milliseconds; aware and naive values compare on that instant.
+    if value.tzinfo is None:
+        return value
+    if value.tzinfo is timezone.utc:
+        return value.replace(tzinfo=None)
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def sort_key(value: Any) -> tuple:
+    """A hashable key that orders and equates values the way Mongo does (1 == 1.0, True != 1)."""
+    kind = type(value)
+    # Fast paths for the types indexes see most.
+    if kind is str:
+        return (_STRING, value)
+    if kind is int or kind is float:
+        return (_NUMBER, value)
+    if kind is datetime:
+        return (_DATE, _utc_naive(value))
+    rank = type_rank(value)
+    if rank == _NULL:
+        return (rank,)
+    if rank == _OBJECT:
+        return (rank, tuple((k, sort_key(v)) for k, v in value.items()))
+    if rank == _ARRAY:
+        return (rank, tuple(sort_key(v) for v in value))
+    if rank == _DATE:
+        return (rank, _utc_naive(value))
+    if rank == _BINARY:
+        return (rank, bytes(value))
+    if rank == _REGEX:
+        return (rank, value.pattern, value.flags)
+    if rank == _OTHER:
+        return (rank, repr(value))
+    return (rank, value)
+
+
+def values_equal(a: Any, b: Any) -> bool:
+    return sort_key(a) == sort_key(b)
+
+
+def get_field(doc: Any, path: str) -> Any:
+    """The value at a dotted path without array fan-out (numeric parts index into lists); MISSING if absent."""
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            if part not in value:
+                return MISSING
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit():
+            index = int(part)
+            if index >= len(value):
+                return MISSING
+            value = value[index]
+        else:
+            return MISSING
+    return value
+
+
+def resolve(doc: Any, path: str) -> list:
+    """Every value reachable at a dotted path, fanning out through arrays like Mongo queries do."""
+    return _walk(doc, path.split('.'))
+
+
+def _walk(value: Any, parts: list[str]) -> list:
+    if not parts:
+        return [value]
+    head, rest = parts[0], parts[1:]
+    if isinstance(value, dict):
+        return _walk(value[head], rest) if head in value else []
+    if isinstance(value, list):
+        found = []
+        if head.isdigit() and int(head) < len(value):
+            found.extend(_walk(value[int(head)], rest))
+        for item in value:
+            if isinstance(item, dict):
+                found.extend(_walk(item, parts))
+        return found
+    return []
+
+
+def clone(value: Any) -> Any:
+    """Copy the dict/list structure of ``value``; leaves (strings, numbers, datetimes, ids) are immutable and shared."""
+    kind = type(value)
+    if kind is dict:
+        return {key: clone(item) for key, item in value.items()}
+    if kind is list:
+        return [clone(item) for item in value]
+    if kind is bytearray:
+        return bytearray(value)
+    return value
+
+
+def own_path(doc: dict, path: str) -> None:
+    """Give ``doc`` private copies of the containers leading to ``path``, so a write there
+    leaves subtrees shared with other document images untouched (copy-on-write)."""
+    target: Any = doc
+    for part in path.split('.')[:-1]:
+        if isinstance(target, dict) and isinstance(target.get(part), (dict, list)):
+            child = target[part]
+            key: Any = part
+        elif isinstance(target, list) and part.isdigit() and int(part) < len(target) and isinstance(target[int(part)], (dict, list)):
+            key = int(part)
+            child = target[key]
+        else:
+            return
+        child = dict(child) if isinstance(child, dict) else list(child)
+        target[key] = child
+        target = child
+
+
+def _container(doc: dict, path: str, create: bool) -> tuple[Any, str]:
+    parts = path.split('.')
+    target: Any = doc
+    for part in parts[:-1]:
+        if isinstance(target, list) and part.isdigit():
+            index = int(part)
+            if index >= len(target):
+                if not create:
+                    return None, parts[-1]
+                target.extend([None] * (index + 1 - len(target)))
+            if target[index] is None and create:
+                target[index] = {}
+            target = target[index]
+        elif isinstance(target, dict):
+            if part not in target or target[part] is None:
+                if not create:
+                    return None, parts[-1]
+                target[part] = {}
+            target = target[part]
+        else:
+            if not create:
+                return None, parts[-1]
+            raise TypeError(f"cannot create field '{part}' in element {target!r}")
+    return target, parts[-1]
+
+
+def set_field(doc: dict, path: str, value: Any) -> None:
+    target, last = _container(doc, path, create=True)
+    if isinstance(target, list) and last.isdigit():
+        index = int(last)
+        if index >= len(target):
+            target.extend([None] * (index + 1 - len(target)))
+        target[index] = value
+    elif isinstance(target, dict):
+        target[last] = value
+    else:
+        raise TypeError(f"cannot create field '{last}' in element {target!r}")
+
+
+def unset_field(doc: dict, path: str) -> bool:
+    target, last = _container(doc, path, create=False)
+    if isinstance(target, dict) and last in target:
+        del target[last]
+        return True
+    if isinstance(target, list) and last.isdigit() and int(last) < len(target):
+        # Like Mongo, unsetting an array element nulls it instead of shifting the array.
+        target[int(last)] = None
+        return True
+    return False
@@ -0,0 +1,212 @@
+"""One-off data migrations.
+
+Run from the ``backend`` directory, e.g.::
+
+    python -m app.db.migrations backfill-summaries
+
+Migrations work in ``_id`` order in batches and checkpoint the last
+processed id in the ``migrations`` collection, so an interrupted run resumes
+where it stopped. ``rebuild-rollups`` recomputes ``user_daily_stats`` from
+scratch instead; it must run once when upgrading a database that already
+has evaluations (the dashboard reads only the rollups), and afterwards is a
+repair command.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo import ReplaceOne, UpdateOne
+
+from app.db.mongo import collection
+from app.services.dashboard_cache import bump_generations
+from app.services.evaluation_payloads import PAYLOAD_FIELDS, payload_document, unpack
+from app.services.evaluation_summary import SUMMARY_VERSION, build_summary
+from app.services.rollups import ROLLUP_PROJECTION, build_rows, is_countable
+
+
+async def _load_checkpoint(name: str):
+    doc = await collection('migrations').find_one({'_id': name})
+    return doc.get('last_id') if doc else None
+
+
+async def _save_checkpoint(name: str, last_id) -> None:
+    await collection('migrations').update_one(
+        {'_id': name},
+        {'$set': {'last_id': last_id, 'updated_at': datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+async def _clear_checkpoint(name: str) -> None:
+    await collection('migrations').delete_one({'_id': name})
+
+
+async def backfill_summaries(batch_size: int = 500) -> int:
+    """Populate ``summary`` on evaluations written before it existed (or by an older version)."""
+    name = 'backfill_summaries'
+    last_id = await _load_checkpoint(name)
+    updated = 0
+    while True:
+        query: dict = {'summary.version': {'$ne': SUMMARY_VERSION}}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = await (
+            collection('evaluations')
+            .find(query, {'parsed_content': 1})
+            .sort('_id', 1)
+            .limit(batch_size)
+            .to_list(length=batch_size)
+        )
+        if not batch:
+            break
+        # Documents already split by split-payloads keep parsed_content in evaluation_payloads.
+        cold_ids = [item['_id'] for item in batch if 'parsed_content' not in item]
+        cold = {}
+        if cold_ids:
+            async for payload in collection('evaluation_payloads').find({'_id': {'$in': cold_ids}}):
+                cold[payload['_id']] = unpack(payload['data']).get('parsed_content')
+        await collection('evaluations').bulk_write(
+            [
+                UpdateOne(
+                    {'_id': item['_id']},
+                    {'$set': {'summary': build_summary(item.get('parsed_content', cold.get(item['_id'])))}},
+                )
+                for item in batch
+            ],
+            ordered=False,
+        )
+        updated += len(batch)
+        last_id = batch[-1]['_id']
+        await _save_checkpoint(name, last_id)
+    await _clear_checkpoint(name)
+    return updated
+
+
+async def split_payloads(batch_size: int = 200) -> int:
+    """Move agent_response, formatted_message and parsed_content into compressed evaluation_payloads."""
+    name = 'split_payloads'
+    last_id = await _load_checkpoint(name)
+    moved = 0
+    while True:
+        query: dict = {'$or': [{field: {'$exists': True}} for field in PAYLOAD_FIELDS]}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = await (
+            collection('evaluations')
+            .find(query, {'user_id': 1, 'summary': 1, **{field: 1 for field in PAYLOAD_FIELDS}})
+            .sort('_id', 1)
+            .limit(batch_size)
+            .to_list(length=batch_size)
+        )
+        if not batch:
+            break
+        # Payloads are written before the hot fields are dropped, so a crash in between loses nothing.
+        await collection('evaluation_payloads').bulk_write(
+            [
+                ReplaceOne({'_id': item['_id']}, payload_document(item['_id'], item.get('user_id'), item), upsert=True)
+                for item in batch
+            ],
+            ordered=False,
+        )
+        updates = []
+        for item in batch:
+            update: dict = {'$unset': {field: '' for field in PAYLOAD_FIELDS}}
+            if (item.get('summary') or {}).get('version') != SUMMARY_VERSION:
+                update['$set'] = {'summary': build_summary(item.get('parsed_content'))}
+            updates.append(UpdateOne({'_id': item['_id']}, update))
+        await collection('evaluations').bulk_write(updates, ordered=False)
+        moved += len(batch)
+        last_id = batch[-1]['_id']
+        await _save_checkpoint(name, last_id)
+    await _clear_checkpoint(name)
+    return moved
+
+
+async def _rebuild_user_rollups(user_id: str, items: list[dict], batch_size: int) -> bool:
+    """Replace one user's user_daily_stats with rows computed from ``items``; returns whether any row changed."""
+    stats = collection('user_daily_stats')
+    counted = [item for item in items if is_countable(item)]
+    rows = build_rows(counted)
+    existing = {row['_id']: row async for row in stats.find({'user_id': user_id})}
+    stale = [row_id for row_id in existing if row_id not in rows]
+    changed = [row for row_id, row in rows.items() if existing.get(row_id) != row]
+    if stale:
+        await stats.delete_many({'_id': {'$in': stale}})
+    for start in range(0, len(changed), batch_size):
+        await stats.bulk_write(
+            [ReplaceOne({'_id': row['_id']}, row, upsert=True) for row in changed[start:start + batch_size]],
+            ordered=False,
+        )
+
+    marked = [item['_id'] for item in counted if not item.get('in_rollups')]
+    unmarked = [item['_id'] for item in items if item.get('in_rollups') and not is_countable(item)]
+    for ids, update in ((marked, {'$set': {'in_rollups': True}}), (unmarked, {'$unset': {'in_rollups': ''}})):
+        for start in range(0, len(ids), batch_size):
+            await collection('evaluations').update_many({'_id': {'$in': ids[start:start + batch_size]}}, update)
+    return bool(stale or changed)
+
+
+async def rebuild_rollups(batch_size: int = 1000, user_id: str | None = None) -> int:
+    """Recompute user_daily_stats (for one user, or everyone) from the evaluations collection.
+
+    Evaluations are streamed in ``user_id`` order and each user is rebuilt as
+    soon as the cursor moves past them, so memory holds one user's evaluations
+    at a time. Only rows that differ are rewritten or deleted, and only those
+    users get their dashboard generation bumped. Returns how many users changed.
+    """
+    query: dict = {'user_id': user_id} if user_id else {}
+    seen: set[str] = set()
+    touched: list[str] = []
+    current, items = None, []
+    cursor = (
+        collection('evaluations')
+        .find(query, {**ROLLUP_PROJECTION, 'status': 1})
+        .sort('user_id', 1)
+        .batch_size(batch_size)
+    )
+    async for item in cursor:
+        if item['user_id'] != current:
+            if current is not None and await _rebuild_user_rollups(current, items, batch_size):
+                touched.append(current)
+            current, items = item['user_id'], []
+            seen.add(current)
+        items.append(item)
+    if current is not None and await _rebuild_user_rollups(current, items, batch_size):
+        touched.append(current)
+
+    # Users whose evaluations are all gone still have rows to delete.
+    orphaned = {row['user_id'] async for row in collection('user_daily_stats').find(query, {'user_id': 1})} - seen
+    for orphan in sorted(orphaned):
+        if await _rebuild_user_rollups(orphan, [], batch_size):
+            touched.append(orphan)
+
+    for start in range(0, len(touched), batch_size):
+        await bump_generations(touched[start:start + batch_size])
+    return len(touched)
+
+
+MIGRATIONS = {
+    'backfill-summaries': backfill_summaries,
+    'rebuild-rollups': rebuild_rollups,
+    'split-payloads': split_payloads,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run an Avagama.ai data migration.')
+    parser.add_argument('name', choices=sorted(MIGRATIONS))
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--user-id', default=None, help='rebuild-rollups only: limit the rebuild to one user')
+    args = parser.parse_args()
+    kwargs = {'batch_size': args.batch_size} if args.batch_size else {}
+    if args.user_id:
+        kwargs['user_id'] = args.user_id
+    count = asyncio.run(MIGRATIONS[args.name](**kwargs))
+    print(f"{args.name}: {count} {'users' if args.name == 'rebuild-rollups' else 'documents'} updated.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,123 +1,79 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Any
-
-from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.core.config import settings
+from app.db.memory import InMemoryCollection, InMemoryCursor, InMemoryDB, InsertOneResult  # noqa: F401
 
+# Evaluation fields covered by the text index, with their relevance weights.
+TEXT_SEARCH_FIELDS = {'process_name': 10, 'submitted_payload.description': 4, 'summary.recommendation_text': 1}
 
-@dataclass
-class InsertOneResult:
-    inserted_id: ObjectId
-
-
-class InMemoryCursor:
-    def __init__(self, docs: list[dict[str, Any]]):
-        self.docs = docs
-
-    def sort(self, key: str, direction: int):
-        self.docs.sort(key=lambda d: d.get(key, datetime.min), reverse=direction < 0)
-        return self
-
-    def __aiter__(self):
-        self._i = 0
-        return self
-
-    async def __anext__(self):
-        if self._i >= len(self.docs):
-            raise StopAsyncIteration
-        item = self.docs[self._i]
-        self._i += 1
-        return dict(item)
-
-
-class InMemoryCollection:
-    def __init__(self):
-        self.docs: list[dict[str, Any]] = []
-
-    async def create_index(self, *_args, **_kwargs):
-        return None
-
-    async def find_one(self, query: dict):
-        for doc in self.docs:
-            if all(doc.get(k) == v for k, v in query.items()):
-                return dict(doc)
-        return None
-
-    async def insert_one(self, doc: dict):
-        new_doc = dict(doc)
-        new_doc['_id'] = ObjectId()
-        self.docs.append(new_doc)
-        return InsertOneResult(inserted_id=new_doc['_id'])
-
-    async def update_one(self, query: dict, update: dict):
-        matched = 0
-        modified = 0
-        for idx, doc in enumerate(self.docs):
-            if all(doc.get(k) == v for k, v in query.items()):
-                matched = 1
-                if '$set' in update and isinstance(update['$set'], dict):
-                    self.docs[idx] = {**doc, **update['$set']}
-                    modified = 1
-                break
-
-        class _Result:
-            matched_count = matched
-            modified_count = modified
-
-        return _Result()
-
-    def find(self, query: dict):
-        out = [d for d in self.docs if all(d.get(k) == v for k, v in query.items())]
-        return InMemoryCursor(out)
-
-    async def count_documents(self, query: dict):
-        return len([d for d in self.docs if all(d.get(k) == v for k, v in query.items())])
-
-
-class InMemoryDB:
-    def __init__(self):
-        self._cols: dict[str, InMemoryCollection] = {}
-
-    def __getitem__(self, name: str):
-        if name not in self._cols:
-            self._cols[name] = InMemoryCollection()
-        return self._cols[name]
+_db = None
 
 
-_db = None
+def _memory_db() -> InMemoryDB:
+    return InMemoryDB(
+        settings.MEMORY_DB_PATH,
+        commit_window=settings.MEMORY_DB_COMMIT_WINDOW_MS / 1000,
+        snapshot_ops=settings.MEMORY_DB_SNAPSHOT_OPS,
+    )
 
 
 def get_db():
     global _db
     if _db is not None:
         return _db
+    if settings.MONGO_URI.startswith('memory://'):
+        _db = _memory_db()
+        return _db
     try:
         client = AsyncIOMotorClient(settings.MONGO_URI)
         _db = client[settings.MONGO_DB]
     except Exception:
-        _db = InMemoryDB()
+        _db = _memory_db()
     return _db
 
 
+async def close_db() -> None:
+    # Flushes the in-memory backend's operation log; Motor clients need no shutdown.
+    if isinstance(_db, InMemoryDB):
+        await _db.close()
+
+
 async def init_db() -> None:
     db = get_db()
     try:
         await db.users.create_index('email', unique=True)
-        # Auto-delete unverified users exactly 5 mins (300s) after creation
+        # Auto-delete unverified users UNVERIFIED_USER_TTL_SECONDS (5 mins) after creation
         await db.users.create_index(
             [('created_at', 1)],
-            expireAfterSeconds=300,
+            expireAfterSeconds=settings.UNVERIFIED_USER_TTL_SECONDS,
             partialFilterExpression={'email_verified': False}
         )
         await db.evaluations.create_index([('user_id', 1), ('created_at', -1)])
+        await db.evaluations.create_index([('user_id', 1), ('is_shortlisted', 1), ('created_at', -1)])
+        await db.evaluations.create_index([('user_id', 1), ('summary.fitment', 1), ('created_at', -1)])
         await db.domain_use_cases.create_index([('user_id', 1), ('created_at', -1)])
         await db.company_use_cases.create_index([('user_id', 1), ('created_at', -1)])
         await db.email_logs.create_index([('user_id', 1), ('created_at', -1)])
+        await db.email_outbox.create_index([('status', 1), ('next_attempt_at', 1)])
+        # Only sent and failed messages have finished_at, so pending ones never expire
+        await db.email_outbox.create_index(
+            [('finished_at', 1)], expireAfterSeconds=settings.EMAIL_OUTBOX_RETENTION_SECONDS
+        )
+        await db.user_daily_stats.create_index([('user_id', 1), ('day', 1)])
+        await db.agent_cache.create_index([('expires_at', 1)], expireAfterSeconds=0)
+    except Exception:
+        pass
+    # Separate so a failure here (e.g. an existing text index with another spec; a collection has only one)
+    # cannot skip the indexes above. Without it, search returns an error but everything else keeps working.
+    try:
+        await db.evaluations.create_index(
+            # The user_id prefix keeps each search within one user's postings.
+            [('user_id', 1), *[(field, 'text') for field in TEXT_SEARCH_FIELDS]],
+            weights=TEXT_SEARCH_FIELDS,
+            name='evaluation_text',
+        )
     except Exception:
         pass
 
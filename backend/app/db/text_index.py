@@ -0,0 +1,113 @@
+"""Inverted index backing ``$text`` queries on the in-memory backend.
+
+It mirrors the parts of a MongoDB text index the API relies on: weighted
+fields, OR-ed search terms with light English stemming and stop words,
+``"quoted phrases"`` that must all appear, and ``-negated`` terms that exclude
+a document. Scores approximate Mongo's ``textScore`` closely enough to rank.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+PHRASE_RE = re.compile(r'"([^"]*)"')
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have in is it its of on or that the this to was were will with'.split()
+)
+_SUFFIXES = ('ational', 'ization', 'ations', 'ation', 'ings', 'ing', 'ness', 'ies', 'ied', 'es', 'ed', 'ly', 's', 'y')
+
+
+# Vocabularies are small next to token counts, so (re)indexing mostly hits this cache.
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not (suffix == 's' and word.endswith('ss')):
+            word = word[: -len(suffix)]
+            break
+    # Drop a final 'e' so invoice / invoices / invoiced share a stem.
+    if word.endswith('e') and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    return [stem(word) for word in WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def parse_search(search: str) -> tuple[set[str], list[str], set[str]]:
+    """Split a ``$search`` string into (terms, phrases, negated terms)."""
+    phrases = [p.strip().lower() for p in PHRASE_RE.findall(search) if p.strip()]
+    rest = PHRASE_RE.sub(' ', search)
+    terms: set[str] = set()
+    negated: set[str] = set()
+    for raw in rest.split():
+        target = negated if raw.startswith('-') else terms
+        target.update(tokenize(raw.lstrip('-')))
+    for phrase in phrases:
+        terms.update(tokenize(phrase))
+    return terms, phrases, negated
+
+
+def get_path(doc: dict, path: str):
+    value = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class TextIndex:
+    def __init__(self, fields: list[str], weights: dict[str, int] | None = None):
+        self.fields = fields
+        self.weights = {field: (weights or {}).get(field, 1) for field in fields}
+        # stem -> doc id -> field -> term frequency
+        self.postings: dict[str, dict] = defaultdict(dict)
+        # doc id -> field -> (token count, lowered text)
+        self.documents: dict = {}
+
+    def add(self, doc: dict) -> None:
+        doc_id = doc['_id']
+        self.remove(doc_id)
+        fields = {}
+        for field in self.fields:
+            value = get_path(doc, field)
+            if not isinstance(value, str) or not value:
+                continue
+            tokens = tokenize(value)
+            fields[field] = (len(tokens), value.lower())
+            for token, freq in Counter(tokens).items():
+                self.postings[token].setdefault(doc_id, {})[field] = freq
+        self.documents[doc_id] = fields
+
+    def remove(self, doc_id) -> None:
+        fields = self.documents.pop(doc_id, None)
+        if not fields:
+            return
+        for _count, text in fields.values():
+            for token in set(tokenize(text)):
+                per_doc = self.postings.get(token)
+                if per_doc is not None:
+                    per_doc.pop(doc_id, None)
+                    if not per_doc:
+                        del self.postings[token]
+
+    def search(self, search: str) -> dict:
+        """Return ``{doc_id: score}`` for documents matching ``search``."""
+        terms, phrases, negated = parse_search(search)
+        scores: dict = defaultdict(float)
+        for term in terms:
+            for doc_id, per_field in self.postings.get(term, {}).items():
+                for field, freq in per_field.items():
+                    count = self.documents[doc_id][field][0]
+                    scores[doc_id] += self.weights[field] * (0.5 + 0.5 * freq / count) * freq
+        for doc_id in list(scores):
+            fields = self.documents[doc_id]
+            if any(doc_id in self.postings.get(term, {}) for term in negated) or not all(
+                any(phrase in text for _count, text in fields.values()) for phrase in phrases
+            ):
+                del scores[doc_id]
+        return scores
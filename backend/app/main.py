@@ -1,30 +1,53 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.auth import router as auth_router
 from app.api.dashboard import router as dashboard_router
 from app.api.evaluations import router as evaluations_router
 from app.api.use_cases import router as use_cases_router
+from app.core.body_limit import BodySizeLimitMiddleware
 from app.core.config import settings
-from app.db.mongo import init_db
+from app.core.security import hash_executor_stats, shutdown_hash_executor
+from app.db.mongo import close_db, init_db
+from app.services import dashboard_cache, user_cache
+from app.services.agent_cache import cache_stats
+from app.services.email_outbox import start_sender, stop_sender
+from app.services.evaluation_jobs import start_workers, stop_workers
+from app.services.mistral import close_client, init_client
+from app.services.sop import shutdown_pool, start_pool
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     await init_db()
-    yield
+    await init_client()
+    await start_workers()
+    start_pool()
+    await start_sender()
+    try:
+        yield
+    finally:
+        await stop_sender()
+        shutdown_hash_executor()
+        shutdown_pool()
+        await stop_workers()
+        await close_client()
+        await close_db()
 
 
 app = FastAPI(title='Avagama.ai API', version='1.0.0', lifespan=lifespan)
 
+# Added first so it runs inside CORS and its 413 responses still carry CORS headers.
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=settings.MAX_REQUEST_BODY_BYTES)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],
     allow_credentials=True,
     allow_methods=['*'],
     allow_headers=['*'],
+    expose_headers=['X-Next-Cursor', 'ETag'],
 )
 
 app.include_router(auth_router)
@@ -36,3 +59,15 @@ app.include_router(use_cases_router)
 @app.get('/health')
 async def health():
     return {'status': 'ok'}
+
+
+@app.get('/metrics')
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail='Not Found')
+    return {
+        'agent_cache': cache_stats(),
+        'dashboard_cache': dashboard_cache.cache_stats(),
+        'user_cache': user_cache.cache_stats(),
+        'password_hashing': hash_executor_stats(),
+    }
@@ -8,6 +8,8 @@ class SopMetadata(BaseModel):
     filename: str
     content_type: str
     size: int
+    sha256: str | None = None
+    text_length: int | None = None
 
 
 class EvaluationCreate(BaseModel):
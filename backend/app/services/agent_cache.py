@@ -0,0 +1,125 @@
+"""Content-addressed cache in front of ``call_agent``.
+
+Responses are keyed by ``(agent_id, normalized content)`` and kept in two tiers:
+an in-process LRU and the ``agent_cache`` Mongo collection, whose documents
+expire through a TTL index on ``expires_at``. Only agents listed in
+``AGENT_CACHE_AGENTS`` are cached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.db.mongo import collection
+from app.services.mistral import call_agent
+from app.services.singleflight import SingleFlight
+
+_memory = LRUCache(settings.AGENT_CACHE_MAX_ENTRIES, ttl_seconds=settings.AGENT_CACHE_TTL_SECONDS)
+_inflight = SingleFlight()
+_counters = {'memory_hits': 0, 'persistent_hits': 0, 'misses': 0, 'bypassed': 0}
+
+
+def _cached_agents() -> set[str]:
+    return {a.strip() for a in settings.AGENT_CACHE_AGENTS.split(',') if a.strip()}
+
+
+def is_cacheable(agent_id: str) -> bool:
+    agents = _cached_agents()
+    return '*' in agents or agent_id in agents
+
+
+def normalize_content(content: str) -> str:
+    # Whitespace-only edits never change the agent's answer, so they share a key.
+    return ' '.join(content.split())
+
+
+def cache_key(agent_id: str, content: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(agent_id.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_content(content).encode('utf-8'))
+    return digest.hexdigest()
+
+
+async def _load_persistent(key: str) -> dict | None:
+    try:
+        doc = await collection('agent_cache').find_one({'_id': key})
+    except Exception:
+        return None
+    if not doc:
+        return None
+    expires_at = doc.get('expires_at')
+    if isinstance(expires_at, datetime):
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        # The TTL monitor only runs once a minute; do not serve entries it has not reaped yet.
+        if expires_at <= datetime.now(timezone.utc):
+            return None
+    return doc.get('response')
+
+
+async def _store_persistent(key: str, agent_id: str, response: dict) -> None:
+    now = datetime.now(timezone.utc)
+    try:
+        await collection('agent_cache').update_one(
+            {'_id': key},
+            {
+                '$set': {
+                    'agent_id': agent_id,
+                    'response': response,
+                    'created_at': now,
+                    'expires_at': now + timedelta(seconds=settings.AGENT_CACHE_TTL_SECONDS),
+                }
+            },
+            upsert=True,
+        )
+    except Exception:
+        pass
+
+
+async def call_agent_cached(agent_id: str, content: str, use_cache: bool = True) -> dict:
+    """Call an agent, serving repeated prompts from cache when the agent opts in.
+
+    ``use_cache=False`` (a ``Cache-Control: no-cache`` request) skips the lookup
+    but still refreshes the stored entry with the new response.
+    """
+    key = cache_key(agent_id, content)
+    if not is_cacheable(agent_id):
+        return await _inflight.do(key, lambda: call_agent(agent_id, content))
+
+    if use_cache:
+        response = _memory.get(key)
+        if response is not None:
+            _counters['memory_hits'] += 1
+            return response
+        response = await _load_persistent(key)
+        if response is not None:
+            _counters['persistent_hits'] += 1
+            _memory.set(key, response)
+            return response
+        _counters['misses'] += 1
+    else:
+        _counters['bypassed'] += 1
+
+    async def fetch() -> dict:
+        response = await call_agent(agent_id, content)
+        _memory.set(key, response)
+        await _store_persistent(key, agent_id, response)
+        return response
+
+    return await _inflight.do(key, fetch)
+
+
+def cache_stats() -> dict:
+    hits = _counters['memory_hits'] + _counters['persistent_hits']
+    lookups = hits + _counters['misses']
+    return {
+        **_counters,
+        'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+        'memory_size': len(_memory),
+        'memory_maxsize': _memory.maxsize,
+        'single_flight': _inflight.stats(),
+    }
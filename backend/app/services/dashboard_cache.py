@@ -0,0 +1,67 @@
+"""Per-user cache of computed dashboard payloads.
+
+Entries are keyed by ``(user_id, days, shortlisted)``. Every write that changes
+a user's dashboard inputs bumps ``dashboard_generation`` on the user document;
+the generation, together with the current UTC day (the date window slides
+daily), is folded into the ETag, so a stale entry simply stops matching.
+Because ``get_current_user`` already loads the user document (through
+``user_cache``), checking the generation costs no extra query.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.db.mongo import collection
+from app.services import user_cache
+
+_entries = LRUCache(settings.DASHBOARD_CACHE_ENTRIES)
+_not_modified = 0
+
+
+def generation(user: dict) -> int:
+    return user.get('dashboard_generation', 0)
+
+
+def make_etag(user: dict, days: int, shortlisted: bool, today: str) -> str:
+    raw = f"{user['id']}|{days}|{int(shortlisted)}|{generation(user)}|{today}"
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    global _not_modified
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    if etag in tags or '*' in tags:
+        _not_modified += 1
+        return True
+    return False
+
+
+def get(user: dict, days: int, shortlisted: bool, etag: str) -> dict | None:
+    # An entry for the same key but an older generation or day is a miss.
+    entry = _entries.get((user['id'], days, shortlisted), accept=lambda entry: entry[0] == etag)
+    return None if entry is None else entry[1]
+
+
+def put(user: dict, days: int, shortlisted: bool, etag: str, payload: dict) -> None:
+    _entries.set((user['id'], days, shortlisted), (etag, payload))
+
+
+async def bump_generations(user_ids) -> None:
+    user_ids = set(user_ids)
+    if user_ids:
+        await collection('users').update_many(
+            {'_id': {'$in': [ObjectId(user_id) for user_id in user_ids]}}, {'$inc': {'dashboard_generation': 1}}
+        )
+        # The generation is read from the cached user document, so drop it to make the bump visible.
+        user_cache.invalidate(*user_ids)
+
+
+def cache_stats() -> dict:
+    return {**_entries.stats(), 'not_modified': _not_modified}
@@ -0,0 +1,279 @@
+"""Transactional email outbox and its background sender.
+
+Handlers call ``enqueue`` (one insert into ``email_outbox`` plus its
+``email_logs`` row) instead of talking SMTP. A sender task started in the app
+lifespan claims due messages in batches and delivers them over one reused,
+authenticated SMTP connection. Failed messages are retried with exponential
+backoff up to ``EMAIL_MAX_ATTEMPTS``, but never past the message's
+``deliver_by`` (a link that arrives after its account or token has expired is
+useless); permanent 5xx refusals are not retried at all. Delivery state is
+mirrored onto the message's ``email_logs`` row (``status``, ``email_sent``,
+``attempts``, ``last_error``). Sent and failed messages get ``finished_at``,
+and a TTL index removes them ``EMAIL_OUTBOX_RETENTION_SECONDS`` later.
+
+smtplib is blocking, so every SMTP call runs on a single dedicated thread,
+which also owns the connection.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.db.mongo import collection
+from app.services.emailer import build_message
+
+_executor: ThreadPoolExecutor | None = None
+_task: asyncio.Task | None = None
+_wakeup: asyncio.Event | None = None
+_smtp: smtplib.SMTP | None = None
+_smtp_used_at = 0.0
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+def _aware(value: datetime) -> datetime:
+    # Motor returns naive UTC datetimes unless the client is tz-aware.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def enqueue(
+    kind: str,
+    to_email: str,
+    link: str,
+    user_id: str | None = None,
+    log_fields: dict | None = None,
+    deliver_by: datetime | None = None,
+) -> ObjectId:
+    """Queue one templated email; returns the id of its ``email_logs`` row.
+
+    ``deliver_by`` is when the email stops being useful; it is not sent or retried after that.
+    """
+    now = _now()
+    log_id = ObjectId()
+    await collection('email_logs').insert_one(
+        {
+            '_id': log_id,
+            'user_id': user_id,
+            'email': to_email,
+            'kind': kind,
+            'status': 'queued',
+            'email_sent': False,
+            'attempts': 0,
+            'created_at': now,
+            **(log_fields or {}),
+        }
+    )
+    await collection('email_outbox').insert_one(
+        {
+            'log_id': log_id,
+            'kind': kind,
+            'to': to_email,
+            'link': link,
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'deliver_by': deliver_by,
+            'created_at': now,
+        }
+    )
+    _get_wakeup().set()
+    return log_id
+
+
+def _close_connection() -> None:
+    global _smtp
+    if _smtp is not None:
+        try:
+            _smtp.quit()
+        except Exception:
+            pass
+        _smtp = None
+
+
+def _connection() -> smtplib.SMTP:
+    global _smtp
+    if _smtp is not None:
+        idle = time.monotonic() - _smtp_used_at
+        if idle > settings.SMTP_IDLE_SECONDS:
+            _close_connection()
+        else:
+            try:
+                _smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                _close_connection()
+    if _smtp is None:
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        try:
+            if settings.SMTP_USE_TLS:
+                server.starttls()
+            if settings.SMTP_USERNAME:
+                server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        _smtp = server
+    return _smtp
+
+
+def _is_permanent(exc: Exception) -> bool:
+    """Whether the server refused this message for good (a 5xx about it, not about the connection)."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _reply in exc.recipients.values())
+    return isinstance(exc, smtplib.SMTPDataError) and exc.smtp_code >= 500
+
+
+def _send_batch(messages: list[dict]) -> list[tuple[str | None, bool]]:
+    """Send ``messages`` over the shared connection; returns ``(error or None, permanent)`` per message."""
+    global _smtp_used_at
+    results: list[tuple[str | None, bool]] = []
+    for message in messages:
+        try:
+            _connection().send_message(build_message(message['kind'], message['to'], message['link']))
+            _smtp_used_at = time.monotonic()
+            results.append((None, False))
+        except smtplib.SMTPRecipientsRefused as exc:
+            results.append((f'recipient refused: {exc.recipients}', _is_permanent(exc)))
+        except (smtplib.SMTPException, OSError) as exc:
+            # The connection may be unusable now; the next message reconnects.
+            _close_connection()
+            results.append((f'{type(exc).__name__}: {exc}', _is_permanent(exc)))
+    return results
+
+
+async def _claim_batch() -> list[dict]:
+    outbox = collection('email_outbox')
+    now = _now()
+    due = await (
+        outbox.find({'status': 'pending', 'next_attempt_at': {'$lte': now}}, {'_id': 1})
+        .sort('next_attempt_at', 1)
+        .limit(settings.EMAIL_BATCH_SIZE)
+        .to_list(length=settings.EMAIL_BATCH_SIZE)
+    )
+    claimed = []
+    for item in due:
+        # Claim one by one so concurrent senders (other processes) never send the same message twice.
+        message = await outbox.find_one_and_update(
+            {'_id': item['_id'], 'status': 'pending'},
+            {'$set': {'status': 'sending', 'claimed_until': now + timedelta(seconds=settings.EMAIL_CLAIM_SECONDS)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if message is not None:
+            claimed.append(message)
+    return claimed
+
+
+def _backoff(attempts: int) -> float:
+    return min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.EMAIL_RETRY_MAX_SECONDS)
+
+
+def _expired(message: dict, at: datetime) -> bool:
+    deliver_by = message.get('deliver_by')
+    return deliver_by is not None and at >= _aware(deliver_by)
+
+
+async def _record(message: dict, error: str | None, permanent: bool = False) -> None:
+    now = _now()
+    attempts = message.get('attempts', 0) + 1
+    next_attempt_at = now + timedelta(seconds=_backoff(attempts))
+    if error is None:
+        outbox_update = {'status': 'sent', 'attempts': attempts, 'sent_at': now, 'finished_at': now}
+        log_update = {'status': 'sent', 'email_sent': True, 'attempts': attempts, 'sent_at': now, 'last_error': None}
+    elif permanent or attempts >= settings.EMAIL_MAX_ATTEMPTS or _expired(message, next_attempt_at):
+        outbox_update = {'status': 'failed', 'attempts': attempts, 'last_error': error, 'finished_at': now}
+        log_update = {'status': 'failed', 'attempts': attempts, 'last_error': error}
+    else:
+        outbox_update = {'status': 'pending', 'attempts': attempts, 'last_error': error, 'next_attempt_at': next_attempt_at}
+        log_update = {'status': 'retrying', 'attempts': attempts, 'last_error': error}
+    await collection('email_outbox').update_one({'_id': message['_id']}, {'$set': outbox_update})
+    await collection('email_logs').update_one({'_id': message['log_id']}, {'$set': log_update})
+
+
+async def _release_stale_claims() -> None:
+    # Messages claimed by a sender that died mid-batch become pending again.
+    await collection('email_outbox').update_many(
+        {'status': 'sending', 'claimed_until': {'$lt': _now()}},
+        {'$set': {'status': 'pending'}},
+    )
+
+
+async def run_once() -> int:
+    """Claim and send one batch; returns how many messages were attempted."""
+    await _release_stale_claims()
+    claimed = await _claim_batch()
+    if not claimed:
+        return 0
+    now = _now()
+    batch = []
+    for message in claimed:
+        if _expired(message, now):
+            await _record(message, 'expired before it could be delivered', permanent=True)
+        else:
+            batch.append(message)
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(_get_executor(), _send_batch, batch) if batch else []
+    for message, (error, permanent) in zip(batch, results):
+        await _record(message, error, permanent)
+    return len(claimed)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='smtp')
+    return _executor
+
+
+async def _sender() -> None:
+    wakeup = _get_wakeup()
+    while True:
+        try:
+            sent = await run_once()
+        except Exception:
+            # Keep the sender alive through database hiccups; the outbox is retried next round.
+            sent = 0
+        if sent:
+            continue
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=settings.EMAIL_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_sender() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_sender())
+
+
+async def stop_sender() -> None:
+    global _task, _executor, _wakeup
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if _executor is not None:
+        await asyncio.get_running_loop().run_in_executor(_executor, _close_connection)
+        _executor.shutdown(wait=False)
+        _executor = None
+    _wakeup = None
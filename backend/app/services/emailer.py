@@ -1,15 +1,19 @@
 from __future__ import annotations
 
-import smtplib
-from email.message import EmailMessage
+import html
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from functools import lru_cache
 
 from app.core.config import settings
 
+# Templates carry this marker where the per-recipient link goes.
+LINK = '__LINK__'
+
 
 def can_send_email() -> bool:
-    return bool(settings.SMTP_HOST and settings.SMTP_USERNAME and settings.SMTP_PASSWORD and settings.SMTP_FROM)
+    # Credentials are optional (a local relay may not need them) but must come as a pair.
+    return bool(settings.SMTP_HOST and settings.SMTP_FROM) and bool(settings.SMTP_USERNAME) == bool(settings.SMTP_PASSWORD)
 
 
 # Base64 and remote SVGs are aggressively blocked by Outlook/Gmail. 
@@ -54,18 +58,14 @@ def _email_wrapper(body_html: str) -> str:
 </html>"""
 
 
-def send_verification_email(to_email: str, verify_link: str) -> bool:
-    if not can_send_email():
-        return False
-
-    body_html = f"""\
+VERIFICATION_BODY = f"""\
 <h2 style="font-size:22px;font-weight:700;color:#1f2937;margin:0 0 8px;">Welcome to Avagama.ai! 🎉</h2>
 <p style="font-size:14px;color:#6b7280;line-height:1.6;margin:0 0 24px;">
   Thank you for signing up. Please verify your email address to get started with AI-powered process evaluation.
 </p>
 <table width="100%" cellpadding="0" cellspacing="0">
 <tr><td align="center" style="padding:8px 0 24px;">
-  <a href="{verify_link}" style="display:inline-block;background:linear-gradient(135deg,#b28bc5,#9e6eb1);color:#fff;
+  <a href="{LINK}" style="display:inline-block;background:linear-gradient(135deg,#b28bc5,#9e6eb1);color:#fff;
     text-decoration:none;padding:12px 36px;border-radius:8px;font-size:15px;font-weight:600;letter-spacing:.01em;">
     Verify my email
   </a>
@@ -73,43 +73,21 @@ def send_verification_email(to_email: str, verify_link: str) -> bool:
 </table>
 <p style="font-size:13px;color:#9ca3af;line-height:1.6;margin:0;">
   Or copy and paste this link into your browser:<br/>
-  <a href="{verify_link}" style="color:#9b51a5;word-break:break-all;">{verify_link}</a>
+  <a href="{LINK}" style="color:#9b51a5;word-break:break-all;">{LINK}</a>
 </p>
 <hr style="border:none;border-top:1px solid #f3f4f6;margin:24px 0 16px;"/>
 <p style="font-size:12px;color:#b0b5bc;margin:0;">
   This link is valid for 5 minutes. If you did not create this account, you can safely ignore this email.
 </p>"""
 
-    msg = MIMEMultipart('alternative')
-    msg['Subject'] = 'Verify your Avagama.ai account'
-    msg['From'] = settings.SMTP_FROM
-    msg['To'] = to_email
-    msg.attach(MIMEText(
-        f"Welcome to Avagama.ai!\n\nPlease verify your email by clicking the link below (valid for 5 minutes):\n{verify_link}\n\n"
-        f"If you did not create this account, you can ignore this message.",
-        'plain'
-    ))
-    msg.attach(MIMEText(_email_wrapper(body_html), 'html'))
-
-    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=5) as server:
-        server.starttls()
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(msg)
-    return True
-
-
-def send_password_reset_email(to_email: str, reset_link: str) -> bool:
-    if not can_send_email():
-        return False
-
-    body_html = f"""\
+PASSWORD_RESET_BODY = f"""\
 <h2 style="font-size:22px;font-weight:700;color:#1f2937;margin:0 0 8px;">Reset your password</h2>
 <p style="font-size:14px;color:#6b7280;line-height:1.6;margin:0 0 24px;">
   We received a request to reset the password for your Avagama.ai account. Click the button below to set a new password.
 </p>
 <table width="100%" cellpadding="0" cellspacing="0">
 <tr><td align="center" style="padding:8px 0 24px;">
-  <a href="{reset_link}" style="display:inline-block;background:linear-gradient(135deg,#b28bc5,#9e6eb1);color:#fff;
+  <a href="{LINK}" style="display:inline-block;background:linear-gradient(135deg,#b28bc5,#9e6eb1);color:#fff;
     text-decoration:none;padding:12px 36px;border-radius:8px;font-size:15px;font-weight:600;letter-spacing:.01em;">
     Reset password
   </a>
@@ -117,27 +95,44 @@ def send_password_reset_email(to_email: str, reset_link: str) -> bool:
 </table>
 <p style="font-size:13px;color:#9ca3af;line-height:1.6;margin:0;">
   Or copy and paste this link into your browser:<br/>
-  <a href="{reset_link}" style="color:#9b51a5;word-break:break-all;">{reset_link}</a>
+  <a href="{LINK}" style="color:#9b51a5;word-break:break-all;">{LINK}</a>
 </p>
 <hr style="border:none;border-top:1px solid #f3f4f6;margin:24px 0 16px;"/>
 <p style="font-size:12px;color:#b0b5bc;margin:0;">
   This link is valid for 5 minutes. If you did not request a password reset, you can safely ignore this email.
 </p>"""
 
+# kind -> (subject, plain-text body, HTML card body)
+TEMPLATES = {
+    'verification': (
+        'Verify your Avagama.ai account',
+        f"Welcome to Avagama.ai!\n\nPlease verify your email by clicking the link below (valid for 5 minutes):\n{LINK}\n\n"
+        f"If you did not create this account, you can ignore this message.",
+        VERIFICATION_BODY,
+    ),
+    'password_reset': (
+        'Reset your Avagama.ai password',
+        f"You requested a password reset for your Avagama.ai account.\n\n"
+        f"Click the link below to reset your password (valid for 5 minutes):\n{LINK}\n\n"
+        f"If you did not request this, you can safely ignore this email.",
+        PASSWORD_RESET_BODY,
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _rendered(kind: str) -> tuple[str, str, str]:
+    """Subject, text and full HTML for ``kind``, wrapped once and reused for every message."""
+    subject, text, body_html = TEMPLATES[kind]
+    return subject, text, _email_wrapper(body_html)
+
+
+def build_message(kind: str, to_email: str, link: str) -> MIMEMultipart:
+    subject, text, page = _rendered(kind)
     msg = MIMEMultipart('alternative')
-    msg['Subject'] = 'Reset your Avagama.ai password'
+    msg['Subject'] = subject
     msg['From'] = settings.SMTP_FROM
     msg['To'] = to_email
-    msg.attach(MIMEText(
-        f"You requested a password reset for your Avagama.ai account.\n\n"
-        f"Click the link below to reset your password (valid for 5 minutes):\n{reset_link}\n\n"
-        f"If you did not request this, you can safely ignore this email.",
-        'plain'
-    ))
-    msg.attach(MIMEText(_email_wrapper(body_html), 'html'))
-
-    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=5) as server:
-        server.starttls()
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(msg)
-    return True
+    msg.attach(MIMEText(text.replace(LINK, link), 'plain'))
+    msg.attach(MIMEText(page.replace(LINK, html.escape(link)), 'html'))
+    return msg
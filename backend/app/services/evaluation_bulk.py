@@ -0,0 +1,98 @@
+"""Bulk shortlist, unshortlist and delete of a user's evaluations.
+
+The targets are read once, then each change is a guarded find-and-modify,
+all of them issued concurrently, and each id gets its own outcome. A write is
+guarded by the state that was read, so a concurrent change makes it match
+nothing instead of changing the wrong document. Side data is kept in step
+afterwards from the documents the writes actually changed: rollups (which also
+invalidate the dashboard cache), cold payloads and the similarity index.
+
+The writes are not one ``bulk_write``: its result only has totals, and the
+side data needs to know which ids changed and what they held before. The
+per-id writes run concurrently, so the cost is one round trip of latency,
+not one per id; requests are capped at ``BULK_MAX_IDS``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.db.mongo import collection
+from app.services import similarity
+from app.services.rollups import ROLLUP_PROJECTION, is_countable, record_evaluations, record_shortlist_changes
+
+ACTIONS = ('shortlist', 'unshortlist', 'delete')
+_DONE = {'shortlist': 'shortlisted', 'unshortlist': 'unshortlisted', 'delete': 'deleted'}
+
+
+def _plan(action: str, item: dict):
+    """Return ``(outcome, write)`` for one loaded evaluation; ``write`` is None when nothing changes.
+
+    ``write`` is a coroutine resolving to the document as it was before the
+    change, or None when the guard no longer matches.
+    """
+    evaluations = collection('evaluations')
+    guard = {'_id': item['_id'], 'user_id': item['user_id']}
+    if action == 'delete':
+        return _DONE[action], evaluations.find_one_and_delete(guard, projection=ROLLUP_PROJECTION)
+    shortlisted = action == 'shortlist'
+    if bool(item.get('is_shortlisted')) == shortlisted:
+        return 'unchanged', None
+    if shortlisted and not is_countable(item):
+        return 'not_completed', None
+    # Shortlisted evaluations carry status 'Shortlisted'; unshortlisting returns them to 'Completed'.
+    update = {'$set': {'is_shortlisted': shortlisted, 'status': 'Shortlisted' if shortlisted else 'Completed'}}
+    guard['is_shortlisted'] = True if not shortlisted else {'$ne': True}
+    return _DONE[action], evaluations.find_one_and_update(guard, update, projection=ROLLUP_PROJECTION)
+
+
+async def apply_bulk(user_id: str, action: str, evaluation_ids: list[str]) -> dict:
+    outcomes: dict[str, str] = {}
+    oids = {}
+    for evaluation_id in evaluation_ids:
+        try:
+            oids[evaluation_id] = ObjectId(evaluation_id)
+        except (InvalidId, TypeError):
+            outcomes[evaluation_id] = 'invalid_id'
+
+    targets = []
+    if oids:
+        cursor = collection('evaluations').find(
+            {'_id': {'$in': list(oids.values())}, 'user_id': user_id}, {**ROLLUP_PROJECTION, 'status': 1}
+        )
+        targets = [item async for item in cursor]
+    found = {str(item['_id']): item for item in targets}
+
+    planned = {}
+    for evaluation_id in oids:
+        item = found.get(evaluation_id)
+        if item is None:
+            outcomes[evaluation_id] = 'not_found'
+            continue
+        outcome, write = _plan(action, item)
+        outcomes[evaluation_id] = outcome
+        if write is not None:
+            planned[evaluation_id] = write
+
+    changed = []
+    for evaluation_id, before in zip(planned, await asyncio.gather(*planned.values())):
+        if before is None:
+            # A concurrent request got there first; it owns the side effects.
+            outcomes[evaluation_id] = 'not_found' if action == 'delete' else 'unchanged'
+        else:
+            changed.append(before)
+
+    if action == 'delete' and changed:
+        await collection('evaluation_payloads').delete_many({'_id': {'$in': [item['_id'] for item in changed]}})
+        for item in changed:
+            similarity.remove(user_id, str(item['_id']))
+        await record_evaluations([item for item in changed if item.get('in_rollups')], sign=-1)
+    elif changed:
+        await record_shortlist_changes(changed, shortlisted=action == 'shortlist')
+
+    results = [{'id': evaluation_id, 'outcome': outcomes[evaluation_id]} for evaluation_id in dict.fromkeys(evaluation_ids)]
+    return {'action': action, 'results': results, 'counts': dict(Counter(r['outcome'] for r in results))}
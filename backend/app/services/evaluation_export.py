@@ -0,0 +1,143 @@
+"""Streaming export of a user's evaluations as NDJSON or CSV.
+
+Rows are read from a cursor and written out in batches, so memory stays
+constant however many evaluations a user has. Only ``parsed_content`` lives in
+``evaluation_payloads``; when it is requested the payloads are fetched one
+batch at a time with a single ``$in`` query; evaluations stored before the
+payload split still have it inline.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from collections.abc import AsyncIterator, Callable
+
+from app.db.mongo import collection
+from app.services.evaluation_payloads import unpack
+
+
+def _summary(field: str) -> Callable[[dict], object]:
+    return lambda item: (item.get('summary') or {}).get(field)
+
+
+def _submitted(field: str) -> Callable[[dict], object]:
+    return lambda item: (item.get('submitted_payload') or {}).get(field)
+
+
+# Export fields read from ``submitted_payload``, which is only loaded (per field) when one is requested.
+SUBMITTED_FIELDS = ('description', 'volume', 'frequency', 'exception_rate', 'complexity')
+
+
+EXPORT_FIELDS: dict[str, Callable[[dict], object]] = {
+    'id': lambda item: str(item['_id']),
+    'process_name': lambda item: item.get('process_name'),
+    'created_at': lambda item: item['created_at'].isoformat() if item.get('created_at') else None,
+    'status': lambda item: item.get('status', 'Completed'),
+    'is_shortlisted': lambda item: item.get('is_shortlisted', False),
+    'automation_score': _summary('automation_score'),
+    'feasibility_score': _summary('feasibility_score'),
+    'fitment': _summary('fitment'),
+    'llm_type': _summary('llm_type'),
+    **{name: _submitted(name) for name in SUBMITTED_FIELDS},
+    'parsed_content': lambda item: item.get('parsed_content'),
+}
+DEFAULT_FIELDS = (
+    'id', 'process_name', 'created_at', 'status', 'is_shortlisted',
+    'automation_score', 'feasibility_score', 'fitment', 'llm_type',
+)
+# Hot-document fields each export field needs.
+_PROJECTION = {
+    'process_name': 1,
+    'created_at': 1,
+    'status': 1,
+    'is_shortlisted': 1,
+    'summary': 1,
+}
+BATCH_SIZE = 500
+
+
+def _projection(fields: list[str]) -> dict:
+    projection = dict(_PROJECTION)
+    if 'parsed_content' in fields:
+        projection['parsed_content'] = 1
+    for name in fields:
+        if name in SUBMITTED_FIELDS:
+            projection[f'submitted_payload.{name}'] = 1
+    return projection
+
+
+def parse_fields(fields: str | None) -> list[str]:
+    """Validate a comma-separated field list; raises ValueError on unknown names."""
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in EXPORT_FIELDS]
+    if unknown or not names:
+        raise ValueError(f"Unknown export fields: {', '.join(unknown) or '(none)'}")
+    return list(dict.fromkeys(names))
+
+
+async def _batches(query: dict, fields: list[str]) -> AsyncIterator[list[dict]]:
+    cursor = (
+        collection('evaluations')
+        .find(query, _projection(fields))
+        .sort([('created_at', -1), ('_id', -1)])
+        .batch_size(BATCH_SIZE)
+    )
+    batch = []
+    async for item in cursor:
+        batch.append(item)
+        if len(batch) == BATCH_SIZE:
+            yield await _rows(batch, fields)
+            batch = []
+    if batch:
+        yield await _rows(batch, fields)
+
+
+async def _rows(batch: list[dict], fields: list[str]) -> list[dict]:
+    if 'parsed_content' in fields:
+        payloads = collection('evaluation_payloads').find({'_id': {'$in': [item['_id'] for item in batch]}})
+        contents = {}
+        async for payload in payloads:
+            contents[payload['_id']] = unpack(payload['data']).get('parsed_content')
+        for item in batch:
+            if item['_id'] in contents:
+                item['parsed_content'] = contents[item['_id']]
+    return [{name: EXPORT_FIELDS[name](item) for name in fields} for item in batch]
+
+
+async def iter_ndjson(query: dict, fields: list[str]) -> AsyncIterator[bytes]:
+    async for rows in _batches(query, fields):
+        yield ''.join(json.dumps(row, default=str) + '\n' for row in rows).encode('utf-8')
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return '' if value is None else value
+
+
+async def iter_csv(query: dict, fields: list[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for rows in _batches(query, fields):
+        for row in rows:
+            writer.writerow([_csv_value(row[name]) for name in fields])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
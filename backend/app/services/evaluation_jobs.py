@@ -0,0 +1,252 @@
+"""Background worker pool for job-mode evaluations.
+
+``POST /api/evaluations?mode=job`` stores the evaluation as ``Queued`` and
+hands its id to this module. A bounded pool of workers started in the app
+lifespan runs the agent call and moves the document through ``Running`` to
+``Completed`` or ``Failed``. A worker claims a job with one atomic update that
+sets ``Running``, a ``lease_until`` deadline and its own ``lease_id``; the
+final update only applies while that lease is still held, so a job is run and
+counted once even when several processes share the collection. A lease is not
+renewed, so it must outlast the agent call; jobs whose lease ran out (their
+worker died) are requeued at startup and then periodically. Status changes are
+published to in-process subscribers so ``GET /api/evaluations/{id}/events``
+can push them as server-sent events; subscribers also re-read the document
+periodically so jobs run by another process are still reported.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.db.mongo import collection
+from app.services import quota, similarity
+from app.services.agent_cache import call_agent_cached
+from app.services.evaluation_payloads import load_payload, save_payload
+from app.services.evaluation_summary import build_summary
+from app.services.mistral import extract_content
+from app.services.rollups import record_evaluations
+
+TERMINAL_STATUSES = {'Completed', 'Failed', 'Shortlisted'}
+
+_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+_subscribers: dict[str, set[asyncio.Queue]] = {}
+
+
+def _get_queue() -> asyncio.Queue:
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=settings.EVALUATION_QUEUE_SIZE)
+    return _queue
+
+
+def is_full() -> bool:
+    return _get_queue().full()
+
+
+def enqueue(evaluation_id: str, use_cache: bool = True) -> None:
+    _get_queue().put_nowait((evaluation_id, use_cache))
+
+
+def subscribe(evaluation_id: str) -> asyncio.Queue:
+    queue: asyncio.Queue = asyncio.Queue()
+    _subscribers.setdefault(evaluation_id, set()).add(queue)
+    return queue
+
+
+def unsubscribe(evaluation_id: str, queue: asyncio.Queue) -> None:
+    subscribers = _subscribers.get(evaluation_id)
+    if subscribers is None:
+        return
+    subscribers.discard(queue)
+    if not subscribers:
+        del _subscribers[evaluation_id]
+
+
+def _publish(evaluation_id: str, status: str) -> None:
+    for queue in _subscribers.get(evaluation_id, ()):
+        queue.put_nowait(status)
+
+
+def _expired(now: datetime) -> dict:
+    # Running jobs whose lease ran out, or that never had one.
+    return {'status': 'Running', 'lease_until': {'$not': {'$gte': now}}}
+
+
+def _claimable(now: datetime) -> dict:
+    return {'$or': [{'status': 'Queued'}, _expired(now)]}
+
+
+async def _claim(evaluation_id: str) -> dict | None:
+    now = datetime.now(timezone.utc)
+    item = await collection('evaluations').find_one_and_update(
+        {'_id': ObjectId(evaluation_id), **_claimable(now)},
+        {
+            '$set': {
+                'status': 'Running',
+                'started_at': now,
+                'lease_id': ObjectId(),
+                'lease_until': now + timedelta(seconds=settings.EVALUATION_JOB_LEASE_SECONDS),
+            }
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if item is not None:
+        _publish(evaluation_id, 'Running')
+    return item
+
+
+async def _finish(item: dict, status: str, fields: dict) -> bool:
+    """Move a claimed job to its final status; False if the lease was lost to another worker."""
+    result = await collection('evaluations').update_one(
+        {'_id': item['_id'], 'status': 'Running', 'lease_id': item['lease_id']},
+        {'$set': {'status': status, **fields}, '$unset': {'lease_id': '', 'lease_until': ''}},
+    )
+    if not result.modified_count:
+        return False
+    _publish(str(item['_id']), status)
+    return True
+
+
+async def _complete(item: dict, use_cache: bool) -> dict | None:
+    """Run the agent for a claimed job and store the result; its summary, or None if the lease was lost."""
+    payload = await load_payload(item['_id'], item)
+    agent_response = await call_agent_cached(settings.PROCESS_AGENT_ID, payload['formatted_message'], use_cache=use_cache)
+    content = extract_content(agent_response)
+    payload.update(agent_response=agent_response, parsed_content=content)
+    await save_payload(item['_id'], item['user_id'], payload)
+    summary = build_summary(content)
+    completed = await _finish(
+        item,
+        'Completed',
+        {
+            'summary': summary,
+            'agent_error': None,
+            'in_rollups': True,
+            'completed_at': datetime.now(timezone.utc),
+        },
+    )
+    return summary if completed else None
+
+
+async def _run_job(evaluation_id: str, use_cache: bool) -> None:
+    item = await _claim(evaluation_id)
+    if item is None:
+        # Already running elsewhere, finished, or deleted.
+        return
+
+    try:
+        summary = await _complete(item, use_cache)
+    except Exception as exc:
+        # Any failure while the job is held ends it, not only the agent call, so it never stays Running.
+        failed = await _finish(
+            item,
+            'Failed',
+            {'agent_error': str(getattr(exc, 'detail', exc)), 'completed_at': datetime.now(timezone.utc)},
+        )
+        if failed:
+            # The evaluation was reserved at submit time; a failed job does not use it up.
+            await quota.release(quota.EVALUATIONS, item['user_id'])
+        return
+    if summary is None:
+        return
+    await record_evaluations([{**item, 'summary': summary}])
+    description = (item.get('submitted_payload') or {}).get('description')
+    similarity.add(item['user_id'], evaluation_id, item.get('process_name'), description)
+
+
+async def _worker() -> None:
+    queue = _get_queue()
+    while True:
+        evaluation_id, use_cache = await queue.get()
+        try:
+            await _run_job(evaluation_id, use_cache)
+        except Exception:
+            # A broken document must not take the worker down with it.
+            pass
+        finally:
+            queue.task_done()
+
+
+async def _requeue(query: dict) -> None:
+    # A job that another live process also queued is still claimed only once.
+    cursor = collection('evaluations').find(query, {'_id': 1})
+    async for item in cursor:
+        if is_full():
+            break
+        enqueue(str(item['_id']))
+
+
+async def _requeue_pending() -> None:
+    # At startup: Queued jobs and Running jobs whose lease ran out (their process died) are picked up again.
+    await _requeue(_claimable(datetime.now(timezone.utc)))
+
+
+async def _requeue_expired() -> None:
+    # While running: leases held by a worker (in any process) that died since startup.
+    while True:
+        await asyncio.sleep(settings.EVALUATION_REQUEUE_INTERVAL_SECONDS)
+        try:
+            await _requeue(_expired(datetime.now(timezone.utc)))
+        except Exception:
+            pass
+
+
+async def start_workers() -> None:
+    if _workers:
+        return
+    for _ in range(settings.EVALUATION_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+    _workers.append(asyncio.create_task(_requeue_expired()))
+    try:
+        await _requeue_pending()
+    except Exception:
+        pass
+
+
+async def stop_workers() -> None:
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+def _event(evaluation_id: str, status: str) -> str:
+    return f"event: status\ndata: {json.dumps({'id': evaluation_id, 'status': status})}\n\n"
+
+
+async def _current_status(evaluation_id: str) -> str | None:
+    item = await collection('evaluations').find_one({'_id': ObjectId(evaluation_id)}, {'status': 1})
+    return item.get('status', 'Completed') if item else None
+
+
+async def status_events(evaluation_id: str):
+    """Yield SSE frames for every status change until the evaluation is terminal."""
+    # Subscribe before reading so a change between the two is never missed.
+    queue = subscribe(evaluation_id)
+    try:
+        status = await _current_status(evaluation_id)
+        if status is None:
+            return
+        yield _event(evaluation_id, status)
+        while status not in TERMINAL_STATUSES:
+            try:
+                new_status = await asyncio.wait_for(queue.get(), timeout=settings.EVALUATION_EVENTS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                new_status = await _current_status(evaluation_id)
+                if new_status is None:
+                    return
+                if new_status == status:
+                    yield ': keep-alive\n\n'
+                    continue
+            if new_status != status:
+                status = new_status
+                yield _event(evaluation_id, status)
+    finally:
+        unsubscribe(evaluation_id, queue)
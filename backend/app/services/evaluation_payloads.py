@@ -0,0 +1,74 @@
+"""Cold storage for the large parts of an evaluation.
+
+``agent_response``, ``formatted_message`` (which embeds the SOP text) and
+``parsed_content`` are only needed when a single evaluation is opened, so they
+live zlib-compressed in ``evaluation_payloads`` under the evaluation's ``_id``
+and keep the hot ``evaluations`` collection small. Evaluations stored before
+the split (until ``split-payloads`` has run) still carry them inline.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from datetime import datetime, timezone
+
+from bson import Binary, ObjectId
+
+from app.db.mongo import collection
+
+PAYLOAD_FIELDS = ('agent_response', 'formatted_message', 'parsed_content')
+RAW_FIELDS = ('agent_response', 'formatted_message')
+
+
+def _strip_duplicates(fields: dict) -> dict:
+    content = fields.get('parsed_content')
+    if isinstance(content, dict) and 'process_characteristics' in content:
+        if content['process_characteristics'] == content.get('dimensions'):
+            # extract_content copies dimensions into process_characteristics; store it once.
+            content = {k: v for k, v in content.items() if k != 'process_characteristics'}
+            fields = {**fields, 'parsed_content': content}
+    return fields
+
+
+def _restore_duplicates(fields: dict) -> dict:
+    content = fields.get('parsed_content')
+    if isinstance(content, dict) and 'process_characteristics' not in content and isinstance(content.get('dimensions'), dict):
+        content['process_characteristics'] = content['dimensions']
+    return fields
+
+
+def pack(fields: dict) -> Binary:
+    raw = json.dumps(_strip_duplicates(fields), separators=(',', ':'), default=str).encode('utf-8')
+    return Binary(zlib.compress(raw, 6))
+
+
+def unpack(data: bytes) -> dict:
+    return _restore_duplicates(json.loads(zlib.decompress(data)))
+
+
+def payload_document(evaluation_id: ObjectId, user_id: str, fields: dict) -> dict:
+    return {
+        '_id': evaluation_id,
+        'user_id': user_id,
+        'codec': 'zlib',
+        'data': pack({k: fields.get(k) for k in PAYLOAD_FIELDS}),
+        'updated_at': datetime.now(timezone.utc),
+    }
+
+
+async def save_payload(evaluation_id: ObjectId, user_id: str, fields: dict) -> None:
+    doc = payload_document(evaluation_id, user_id, fields)
+    await collection('evaluation_payloads').replace_one({'_id': evaluation_id}, doc, upsert=True)
+
+
+async def load_payload(evaluation_id: ObjectId, item: dict | None = None) -> dict:
+    """The payload fields of an evaluation; without a payload document, the inline fields of ``item``."""
+    doc = await collection('evaluation_payloads').find_one({'_id': evaluation_id})
+    if not doc:
+        return {k: (item or {}).get(k) for k in PAYLOAD_FIELDS}
+    return unpack(doc['data'])
+
+
+async def delete_payload(evaluation_id: ObjectId) -> None:
+    await collection('evaluation_payloads').delete_one({'_id': evaluation_id})
@@ -0,0 +1,85 @@
+"""Full-text search over a user's evaluations.
+
+Matching and ranking come from the ``evaluation_text`` index (a Mongo text
+index, or the in-memory backend's inverted index); highlighting is done here
+on the returned page only, using the same tokenizer and stemmer.
+"""
+
+from __future__ import annotations
+
+from app.db.mongo import TEXT_SEARCH_FIELDS, collection
+from app.db.text_index import WORD_RE, get_path, parse_search, stem
+
+SNIPPET_CHARS = 160
+SEARCH_PROJECTION = {
+    'process_name': 1,
+    'created_at': 1,
+    'status': 1,
+    'is_shortlisted': 1,
+    'summary': 1,
+    'submitted_payload.description': 1,
+    'score': {'$meta': 'textScore'},
+}
+
+
+def highlight(text: str, search: str) -> dict | None:
+    """Return a snippet of ``text`` around the first match, with match offsets into the snippet."""
+    terms, phrases, _negated = parse_search(search)
+    lowered = text.lower()
+    spans = [
+        (m.start(), m.end()) for m in WORD_RE.finditer(lowered) if stem(m.group()) in terms
+    ]
+    for phrase in phrases:
+        start = lowered.find(phrase)
+        while start != -1:
+            spans.append((start, start + len(phrase)))
+            start = lowered.find(phrase, start + 1)
+    if not spans:
+        return None
+    spans.sort()
+    merged = [spans[0]]
+    for start, stop in spans[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    spans = merged
+    begin = max(0, spans[0][0] - SNIPPET_CHARS // 4)
+    end = min(len(text), begin + SNIPPET_CHARS)
+    return {
+        'text': text[begin:end],
+        'matches': [[s - begin, e - begin] for s, e in spans if s >= begin and e <= end],
+        'truncated_start': begin > 0,
+        'truncated_end': end < len(text),
+    }
+
+
+async def search_evaluations(user_id: str, search: str, limit: int) -> list[dict]:
+    cursor = (
+        collection('evaluations')
+        .find({'user_id': user_id, '$text': {'$search': search}}, SEARCH_PROJECTION)
+        .sort([('score', {'$meta': 'textScore'})])
+        .limit(limit)
+    )
+    results = []
+    async for item in cursor:
+        summary = item.get('summary') or {}
+        highlights = {}
+        for field in TEXT_SEARCH_FIELDS:
+            value = get_path(item, field)
+            if isinstance(value, str) and (snippet := highlight(value, search)):
+                highlights[field] = snippet
+        results.append(
+            {
+                'id': str(item['_id']),
+                'process_name': item.get('process_name'),
+                'created_at': item.get('created_at'),
+                'automation_score': summary.get('automation_score'),
+                'fitment': summary.get('fitment'),
+                'status': item.get('status', 'Completed'),
+                'is_shortlisted': item.get('is_shortlisted', False),
+                'score': round(item.get('score', 0), 4),
+                'highlights': highlights,
+            }
+        )
+    return results
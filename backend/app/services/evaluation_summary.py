@@ -0,0 +1,58 @@
+"""Flat summary of an evaluation's agent output.
+
+The agent's ``parsed_content`` varies in shape (``business_benefit_score`` may
+be a dict or a number, the LLM type may be under ``llm_recommendation`` or
+``llm_type``). It is normalized once at write time into ``summary`` so list and
+dashboard reads never have to parse it. ``recommendation_text`` flattens the
+agent's prose so the text index can cover it.
+"""
+
+from __future__ import annotations
+
+SUMMARY_VERSION = 2
+RECOMMENDATION_FIELDS = ('recommendations', 'detailed_recommendations', 'reasoning')
+RECOMMENDATION_TEXT_LIMIT = 2000
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    return value if isinstance(value, (int, float)) else None
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+
+def recommendation_text(content: dict) -> str | None:
+    parts = [s.strip() for field in RECOMMENDATION_FIELDS for s in _strings(content.get(field)) if s.strip()]
+    return ' '.join(parts)[:RECOMMENDATION_TEXT_LIMIT] or None
+
+
+def build_summary(content) -> dict:
+    content = content if isinstance(content, dict) else {}
+
+    # feasibility_score can be a dict like { 'score': 65 } or a plain number
+    feas = content.get('business_benefit_score')
+    if isinstance(feas, dict):
+        feas = feas.get('score') or feas.get('value') or 0
+
+    recs = content.get('recommendations')
+    recs = recs if isinstance(recs, dict) else {}
+    fitment = content.get('fitment')
+
+    return {
+        'version': SUMMARY_VERSION,
+        'automation_score': _number(content.get('automation_feasibility_score')),
+        'feasibility_score': _number(feas),
+        'fitment': fitment.strip() if isinstance(fitment, str) and fitment.strip() else None,
+        'llm_type': recs.get('llm_recommendation') or recs.get('llm_type'),
+        'recommendation_text': recommendation_text(content),
+    }
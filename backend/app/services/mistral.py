@@ -1,10 +1,62 @@
+import json
+
 import httpx
 from fastapi import HTTPException
 
 from app.core.config import settings
 
+_client: httpx.AsyncClient | None = None
+
+
+def _timeout(read_seconds: float | None = None) -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=settings.MISTRAL_CONNECT_TIMEOUT_SECONDS,
+        read=read_seconds if read_seconds is not None else settings.MISTRAL_READ_TIMEOUT_SECONDS,
+        write=settings.MISTRAL_WRITE_TIMEOUT_SECONDS,
+        pool=settings.MISTRAL_POOL_TIMEOUT_SECONDS,
+    )
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.MISTRAL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.MISTRAL_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.MISTRAL_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=_timeout(),
+        http2=settings.MISTRAL_HTTP2,
+        headers={
+            'Authorization': f'Bearer {settings.MISTRAL_API_KEY}',
+            'Content-Type': 'application/json',
+        },
+    )
+
+
+async def init_client() -> None:
+    """Create the shared, pooled client used for every agent call."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
 
-async def call_agent(agent_id: str, content: str, timeout_seconds: float = 300.0) -> dict:
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    # Scripts and tests that never run the app lifespan still get a pooled client.
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def call_agent(agent_id: str, content: str, timeout_seconds: float | None = None) -> dict:
     payload = {
         'agent_id': agent_id,
         'messages': [
@@ -14,16 +66,39 @@ async def call_agent(agent_id: str, content: str, timeout_seconds: float = 300.0
             }
         ],
     }
-    headers = {
-        'Authorization': f'Bearer {settings.MISTRAL_API_KEY}',
-        'Content-Type': 'application/json',
-    }
     try:
-        async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-            response = await client.post(settings.MISTRAL_API_URL, headers=headers, json=payload)
+        response = await get_client().post(
+            settings.MISTRAL_API_URL,
+            json=payload,
+            timeout=_timeout(timeout_seconds),
+        )
         response.raise_for_status()
         return response.json()
     except httpx.TimeoutException as exc:
         raise HTTPException(status_code=504, detail='Mistral request timed out') from exc
     except httpx.HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f'Mistral API error: {exc.response.text}') from exc
+
+
+def extract_content(agent_json: dict):
+    try:
+        content = agent_json['choices'][0]['message']['content']
+        if isinstance(content, str):
+            text = content.strip()
+            if text.startswith('```'):
+                text = text.split('\n', 1)[1] if '\n' in text else text
+                if text.endswith('```'):
+                    text = text[:-3]
+                text = text.strip()
+            try:
+                parsed = json.loads(text)
+                if isinstance(parsed, dict):
+                    if 'process_characteristics' not in parsed and isinstance(parsed.get('dimensions'), dict):
+                        parsed['process_characteristics'] = parsed['dimensions']
+                    return parsed
+                return {'raw_text': content}
+            except json.JSONDecodeError:
+                return {'raw_text': content}
+        return content
+    except Exception:
+        return None
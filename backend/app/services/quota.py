@@ -0,0 +1,93 @@
+"""Per-user usage quotas reserved with a single atomic update.
+
+``reserve`` increments a counter on the user document only while it is below
+the user's limit, in one ``find_one_and_update``, so parallel requests cannot
+overrun the limit. Callers reserve before doing the expensive work and
+``release`` if that work fails; ``reserved`` wraps both, and skips the
+database entirely for a user with no limit on a quota whose usage is not
+counted.
+"""
+
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.db.mongo import collection
+from app.services import user_cache
+
+
+@dataclass(frozen=True)
+class Quota:
+    counter: str
+    limit_field: str
+    # Used when the user document has no limit field; None means unlimited.
+    default_limit: int | None
+    detail: str
+    # Whether usage is still counted when unlimited (evaluation_count is shown to users; use_case_count is not).
+    count_unlimited: bool = True
+
+
+EVALUATIONS = Quota(
+    'evaluation_count', 'evaluation_limit', settings.DEFAULT_EVALUATION_LIMIT, 'You have reached your evaluation limit.'
+)
+USE_CASES = Quota(
+    'use_case_count',
+    'use_case_limit',
+    settings.DEFAULT_USE_CASE_LIMIT,
+    'You have reached your use-case discovery limit.',
+    count_unlimited=False,
+)
+
+
+def limit_for(quota: Quota, user: dict) -> int | None:
+    limit = user.get(quota.limit_field)
+    return quota.default_limit if limit is None else limit
+
+
+def _below_limit(quota: Quota) -> dict:
+    count = {'$ifNull': [f'${quota.counter}', 0]}
+    limit = {'$ifNull': [f'${quota.limit_field}', quota.default_limit]}
+    return {'$or': [{'$eq': [limit, None]}, {'$lt': [count, limit]}]}
+
+
+async def reserve(quota: Quota, user_id: str) -> int:
+    """Take one unit of ``quota`` for the user and return the new count; 403 when the limit is reached."""
+    user = await collection('users').find_one_and_update(
+        {'_id': ObjectId(user_id), '$expr': _below_limit(quota)},
+        {'$inc': {quota.counter: 1}},
+        projection={quota.counter: 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    user_cache.invalidate(user_id)
+    if user is None:
+        raise HTTPException(status_code=403, detail=quota.detail)
+    return user[quota.counter]
+
+
+async def release(quota: Quota, user_id: str) -> None:
+    """Give back a unit taken by ``reserve`` when the metered work did not happen."""
+    await collection('users').update_one(
+        {'_id': ObjectId(user_id), quota.counter: {'$gt': 0}},
+        {'$inc': {quota.counter: -1}},
+    )
+    user_cache.invalidate(user_id)
+
+
+@asynccontextmanager
+async def reserved(quota: Quota, user: dict):
+    """Reserve one unit for ``user`` (the ``get_current_user`` document) around the metered work."""
+    if not quota.count_unlimited and limit_for(quota, user) is None:
+        yield
+        return
+    await reserve(quota, user['id'])
+    try:
+        yield
+    except BaseException:
+        await release(quota, user['id'])
+        raise
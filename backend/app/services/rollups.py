@@ -0,0 +1,156 @@
+"""Per-user daily evaluation rollups for the dashboard.
+
+``user_daily_stats`` holds one small row per user and day (``_id`` is
+``'<user_id>:<YYYY-MM-DD>'``) plus one all-time row (``'<user_id>:all'``,
+``day: None``). Each row has an ``all`` and a ``shortlisted`` scope with
+``count``, ``score_sum``, ``score_count`` and per-fitment counts. The write
+paths keep rows current with ``$inc``; evaluations that have been counted carry
+``in_rollups: True`` so deletes and shortlist changes only undo what was added.
+Evaluations stored before rollups existed are counted by the one-time
+``rebuild-rollups`` migration.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from app.db.mongo import collection
+from app.services.dashboard_cache import bump_generations
+
+SCOPES = ('all', 'shortlisted')
+# Evaluation fields the rollups need when undoing or moving a counted evaluation.
+ROLLUP_PROJECTION = {'user_id': 1, 'created_at': 1, 'summary': 1, 'is_shortlisted': 1, 'in_rollups': 1}
+
+
+def encode_key(name: str) -> str:
+    # Field names may not contain '.' or start with '$'.
+    return name.replace('.', '．').replace('$', '＄')
+
+
+def decode_key(name: str) -> str:
+    return name.replace('．', '.').replace('＄', '$')
+
+
+def day_of(created_at: datetime) -> str:
+    """The UTC day of ``created_at``; naive values are already UTC (as Motor returns them)."""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.strftime('%Y-%m-%d')
+
+
+def _add(increments: dict, item: dict, scopes: tuple[str, ...], sign: int) -> None:
+    summary = item.get('summary') or {}
+    score = summary.get('automation_score')
+    fitment = summary.get('fitment')
+    user_id = item['user_id']
+    created_at = item.get('created_at')
+    rows = [(f'{user_id}:all', None)]
+    if isinstance(created_at, datetime):
+        rows.append((f'{user_id}:{day_of(created_at)}', day_of(created_at)))
+    for row_id, day in rows:
+        entry = increments[row_id]
+        entry['meta'] = {'user_id': user_id, 'day': day}
+        for scope in scopes:
+            entry['inc'][f'{scope}.count'] += sign
+            if score is not None:
+                entry['inc'][f'{scope}.score_sum'] += sign * float(score)
+                entry['inc'][f'{scope}.score_count'] += sign
+            if fitment:
+                entry['inc'][f'{scope}.fitment.{encode_key(fitment)}'] += sign
+
+
+async def _apply(increments: dict) -> None:
+    ops = [
+        UpdateOne({'_id': row_id}, {'$inc': dict(entry['inc']), '$setOnInsert': entry['meta']}, upsert=True)
+        for row_id, entry in increments.items()
+        if entry['inc']
+    ]
+    if not ops:
+        return
+    try:
+        await collection('user_daily_stats').bulk_write(ops, ordered=False)
+        await bump_generations(entry['meta']['user_id'] for entry in increments.values())
+    except Exception:
+        # Rollups are derived data: never fail a user's write over them; rebuild-rollups repairs drift.
+        pass
+
+
+def _new_increments() -> dict:
+    return defaultdict(lambda: {'inc': Counter(), 'meta': {}})
+
+
+async def record_evaluations(items: list[dict], sign: int = 1) -> None:
+    """Add (``sign=1``) or remove (``sign=-1``) completed evaluations from the rollups."""
+    increments = _new_increments()
+    for item in items:
+        scopes = SCOPES if item.get('is_shortlisted') else ('all',)
+        _add(increments, item, scopes, sign)
+    await _apply(increments)
+
+
+async def record_shortlist_changes(items: list[dict], shortlisted: bool) -> None:
+    """Move counted evaluations into or out of the shortlisted scope."""
+    increments = _new_increments()
+    for item in items:
+        if item.get('in_rollups'):
+            _add(increments, item, ('shortlisted',), 1 if shortlisted else -1)
+    await _apply(increments)
+
+
+def _merge(scope: dict, totals: dict, fitments: Counter) -> None:
+    for field in ('count', 'score_sum', 'score_count'):
+        totals[field] += scope.get(field, 0)
+    for key, count in (scope.get('fitment') or {}).items():
+        fitments[decode_key(key)] += count
+
+
+async def load_dashboard_stats(user_id: str, first_day: str, last_day: str, scope: str) -> dict:
+    """Read at most one row per day in ``[first_day, last_day]`` plus the all-time row."""
+    stats = collection('user_daily_stats')
+    cursor = stats.find({'user_id': user_id, 'day': {'$gte': first_day, '$lte': last_day}})
+    totals: Counter = Counter()
+    fitments: Counter = Counter()
+    trend = []
+    async for row in cursor:
+        data = row.get(scope) or {}
+        if data.get('count', 0) <= 0:
+            continue
+        _merge(data, totals, fitments)
+        score_count = data.get('score_count', 0)
+        trend.append((row['day'], data['count'], data.get('score_sum', 0) / score_count if score_count else None))
+    trend.sort()
+
+    all_time = await stats.find_one({'_id': f'{user_id}:all'})
+    return {
+        'total_all': ((all_time or {}).get(scope) or {}).get('count', 0),
+        'total': totals['count'],
+        'avg_score': totals['score_sum'] / totals['score_count'] if totals['score_count'] else None,
+        'trend': trend,
+        'distribution': sorted(((k, v) for k, v in fitments.items() if v > 0), key=lambda x: (-x[1], x[0])),
+    }
+
+
+def is_countable(item: dict) -> bool:
+    return item.get('status', 'Completed') not in ('Queued', 'Running', 'Failed')
+
+
+def build_rows(items) -> dict:
+    """Compute rollup rows from scratch for an iterable of evaluations (used by the rebuild)."""
+    increments = _new_increments()
+    for item in items:
+        scopes = SCOPES if item.get('is_shortlisted') else ('all',)
+        _add(increments, item, scopes, 1)
+    rows = {}
+    for row_id, entry in increments.items():
+        doc = {'_id': row_id, **entry['meta']}
+        for path, value in entry['inc'].items():
+            target = doc
+            *parents, leaf = path.split('.')
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = value
+        rows[row_id] = doc
+    return rows
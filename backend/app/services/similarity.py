@@ -0,0 +1,149 @@
+"""Per-user similarity index over completed evaluations.
+
+Each evaluation's ``process_name`` and ``description`` are turned into a
+hashed bag of word and character-trigram features (signed feature hashing
+into ``SIMILARITY_DIMENSIONS`` buckets, L2-normalized). A user's vectors live
+in one NumPy matrix, so a lookup is a single matrix-vector product followed by
+a top-k partition.
+
+Indexes are built lazily from Mongo the first time a user searches, kept in a
+bounded LRU, and updated in place on insert and delete. Anything that loses
+track (another process writing, an eviction) is repaired by ``rebuild``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import zlib
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.db.mongo import collection
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+# Statuses whose agent result can be offered for reuse.
+REUSABLE_STATUSES = {'Completed', 'Shortlisted'}
+SIMILARITY_PROJECTION = {'process_name': 1, 'submitted_payload.description': 1, 'status': 1}
+
+
+def _features(text: str):
+    words = WORD_RE.findall(text.lower())
+    yield from (f'w:{word}' for word in words)
+    for word in words:
+        padded = f'#{word}#'
+        yield from (f'c:{padded[i:i + 3]}' for i in range(len(padded) - 2))
+
+
+def vectorize(process_name: str | None, description: str | None) -> np.ndarray:
+    dims = settings.SIMILARITY_DIMENSIONS
+    vector = np.zeros(dims, dtype=np.float32)
+    for feature in _features(f'{process_name or ""} {description or ""}'):
+        # crc32 rather than hash(): stable across processes and restarts.
+        h = zlib.crc32(feature.encode())
+        vector[h % dims] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class UserIndex:
+    """Rows of unit vectors for one user, with O(1) append and swap-with-last delete."""
+
+    def __init__(self, dims: int, capacity: int = 64):
+        self.matrix = np.zeros((capacity, dims), dtype=np.float32)
+        self.ids: list[str] = []
+        self.rows: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, evaluation_id: str, vector: np.ndarray) -> None:
+        row = self.rows.get(evaluation_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+            self.ids.append(evaluation_id)
+            self.rows[evaluation_id] = row
+        self.matrix[row] = vector
+
+    def remove(self, evaluation_id: str) -> None:
+        row = self.rows.pop(evaluation_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+        self.ids.pop()
+
+    def search(self, vector: np.ndarray, k: int, exclude: str | None = None) -> list[tuple[str, float]]:
+        n = len(self.ids)
+        if not n:
+            return []
+        scores = self.matrix[:n] @ vector
+        if exclude in self.rows:
+            scores[self.rows[exclude]] = -np.inf
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+_indexes = LRUCache(settings.SIMILARITY_MAX_USERS)
+_locks: dict[str, asyncio.Lock] = {}
+
+
+async def rebuild(user_id: str) -> UserIndex:
+    """(Re)build one user's index from the evaluations collection."""
+    index = UserIndex(settings.SIMILARITY_DIMENSIONS)
+    async for item in collection('evaluations').find({'user_id': user_id}, SIMILARITY_PROJECTION):
+        if item.get('status', 'Completed') in REUSABLE_STATUSES:
+            description = (item.get('submitted_payload') or {}).get('description')
+            index.add(str(item['_id']), vectorize(item.get('process_name'), description))
+    _indexes.set(user_id, index)
+    return index
+
+
+async def _get_index(user_id: str) -> UserIndex:
+    index = _indexes.get(user_id)
+    if index is not None:
+        return index
+    lock = _locks.setdefault(user_id, asyncio.Lock())
+    async with lock:
+        index = _indexes.get(user_id)
+        if index is None:
+            index = await rebuild(user_id)
+    _locks.pop(user_id, None)
+    return index
+
+
+async def find_similar(
+    user_id: str,
+    process_name: str | None,
+    description: str | None,
+    k: int = 5,
+    exclude_id: str | None = None,
+) -> list[tuple[str, float]]:
+    """Return up to ``k`` ``(evaluation_id, cosine)`` pairs, most similar first."""
+    index = await _get_index(user_id)
+    return index.search(vectorize(process_name, description), k, exclude_id)
+
+
+def add(user_id: str, evaluation_id: str, process_name: str | None, description: str | None) -> None:
+    # Only loaded indexes are updated; an unloaded one picks the evaluation up when it is built.
+    index = _indexes.pop(user_id)
+    if index is not None:
+        index.add(evaluation_id, vectorize(process_name, description))
+        _indexes.set(user_id, index)
+
+
+def remove(user_id: str, evaluation_id: str) -> None:
+    index = _indexes.pop(user_id)
+    if index is not None:
+        index.remove(evaluation_id)
+        _indexes.set(user_id, index)
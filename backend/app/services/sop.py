@@ -0,0 +1,334 @@
+"""SOP document upload handling and text extraction.
+
+Uploads are streamed in chunks with a byte cap enforced as they are read:
+PDFs are spooled to a temporary file and text files are decoded
+incrementally, so no full in-memory copy of the upload is ever held. By then
+Starlette has already received (and spooled to disk) the multipart body, so
+the cap bounds processing; what the server accepts is bounded earlier by
+``BodySizeLimitMiddleware`` (``MAX_REQUEST_BODY_BYTES``).
+The SHA-256 of the upload is computed while streaming; extracted PDF text is
+cached under that hash in an in-process LRU and, zlib-compressed, in the
+``sop_texts`` collection, so re-uploading a document skips extraction.
+PDF parsing is CPU-bound, so it runs in a process pool instead of on the
+event loop. Large documents are split into page ranges that are extracted in
+parallel, and every document is held to a page limit, a CPU-time budget and a
+wall-clock timeout. The CPU budget is enforced by the kernel (``RLIMIT_CPU``
+raises in the worker mid-page); on timeout the pool's workers are killed and
+the pool is restarted, since a running worker cannot otherwise be stopped.
+Other requests' work lost with those workers is retried once on the new pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import hashlib
+import math
+import mmap
+import os
+import signal
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from bson import Binary
+from fastapi import UploadFile
+
+try:
+    import resource
+except ImportError:  # Windows: the CPU budget is only checked between pages
+    resource = None
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.db.mongo import collection
+from app.services.sop_compaction import PAGE_BREAK
+
+_pool: ProcessPoolExecutor | None = None
+_texts = LRUCache(settings.SOP_TEXT_CACHE_ENTRIES)
+
+
+@dataclass
+class SopDocument:
+    text: str
+    size: int
+    sha256: str
+
+
+class SopLimitError(Exception):
+    """Raised when an SOP document exceeds a configured processing limit."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _CpuLimitExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(_signum, _frame) -> None:
+    raise _CpuLimitExceeded()
+
+
+def _init_worker() -> None:
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+@contextmanager
+def _cpu_limit(seconds: float):
+    """Let the kernel stop this worker's task once it has used ``seconds`` more CPU time."""
+    if resource is None:
+        yield
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    saved, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    # RLIMIT_CPU counts the whole process, so the limit is set relative to what the worker has used so far.
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (saved, hard))
+
+
+def start_pool() -> None:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.SOP_EXTRACT_WORKERS, initializer=_init_worker)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _recycle_pool() -> None:
+    """Kill the workers of the current pool (e.g. one stuck in a page) and start afresh on next use."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is None:
+        return
+    # There is no public way to stop a running task. Queued work is not cancelled: once the workers die it
+    # fails with BrokenProcessPool, which _in_pool retries, so only the caller's own tasks are lost.
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False)
+    for process in processes:
+        process.kill()
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    if _pool is pool:
+        _pool = None
+        pool.shutdown(wait=False)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    if _pool is None:
+        start_pool()
+    return _pool
+
+
+@contextmanager
+def _open_pdf(path: str):
+    """Open a spooled PDF through a read-only memory map instead of reading it into memory."""
+    from PyPDF2 import PdfReader
+
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        yield PdfReader(view)
+
+
+def _count_pages(path: str, cpu_limit: float) -> int:
+    with _cpu_limit(cpu_limit), _open_pdf(path) as reader:
+        return len(reader.pages)
+
+
+def _extract_pages(path: str, start: int, stop: int, cpu_limit: float) -> tuple[list[str], float]:
+    """Extract pages ``[start, stop)`` in a pool worker; returns texts and CPU seconds used."""
+    began = time.process_time()
+    texts = []
+    with _cpu_limit(cpu_limit), _open_pdf(path) as reader:
+        for index in range(start, stop):
+            texts.append(reader.pages[index].extract_text() or '')
+            if time.process_time() - began > cpu_limit:
+                raise _CpuLimitExceeded()
+    return texts, time.process_time() - began
+
+
+def _too_complex() -> SopLimitError:
+    return SopLimitError(422, 'SOP document is too complex to process. Please upload a smaller or simpler file.')
+
+
+def _unavailable() -> SopLimitError:
+    return SopLimitError(503, 'SOP processing is temporarily unavailable. Please try again.')
+
+
+async def _in_pool(fn, *args):
+    """Run ``fn`` in the pool, once more on a fresh pool if the first one broke (e.g. another upload timed out)."""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+    return await loop.run_in_executor(_get_pool(), fn, *args)
+
+
+async def _run_all(calls: list, deadline: float) -> list:
+    """Await pool ``calls`` until ``deadline``; on the first failure the ones not yet started are cancelled."""
+    loop = asyncio.get_running_loop()
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    try:
+        return await asyncio.wait_for(asyncio.gather(*tasks), max(0.0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        _recycle_pool()
+        raise _too_complex() from None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def extract_pdf_text(path: str) -> str:
+    loop = asyncio.get_running_loop()
+    cpu_limit = settings.SOP_CPU_LIMIT_SECONDS
+    deadline = loop.time() + settings.SOP_EXTRACT_TIMEOUT_SECONDS
+    try:
+        [page_count] = await _run_all([_in_pool(_count_pages, path, cpu_limit)], deadline)
+    except _CpuLimitExceeded:
+        raise _too_complex() from None
+    except SopLimitError:
+        raise
+    except BrokenProcessPool:
+        raise _unavailable() from None
+    except Exception:  # not a readable PDF
+        return ''
+    if page_count > settings.SOP_MAX_PAGES:
+        raise SopLimitError(413, f'SOP document has {page_count} pages; the limit is {settings.SOP_MAX_PAGES}.')
+
+    chunk = max(1, settings.SOP_PAGES_PER_CHUNK)
+    ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    calls = [_in_pool(_extract_pages, path, start, stop, cpu_limit) for start, stop in ranges]
+    try:
+        results = await _run_all(calls, deadline)
+    except (_CpuLimitExceeded, SopLimitError):
+        results = None
+    except BrokenProcessPool:
+        raise _unavailable() from None
+    except Exception:  # a page that cannot be parsed
+        return ''
+
+    if results is None or sum(cpu for _, cpu in results) > cpu_limit:
+        raise _too_complex()
+    # Page breaks are kept so compaction can recognise repeated headers and footers.
+    return PAGE_BREAK.join(text for texts, _ in results for text in texts).strip()
+
+
+def _too_large() -> SopLimitError:
+    return SopLimitError(413, f'SOP file exceeds the upload limit of {settings.SOP_MAX_UPLOAD_BYTES} bytes.')
+
+
+async def _iter_upload(upload: UploadFile, digest):
+    """Yield the upload in chunks, hashing them and failing as soon as the byte cap is crossed.
+
+    This limits what is hashed and copied, not what was received: the request
+    body is already spooled by the time a route reads its upload.
+    """
+    if upload.size is not None and upload.size > settings.SOP_MAX_UPLOAD_BYTES:
+        raise _too_large()
+    total = 0
+    while chunk := await upload.read(settings.SOP_READ_CHUNK_BYTES):
+        total += len(chunk)
+        if total > settings.SOP_MAX_UPLOAD_BYTES:
+            raise _too_large()
+        digest.update(chunk)
+        yield chunk
+
+
+async def _load_cached_text(sha256: str) -> str | None:
+    text = _texts.get(sha256)
+    if text is not None:
+        return text
+    try:
+        doc = await collection('sop_texts').find_one({'_id': sha256})
+    except Exception:
+        return None
+    if not doc:
+        return None
+    text = (await asyncio.to_thread(zlib.decompress, doc['text'])).decode('utf-8')
+    _texts.set(sha256, text)
+    return text
+
+
+async def _store_cached_text(sha256: str, size: int, text: str) -> None:
+    _texts.set(sha256, text)
+    compressed = await asyncio.to_thread(zlib.compress, text.encode('utf-8'), 6)
+    try:
+        await collection('sop_texts').update_one(
+            {'_id': sha256},
+            {
+                '$set': {
+                    'text': Binary(compressed),
+                    'codec': 'zlib',
+                    'size': size,
+                    'text_length': len(text),
+                    'created_at': datetime.now(timezone.utc),
+                }
+            },
+            upsert=True,
+        )
+    except Exception:
+        pass
+
+
+async def read_sop_document(upload: UploadFile) -> SopDocument:
+    """Stream an uploaded SOP file (PDF or text) and return its extracted text, size and hash."""
+    filename = (upload.filename or '').lower()
+    digest = hashlib.sha256()
+    if not filename.endswith('.pdf'):
+        # .txt or other text files
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        size = 0
+        parts = []
+        async for chunk in _iter_upload(upload, digest):
+            size += len(chunk)
+            parts.append(decoder.decode(chunk))
+        parts.append(decoder.decode(b'', final=True))
+        return SopDocument(''.join(parts).strip(), size, digest.hexdigest())
+
+    fd, path = tempfile.mkstemp(suffix='.pdf', dir=settings.SOP_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            async for chunk in _iter_upload(upload, digest):
+                spool.write(chunk)
+            size = spool.tell()
+        sha256 = digest.hexdigest()
+        if size == 0:
+            return SopDocument('', 0, sha256)
+        text = await _load_cached_text(sha256)
+        if text is None:
+            text = await extract_pdf_text(path)
+            if text:
+                await _store_cached_text(sha256, size, text)
+        return SopDocument(text, size, sha256)
+    finally:
+        os.unlink(path)
+
+
+async def run_in_pool(fn, *args):
+    """Run a CPU-bound helper (e.g. SOP compaction) in the extraction process pool."""
+    try:
+        return await _in_pool(fn, *args)
+    except BrokenProcessPool:
+        raise _unavailable() from None
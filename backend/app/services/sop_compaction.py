@@ -0,0 +1,194 @@
+"""Token-budgeted compaction of SOP text before it is added to the agent prompt.
+
+Repeated page headers and footers are dropped first. If the document is still
+over budget it is split into sections, each section is ranked by TF-IDF cosine
+similarity to the process name and description, and the best sections are kept
+in their original order until the budget is spent.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+PAGE_BREAK = '\f'
+OMISSION_MARKER = '[...]'
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_DIGITS_RE = re.compile(r'\d+')
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_SENTENCE_RE = re.compile(r'(?<=[.!?;:])\s+')
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the this to was were will with'.split()
+)
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    sections_total: int
+    sections_kept: int
+
+    @property
+    def ratio(self) -> float:
+        return round(self.compacted_tokens / self.original_tokens, 3) if self.original_tokens else 1.0
+
+    def as_metadata(self) -> dict:
+        return {
+            'original_tokens': self.original_tokens,
+            'compacted_tokens': self.compacted_tokens,
+            'ratio': self.ratio,
+            'sections_total': self.sections_total,
+            'sections_kept': self.sections_kept,
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose; close enough for budgeting.
+    return (len(text) + 3) // 4
+
+
+def _terms(text: str) -> list[str]:
+    return [t for t in _WORD_RE.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _strip_repeated_lines(pages: list[str], edge_lines: int = 2) -> list[str]:
+    """Remove header/footer lines that recur at the top or bottom of most pages."""
+    if len(pages) < 3:
+        return pages
+
+    def key(line: str) -> str:
+        # "Page 3 of 40" and "Page 4 of 40" are the same footer.
+        return _DIGITS_RE.sub('#', line.strip().lower())
+
+    page_lines = [page.splitlines() for page in pages]
+    edges = []
+    for lines in page_lines:
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        edges.append(set(filled[:edge_lines] + filled[-edge_lines:]))
+
+    seen: Counter = Counter()
+    for lines, edge in zip(page_lines, edges):
+        seen.update({key(lines[i]) for i in edge})
+    threshold = max(2, math.ceil(len(pages) / 2))
+    repeated = {k for k, n in seen.items() if n >= threshold}
+    if not repeated:
+        return pages
+
+    return [
+        '\n'.join(line for i, line in enumerate(lines) if i not in edge or key(line) not in repeated)
+        for lines, edge in zip(page_lines, edges)
+    ]
+
+
+def _split_line(line: str, max_tokens: int) -> list[str]:
+    """Cut a line over ``max_tokens`` into sentence windows; a sentence still too long is cut at a word boundary."""
+    max_chars = max_tokens * 4
+    pieces = []
+    for sentence in _SENTENCE_RE.split(line):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+
+    chunks: list[str] = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] += ' ' + piece
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def _split_sections(pages: list[str], max_tokens: int) -> list[str]:
+    sections = []
+    for page in pages:
+        for paragraph in _PARAGRAPH_RE.split(page):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if estimate_tokens(paragraph) <= max_tokens:
+                sections.append(paragraph)
+                continue
+            # Extracted PDF text rarely has blank lines; fall back to windows of whole lines.
+            window: list[str] = []
+            size = 0
+            for line in paragraph.splitlines():
+                # A PDF page often comes out as one long line; it must not become one oversized section.
+                for part in _split_line(line, max_tokens) if estimate_tokens(line) > max_tokens else [line]:
+                    cost = estimate_tokens(part) + 1
+                    if window and size + cost > max_tokens:
+                        sections.append('\n'.join(window))
+                        window, size = [], 0
+                    window.append(part)
+                    size += cost
+            if window:
+                sections.append('\n'.join(window))
+    return sections
+
+
+def _rank(sections: list[str], query: str) -> list[float]:
+    section_terms = [Counter(_terms(section)) for section in sections]
+    df: Counter = Counter()
+    for terms in section_terms:
+        df.update(terms.keys())
+    n = len(sections)
+
+    def vector(counts: Counter) -> dict[str, float]:
+        return {t: (1 + math.log(c)) * (math.log((1 + n) / (1 + df[t])) + 1) for t, c in counts.items()}
+
+    query_vec = vector(Counter(_terms(query)))
+    query_norm = math.sqrt(sum(w * w for w in query_vec.values()))
+    scores = []
+    for terms in section_terms:
+        vec = vector(terms)
+        norm = math.sqrt(sum(w * w for w in vec.values()))
+        if not norm or not query_norm:
+            scores.append(0.0)
+            continue
+        dot = sum(w * vec.get(t, 0.0) for t, w in query_vec.items())
+        scores.append(dot / (norm * query_norm))
+    return scores
+
+
+def compact_sop(text: str, query: str, budget_tokens: int) -> CompactionResult:
+    """Fit ``text`` into ``budget_tokens``, keeping the sections most relevant to ``query``."""
+    original_tokens = estimate_tokens(text)
+    pages = _strip_repeated_lines(text.split(PAGE_BREAK))
+    cleaned = '\n'.join(page.strip() for page in pages if page.strip())
+    if budget_tokens <= 0 or estimate_tokens(cleaned) <= budget_tokens:
+        return CompactionResult(cleaned, original_tokens, estimate_tokens(cleaned), 1, 1)
+
+    # Sections never exceed the budget, so the best one always fits.
+    sections = _split_sections(pages, max(1, min(budget_tokens - 1, max(64, budget_tokens // 8))))
+    scores = _rank(sections, query)
+    order = sorted(range(len(sections)), key=lambda i: (-scores[i], i))
+
+    kept: set[int] = set()
+    spent = 0
+    for index in order:
+        cost = estimate_tokens(sections[index]) + 1
+        if spent + cost > budget_tokens:
+            continue
+        kept.add(index)
+        spent += cost
+
+    parts = []
+    previous = -1
+    for index in sorted(kept):
+        if index != previous + 1:
+            parts.append(OMISSION_MARKER)
+        parts.append(sections[index])
+        previous = index
+    if previous != len(sections) - 1:
+        parts.append(OMISSION_MARKER)
+    compacted = '\n\n'.join(parts)
+    return CompactionResult(compacted, original_tokens, estimate_tokens(compacted), len(sections), len(kept))
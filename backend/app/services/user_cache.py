@@ -0,0 +1,57 @@
+"""Short-lived in-process caches for request authentication.
+
+``get_current_user`` runs on every authenticated request. Decoded access
+tokens are cached under a hash of the token (never the token itself) until
+the earlier of the cache TTL and the token's own expiry. User documents are
+cached by id for ``USER_CACHE_TTL_SECONDS``. Every write that changes a user
+document calls ``invalidate``; other processes converge within the TTL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.core.security import decode_token
+from app.db.mongo import collection
+
+_tokens = LRUCache(settings.TOKEN_CACHE_ENTRIES, settings.USER_CACHE_TTL_SECONDS)
+_users = LRUCache(settings.USER_CACHE_ENTRIES, settings.USER_CACHE_TTL_SECONDS)
+
+
+def decode_access_token(token: str) -> dict | None:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = _tokens.get(key)
+    if payload is not None:
+        return payload
+    payload = decode_token(token)
+    if payload and 'exp' in payload:
+        remaining = payload['exp'] - time.time()
+        if remaining > 0:
+            _tokens.set(key, payload, ttl_seconds=min(remaining, settings.USER_CACHE_TTL_SECONDS))
+    return payload
+
+
+async def get_user(user_id: str) -> dict | None:
+    """The user document with ``_id`` replaced by a string ``id``; callers get their own copy."""
+    user = _users.get(user_id)
+    if user is None:
+        user = await collection('users').find_one({'_id': ObjectId(user_id)})
+        if not user:
+            return None
+        user['id'] = str(user.pop('_id'))
+        _users.set(user_id, user)
+    return dict(user)
+
+
+def invalidate(*user_ids: str) -> None:
+    for user_id in user_ids:
+        _users.pop(str(user_id))
+
+
+def cache_stats() -> dict:
+    return {'users': _users.stats(), 'tokens': _tokens.stats()}
@@ -0,0 +1,120 @@
+"""Login storm benchmark: login throughput and /health latency under concurrent logins.
+
+Runs the app in-process on the in-memory database backend, fires ``--logins``
+logins with ``--concurrency`` in flight, and probes ``/health`` every
+``--probe-interval`` seconds meanwhile. ``inline`` reproduces the old
+behaviour (key derivation on the event loop); ``pool`` uses the bounded
+password-hashing executor.
+
+Run from ``backend/``::
+
+    python -m benchmarks.login_storm --mode both
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+for _key, _value in {
+    'MONGO_URI': 'mongodb://127.0.0.1:1',
+    'JWT_SECRET_KEY': 'benchmark',
+    'MISTRAL_API_URL': 'http://127.0.0.1:1',
+    'MISTRAL_API_KEY': 'benchmark',
+    'PROCESS_AGENT_ID': 'benchmark',
+    'USE_CASE_AGENT_ID': 'benchmark',
+    'COMPANY_USE_CASE_AGENT_ID': 'benchmark',
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import httpx  # noqa: E402
+
+from app.api import auth  # noqa: E402
+from app.core import security  # noqa: E402
+from app.db import mongo  # noqa: E402
+from app.main import app  # noqa: E402
+
+EMAIL = 'storm@example.com'
+PASSWORD = 'benchmark-password'
+
+
+async def _inline_verify(plain_password: str, hashed_password: str) -> bool:
+    return security.verify_password(plain_password, hashed_password)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(mode: str, logins: int, concurrency: int, probe_interval: float) -> dict:
+    mongo._db = mongo.InMemoryDB()
+    await mongo.collection('users').insert_one(
+        {'email': EMAIL, 'password_hash': security.hash_password(PASSWORD), 'email_verified': True}
+    )
+    auth.verify_password_async = _inline_verify if mode == 'inline' else security.verify_password_async
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+        statuses: list[int] = []
+        health: list[float] = []
+        done = asyncio.Event()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login() -> None:
+            async with semaphore:
+                response = await client.post('/api/auth/login', json={'email': EMAIL, 'password': PASSWORD})
+                statuses.append(response.status_code)
+
+        async def probe() -> None:
+            # Latency is measured from when each probe was due, so time the event loop
+            # spends blocked counts against it (no coordinated omission).
+            due = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                await client.get('/health')
+                health.append((time.perf_counter() - due) * 1000)
+                due = max(due + probe_interval, time.perf_counter())
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    security.shutdown_hash_executor()
+    return {
+        'mode': mode,
+        'logins_per_s': sum(1 for s in statuses if s == 200) / elapsed,
+        'rejected_503': statuses.count(503),
+        'health_probes': len(health),
+        'health_p50_ms': statistics.median(health) if health else 0.0,
+        'health_p99_ms': _percentile(health, 99) if health else 0.0,
+        'health_max_ms': max(health) if health else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('inline', 'pool', 'both'), default='both')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--probe-interval', type=float, default=0.01)
+    args = parser.parse_args()
+
+    modes = ('inline', 'pool') if args.mode == 'both' else (args.mode,)
+    print(f'{"mode":<8}{"logins/s":>10}{"503s":>6}{"probes":>8}{"p50 ms":>9}{"p99 ms":>9}{"max ms":>9}')
+    for mode in modes:
+        r = asyncio.run(run(mode, args.logins, args.concurrency, args.probe_interval))
+        print(
+            f"{r['mode']:<8}{r['logins_per_s']:>10.1f}{r['rejected_503']:>6}{r['health_probes']:>8}"
+            f"{r['health_p50_ms']:>9.2f}{r['health_p99_ms']:>9.2f}{r['health_max_ms']:>9.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Restart benchmark: how long the durable in-memory backend takes to come back up.
+
+For each ``--sizes`` entry, fills a fresh data directory with that many
+evaluation-shaped documents (with the app's indexes from ``init_db``), then
+times a restart twice: once replaying the whole operation log, and once
+loading a snapshot plus a ``--tail`` fraction of further writes from the log.
+
+Run from ``backend/``::
+
+    python -m benchmarks.memory_restart --sizes 10000 50000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+for _key, _value in {
+    'MONGO_URI': 'memory://',
+    'JWT_SECRET_KEY': 'benchmark',
+    'MISTRAL_API_URL': 'http://127.0.0.1:1',
+    'MISTRAL_API_KEY': 'benchmark',
+    'PROCESS_AGENT_ID': 'benchmark',
+    'USE_CASE_AGENT_ID': 'benchmark',
+    'COMPANY_USE_CASE_AGENT_ID': 'benchmark',
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from app.db import mongo  # noqa: E402
+from app.db.memory import InMemoryDB  # noqa: E402
+
+WORDS = 'invoice payroll onboarding claims approval vendor reconciliation audit ticket order refund report'.split()
+BATCH = 1000
+
+
+def _evaluation(rng: random.Random, number: int, now: datetime) -> dict:
+    name = ' '.join(rng.sample(WORDS, 2))
+    return {
+        'user_id': f'user-{number % 200}',
+        'process_name': name.title(),
+        'status': 'completed',
+        'is_shortlisted': rng.random() < 0.2,
+        'created_at': now - timedelta(minutes=number),
+        'submitted_payload': {'process_name': name, 'description': ' '.join(rng.choices(WORDS, k=30))},
+        'summary': {
+            'version': 2,
+            'automation_score': rng.randint(0, 100),
+            'fitment': rng.choice(['RPA', 'Agentic AI', 'Not suitable']),
+            'recommendation_text': ' '.join(rng.choices(WORDS, k=20)),
+        },
+    }
+
+
+async def _fill(path: str, count: int, start: int) -> None:
+    db = InMemoryDB(path, snapshot_ops=10**12)
+    mongo._db = db
+    await mongo.init_db()
+    rng = random.Random(start)
+    now = datetime.now(timezone.utc)
+    for offset in range(start, start + count, BATCH):
+        batch = [_evaluation(rng, number, now) for number in range(offset, min(offset + BATCH, start + count))]
+        await db.evaluations.insert_many(batch)
+    await db.close()
+
+
+async def _snapshot(path: str) -> None:
+    db = InMemoryDB(path, snapshot_ops=10**12)
+    await db.snapshot()
+    await db.close()
+
+
+def _size_mb(path: str, prefix: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.startswith(prefix)) / 2**20
+
+
+async def _restart(path: str) -> float:
+    started = time.perf_counter()
+    db = InMemoryDB(path)
+    try:
+        return time.perf_counter() - started
+    finally:
+        await db.close()
+
+
+def run(size: int, tail: float) -> dict:
+    path = tempfile.mkdtemp(prefix='memory-restart-')
+    try:
+        asyncio.run(_fill(path, size, 0))
+        log_mb = _size_mb(path, 'oplog-')
+        replay_s = asyncio.run(_restart(path))
+        asyncio.run(_snapshot(path))
+        asyncio.run(_fill(path, int(size * tail), size))
+        snapshot_mb = _size_mb(path, 'snapshot-')
+        snapshot_s = asyncio.run(_restart(path))
+        return {'docs': size, 'log_mb': log_mb, 'replay_s': replay_s, 'snapshot_mb': snapshot_mb, 'snapshot_s': snapshot_s}
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--tail', type=float, default=0.05, help='writes after the snapshot, as a fraction of size')
+    args = parser.parse_args()
+
+    print(f'{"docs":>8}{"log MB":>9}{"replay s":>10}{"snap MB":>9}{"snap+tail s":>13}')
+    for size in args.sizes:
+        r = run(size, args.tail)
+        print(f"{r['docs']:>8}{r['log_mb']:>9.1f}{r['replay_s']:>10.2f}{r['snapshot_mb']:>9.1f}{r['snapshot_s']:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
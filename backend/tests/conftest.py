@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+# Settings are read at import time; the tests only talk to the in-memory backend and mocked services.
+for _key, _value in {
+    'MONGO_URI': 'memory://',
+    'JWT_SECRET_KEY': 'test',
+    'MISTRAL_API_URL': 'http://127.0.0.1:1',
+    'MISTRAL_API_KEY': 'test',
+    'PROCESS_AGENT_ID': 'test',
+    'USE_CASE_AGENT_ID': 'test',
+    'COMPANY_USE_CASE_AGENT_ID': 'test',
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from app.db import mongo  # noqa: E402
+from app.db.memory import InMemoryDB  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory database installed as the app's database."""
+    previous = mongo._db
+    mongo._db = InMemoryDB()
+    yield mongo._db
+    mongo._db = previous
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.services import agent_cache
+
+
+@pytest.fixture
+def agent(db, monkeypatch):
+    """Cache agent 'cached' only; returns the list of prompts that reached the (fake) agent."""
+    calls = []
+
+    async def call_agent(agent_id, content):
+        calls.append(content)
+        return {'answer': len(calls)}
+
+    monkeypatch.setattr(settings, 'AGENT_CACHE_AGENTS', 'cached')
+    monkeypatch.setattr(agent_cache, 'call_agent', call_agent)
+    monkeypatch.setattr(agent_cache, '_memory', LRUCache(8, ttl_seconds=settings.AGENT_CACHE_TTL_SECONDS))
+    monkeypatch.setattr(agent_cache, '_counters', dict.fromkeys(agent_cache._counters, 0))
+    return calls
+
+
+def test_repeated_prompt_is_served_from_memory_then_from_mongo(agent):
+    async def scenario():
+        first = await agent_cache.call_agent_cached('cached', 'same  prompt')
+        # Whitespace-only differences share the cache entry.
+        second = await agent_cache.call_agent_cached('cached', ' same prompt\n')
+        agent_cache._memory.clear()
+        third = await agent_cache.call_agent_cached('cached', 'same prompt')
+        return first, second, third
+
+    assert asyncio.run(scenario()) == ({'answer': 1},) * 3
+    assert len(agent) == 1
+    stats = agent_cache.cache_stats()
+    assert (stats['misses'], stats['memory_hits'], stats['persistent_hits']) == (1, 1, 1)
+
+
+def test_bypass_skips_the_lookup_but_refreshes_the_entry(agent):
+    async def scenario():
+        await agent_cache.call_agent_cached('cached', 'prompt')
+        fresh = await agent_cache.call_agent_cached('cached', 'prompt', use_cache=False)
+        agent_cache._memory.clear()
+        return fresh, await agent_cache.call_agent_cached('cached', 'prompt')
+
+    assert asyncio.run(scenario()) == ({'answer': 2}, {'answer': 2})
+    assert agent_cache.cache_stats()['bypassed'] == 1
+
+
+def test_expired_entry_is_not_served(agent, db):
+    async def scenario():
+        await agent_cache.call_agent_cached('cached', 'prompt')
+        # The TTL monitor has not reaped the row yet, but it is past its expiry.
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await db.agent_cache.update_many({}, {'$set': {'expires_at': past}})
+        agent_cache._memory.clear()
+        return await agent_cache.call_agent_cached('cached', 'prompt')
+
+    assert asyncio.run(scenario()) == {'answer': 2}
+
+
+def test_agents_not_opted_in_are_never_cached(agent, db):
+    async def scenario():
+        await agent_cache.call_agent_cached('other', 'prompt')
+        await agent_cache.call_agent_cached('other', 'prompt')
+        return await db.agent_cache.count_documents({})
+
+    assert asyncio.run(scenario()) == 0
+    assert len(agent) == 2
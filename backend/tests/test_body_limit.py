@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from app.core.body_limit import BodySizeLimitMiddleware
+
+app = FastAPI()
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=1000)
+reached = []
+
+
+@app.post('/upload')
+async def upload(file: UploadFile = File(...)):
+    reached.append(file.filename)
+    return {'size': len(await file.read())}
+
+
+def _post(**kwargs) -> httpx.Response:
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://t') as client:
+            return await client.post('/upload', **kwargs)
+
+    return asyncio.run(send())
+
+
+def test_small_upload_passes():
+    response = _post(files={'file': ('a.txt', b'x' * 100)})
+    assert response.status_code == 200
+    assert response.json() == {'size': 100}
+
+
+def test_declared_oversized_body_is_refused_before_the_route():
+    reached.clear()
+    response = _post(files={'file': ('a.txt', b'x' * 5000)})
+    assert response.status_code == 413
+    assert reached == []
+
+
+def test_chunked_oversized_body_is_stopped_while_reading():
+    reached.clear()
+
+    async def chunks():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.txt"\r\n\r\n'
+        for _ in range(20):
+            yield b'x' * 500
+
+    response = _post(content=chunks(), headers={'Content-Type': 'multipart/form-data; boundary=b'})
+    assert response.status_code == 413
+    assert reached == []
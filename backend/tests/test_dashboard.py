@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from fastapi import Response
+
+from app.api.dashboard import dashboard
+from app.core.lru import LRUCache
+from app.services import dashboard_cache
+from app.services.rollups import record_evaluations
+
+
+def _dashboard(user: dict, **params) -> dict:
+    options = {'days': 30, 'shortlisted': False, 'if_none_match': None, **params}
+    return asyncio.run(dashboard(Response(), current_user=user, **options))
+
+
+def test_shortlisted_dashboard_counts_only_shortlisted_evaluations(db):
+    user = {'id': str(ObjectId())}
+    now = datetime.now(timezone.utc)
+
+    def evaluation(age_days: int, score: float, fitment: str, shortlisted: bool) -> dict:
+        return {
+            'user_id': user['id'],
+            'created_at': now - timedelta(days=age_days),
+            'summary': {'automation_score': score, 'fitment': fitment},
+            'is_shortlisted': shortlisted,
+        }
+
+    asyncio.run(
+        record_evaluations(
+            [
+                evaluation(1, 80, 'RPA', True),
+                evaluation(2, 40, 'Agentic AI', False),
+                evaluation(90, 60, 'RPA', True),
+            ]
+        )
+    )
+
+    everything = _dashboard(user)
+    shortlisted = _dashboard(user, shortlisted=True)
+
+    assert (everything['total_evaluations'], everything['evaluations_in_range']) == (3, 2)
+    assert everything['average_automation_score'] == 60
+    # The all-time total follows the shortlisted filter too, not only the in-range figures.
+    assert (shortlisted['total_evaluations'], shortlisted['evaluations_in_range']) == (2, 1)
+    assert shortlisted['average_automation_score'] == 80
+    assert shortlisted['charts']['technology_distribution'] == [{'technology': 'RPA', 'count': 1}]
+    assert [point['count'] for point in shortlisted['charts']['evaluation_trend']] == [1]
+
+
+def test_stale_cached_dashboard_counts_as_a_miss(monkeypatch):
+    monkeypatch.setattr(dashboard_cache, '_entries', LRUCache(4))
+    user = {'id': 'u1'}
+    dashboard_cache.put(user, 30, False, '"v1"', {'total_evaluations': 1})
+
+    assert dashboard_cache.get(user, 30, False, '"v1"') == {'total_evaluations': 1}
+    assert dashboard_cache.get(user, 30, False, '"v2"') is None
+    assert dashboard_cache.get(user, 7, False, '"v1"') is None
+    stats = dashboard_cache.cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
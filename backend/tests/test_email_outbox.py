@@ -0,0 +1,137 @@
+import asyncio
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.services import email_outbox
+
+
+class _SmtpServer:
+    """A minimal local SMTP server; ``replies`` maps a recipient to the reply its RCPT TO gets."""
+
+    def __init__(self, replies: dict[str, str] | None = None):
+        self.replies = replies or {}
+        self.delivered: list[str] = []
+        self.connections = 0
+        self._sock = socket.create_server(('127.0.0.1', 0))
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def close(self) -> None:
+        self._sock.close()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _addr = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._session, args=(conn,), daemon=True).start()
+
+    def _session(self, conn: socket.socket) -> None:
+        stream = conn.makefile('rb')
+
+        def reply(line: str) -> None:
+            conn.sendall(line.encode() + b'\r\n')
+
+        reply('220 localhost ready')
+        recipients: list[str] = []
+        with conn, stream:
+            for raw in stream:
+                command = raw.decode().strip()
+                verb = command.split(' ', 1)[0].upper()
+                if verb == 'EHLO':
+                    reply('250 localhost')
+                elif verb == 'RCPT':
+                    address = command.split(':', 1)[1].strip().strip('<>')
+                    answer = self.replies.get(address, '250 OK')
+                    if answer.startswith('250'):
+                        recipients.append(address)
+                    reply(answer)
+                elif verb == 'DATA':
+                    reply('354 go ahead')
+                    for line in stream:
+                        if line.rstrip(b'\r\n') == b'.':
+                            break
+                    self.delivered.extend(recipients)
+                    reply('250 queued')
+                elif verb == 'QUIT':
+                    reply('221 bye')
+                    return
+                else:  # MAIL, RSET, NOOP, HELO
+                    if verb in ('MAIL', 'RSET'):
+                        recipients = []
+                    reply('250 OK')
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    server = _SmtpServer()
+    monkeypatch.setattr(settings, 'SMTP_HOST', '127.0.0.1')
+    monkeypatch.setattr(settings, 'SMTP_PORT', server.port)
+    monkeypatch.setattr(settings, 'SMTP_FROM', 'noreply@example.com')
+    monkeypatch.setattr(settings, 'SMTP_USE_TLS', False)
+    monkeypatch.setattr(settings, 'SMTP_USERNAME', None)
+    yield server
+    server.close()
+
+
+def _send(db, *queued: tuple) -> dict[str, dict]:
+    """Queue ``(to_email, deliver_by)`` messages, run one sender pass; returns the outbox rows by recipient."""
+
+    async def main():
+        try:
+            for to_email, deliver_by in queued:
+                await email_outbox.enqueue('verification', to_email, 'http://app/verify', deliver_by=deliver_by)
+            await email_outbox.run_once()
+        finally:
+            await email_outbox.stop_sender()
+        return {row['to']: row async for row in db.email_outbox.find({})}
+
+    return asyncio.run(main())
+
+
+def test_batch_is_delivered_over_one_connection(db, smtp):
+    rows = _send(db, ('a@example.com', None), ('b@example.com', None))
+
+    assert smtp.delivered == ['a@example.com', 'b@example.com']
+    assert smtp.connections == 1
+    assert {row['status'] for row in rows.values()} == {'sent'}
+    # finished_at starts the outbox retention TTL.
+    assert all(row['finished_at'] == row['sent_at'] for row in rows.values())
+
+
+def test_permanent_refusal_fails_without_retry(db, smtp):
+    smtp.replies['gone@example.com'] = '550 no such user'
+    rows = _send(db, ('gone@example.com', None), ('ok@example.com', None))
+
+    message = rows['gone@example.com']
+    assert message['status'] == 'failed'
+    assert message['attempts'] == 1
+    assert message['finished_at']
+    assert smtp.delivered == ['ok@example.com']
+
+
+def test_temporary_refusal_retries_only_before_deadline(db, smtp):
+    smtp.replies['busy@example.com'] = '451 try later'
+    smtp.replies['late@example.com'] = '451 try later'
+    soon = datetime.now(timezone.utc) + timedelta(seconds=settings.EMAIL_RETRY_BASE_SECONDS / 2)
+    rows = _send(db, ('busy@example.com', None), ('late@example.com', soon))
+
+    retrying = rows['busy@example.com']
+    assert retrying['status'] == 'pending'
+    assert 'finished_at' not in retrying
+    assert retrying['next_attempt_at'] > datetime.now(timezone.utc)
+    # Its retry would land after the link expires, so it is given up instead.
+    assert rows['late@example.com']['status'] == 'failed'
+
+
+def test_expired_message_is_not_sent(db, smtp):
+    rows = _send(db, ('old@example.com', datetime.now(timezone.utc) - timedelta(seconds=1)))
+
+    assert smtp.delivered == []
+    assert rows['old@example.com']['status'] == 'failed'
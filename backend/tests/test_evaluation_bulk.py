@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from pydantic import ValidationError
+
+from app.api.evaluations import BulkRequest, ShortlistRequest
+from app.core.config import settings
+from app.db import mongo
+from app.services import evaluation_bulk
+from app.services.evaluation_bulk import apply_bulk
+from app.services.rollups import record_evaluations
+
+
+class _SlowReads:
+    """Wraps a collection so reads suspend like a network round trip, letting concurrent requests interleave."""
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def find(self, *args, **kwargs):
+        return _SlowCursor(self._target.find(*args, **kwargs))
+
+
+class _SlowCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        return await self._cursor.__anext__()
+
+
+def _slow_collection(name: str):
+    return _SlowReads(mongo.collection(name))
+
+
+async def _seed(db, user_id: str, count: int) -> list[str]:
+    docs = [
+        {
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'status': 'Completed',
+            'is_shortlisted': False,
+            'in_rollups': True,
+            'summary': {'automation_score': 50, 'fitment': 'RPA'},
+            'created_at': datetime.now(timezone.utc),
+        }
+        for _ in range(count)
+    ]
+    await db.evaluations.insert_many(docs)
+    await record_evaluations(docs)
+    return [str(doc['_id']) for doc in docs]
+
+
+async def _all_time(db, user_id: str) -> dict:
+    return await db.user_daily_stats.find_one({'_id': f'{user_id}:all'})
+
+
+def test_concurrent_shortlists_count_each_change_once(db, monkeypatch):
+    monkeypatch.setattr(evaluation_bulk, 'collection', _slow_collection)
+
+    async def scenario():
+        ids = await _seed(db, 'u1', 4)
+        first, second = await asyncio.gather(apply_bulk('u1', 'shortlist', ids), apply_bulk('u1', 'shortlist', ids))
+        return ids, first, second, await _all_time(db, 'u1')
+
+    ids, first, second, row = asyncio.run(scenario())
+    assert first['counts'].get('shortlisted', 0) + second['counts'].get('shortlisted', 0) == len(ids)
+    assert row['shortlisted']['count'] == len(ids)
+
+
+def test_concurrent_deletes_remove_rollups_once(db, monkeypatch):
+    monkeypatch.setattr(evaluation_bulk, 'collection', _slow_collection)
+
+    async def scenario():
+        ids = await _seed(db, 'u2', 5)
+        results = await asyncio.gather(*(apply_bulk('u2', 'delete', ids[:3]) for _ in range(3)))
+        return results, await _all_time(db, 'u2'), await db.evaluations.count_documents({'user_id': 'u2'})
+
+    results, row, remaining = asyncio.run(scenario())
+    assert sum(result['counts'].get('deleted', 0) for result in results) == 3
+    assert all(set(result['counts']) <= {'deleted', 'not_found'} for result in results)
+    assert row['all']['count'] == remaining == 2
+
+
+def test_outcomes_per_id(db):
+    async def scenario():
+        ids = await _seed(db, 'u3', 2)
+        await apply_bulk('u3', 'shortlist', ids[:1])
+        return ids, await apply_bulk('u3', 'shortlist', ids + ['bad', str(ObjectId())])
+
+    ids, result = asyncio.run(scenario())
+    outcomes = [row['outcome'] for row in result['results']]
+    assert outcomes == ['unchanged', 'shortlisted', 'invalid_id', 'not_found']
+
+
+def test_bulk_requests_are_capped():
+    ids = [str(ObjectId()) for _ in range(settings.BULK_MAX_IDS + 1)]
+    with pytest.raises(ValidationError):
+        ShortlistRequest(evaluation_ids=ids, shortlist_status=True)
+    with pytest.raises(ValidationError):
+        BulkRequest(action='delete', evaluation_ids=ids)
+    assert len(ShortlistRequest(evaluation_ids=ids[1:], shortlist_status=True).evaluation_ids) == settings.BULK_MAX_IDS
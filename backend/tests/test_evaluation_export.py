@@ -0,0 +1,116 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api import evaluations
+from app.services import evaluation_export
+from app.services.evaluation_payloads import save_payload
+
+USER = {'id': 'u1'}
+
+
+def _evaluation(day: int, name: str, **fields) -> dict:
+    return {
+        '_id': ObjectId(),
+        'user_id': 'u1',
+        'process_name': name,
+        'created_at': datetime(2024, 3, day, 23, 59, tzinfo=timezone.utc),
+        'status': 'Completed',
+        'summary': {'automation_score': day * 10, 'fitment': 'RPA'},
+        'submitted_payload': {'description': f'{name} steps', 'volume': 'High'},
+        **fields,
+    }
+
+
+@pytest.fixture
+def stored(db, monkeypatch):
+    # Small batches, so every export crosses a batch boundary.
+    monkeypatch.setattr(evaluation_export, 'BATCH_SIZE', 2)
+    docs = [_evaluation(day, f'p{day}', is_shortlisted=day % 2 == 0) for day in range(1, 6)]
+    docs.append({**_evaluation(3, 'other'), 'user_id': 'u2'})
+
+    async def fill():
+        await db.evaluations.insert_many(docs)
+        for doc in docs:
+            await save_payload(doc['_id'], doc['user_id'], {'parsed_content': {'fitment': doc['process_name']}})
+
+    asyncio.run(fill())
+    return docs
+
+
+def _export(**params) -> tuple[bytes, dict]:
+    options = {'format': 'ndjson', 'fields': None, 'start': None, 'end': None, 'is_shortlisted': None, 'gzip': False}
+    options.update(params)
+
+    async def scenario():
+        response = await evaluations.export_evaluations(current_user=USER, **options)
+        return b''.join([chunk async for chunk in response.body_iterator]), response.headers
+
+    return asyncio.run(scenario())
+
+
+def test_ndjson_has_default_fields_newest_first(stored):
+    body, headers = _export()
+    rows = [json.loads(line) for line in body.decode().splitlines()]
+
+    assert [row['process_name'] for row in rows] == ['p5', 'p4', 'p3', 'p2', 'p1']
+    assert list(rows[0]) == list(evaluation_export.DEFAULT_FIELDS)
+    assert rows[0]['automation_score'] == 50
+    assert headers['content-disposition'] == 'attachment; filename="evaluations.ndjson"'
+
+
+def test_csv_with_selected_fields_and_payload_content(stored):
+    body, _headers = _export(format='csv', fields='process_name,volume,parsed_content')
+    rows = list(csv.reader(io.StringIO(body.decode())))
+
+    assert rows[0] == ['process_name', 'volume', 'parsed_content']
+    assert rows[1] == ['p5', 'High', '{"fitment": "p5"}']
+    assert len(rows) == 6
+
+
+def test_date_filters_are_inclusive_utc_days(stored):
+    body, _headers = _export(start=date(2024, 3, 2), end=date(2024, 3, 4), fields='process_name')
+
+    assert [json.loads(line)['process_name'] for line in body.decode().splitlines()] == ['p4', 'p3', 'p2']
+
+
+def test_shortlisted_filter_and_gzip(stored):
+    body, headers = _export(is_shortlisted=True, fields='process_name', gzip=True)
+
+    assert headers['content-type'] == 'application/gzip'
+    assert headers['content-disposition'].endswith('evaluations.ndjson.gz"')
+    lines = gzip.decompress(body).decode().splitlines()
+    assert [json.loads(line)['process_name'] for line in lines] == ['p4', 'p2']
+
+
+def test_unknown_field_is_a_bad_request(stored):
+    with pytest.raises(HTTPException) as excinfo:
+        _export(fields='process_name,password')
+    assert excinfo.value.status_code == 400
+
+
+def test_parsed_content_of_an_evaluation_from_before_the_payload_split(stored, db):
+    # No evaluation_payloads document: parsed_content is still inline on the evaluation.
+    legacy = _evaluation(6, 'legacy', parsed_content={'fitment': 'inline'})
+    asyncio.run(db.evaluations.insert_one(legacy))
+
+    body, _headers = _export(fields='process_name,parsed_content')
+    rows = [json.loads(line) for line in body.decode().splitlines()]
+
+    assert rows[0] == {'process_name': 'legacy', 'parsed_content': {'fitment': 'inline'}}
+    assert rows[1] == {'process_name': 'p5', 'parsed_content': {'fitment': 'p5'}}
+
+
+def test_submitted_payload_is_only_read_for_its_fields():
+    def submitted(fields):
+        return [path for path in evaluation_export._projection(fields) if path.startswith('submitted_payload')]
+
+    assert submitted(list(evaluation_export.DEFAULT_FIELDS)) == []
+    assert submitted(['id', 'volume', 'description']) == ['submitted_payload.volume', 'submitted_payload.description']
@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.services import evaluation_jobs
+from app.services.evaluation_payloads import save_payload
+
+AGENT_RESPONSE = {
+    'choices': [{'message': {'content': '{"automation_feasibility_score": 80, "fitment": "RPA", "dimensions": {}}'}}]
+}
+
+
+async def _queued_job(db, **fields) -> ObjectId:
+    oid = ObjectId()
+    await save_payload(oid, 'u1', {'formatted_message': 'prompt'})
+    await db.evaluations.insert_one(
+        {'_id': oid, 'user_id': 'u1', 'process_name': 'p', 'status': 'Queued', 'created_at': datetime.now(timezone.utc), **fields}
+    )
+    return oid
+
+
+def _fake_agent(monkeypatch) -> list:
+    calls = []
+
+    async def call_agent_cached(agent_id, message, use_cache=True):
+        calls.append(message)
+        await asyncio.sleep(0.01)
+        return AGENT_RESPONSE
+
+    monkeypatch.setattr(evaluation_jobs, 'call_agent_cached', call_agent_cached)
+    return calls
+
+
+def test_job_is_claimed_once(db, monkeypatch):
+    calls = _fake_agent(monkeypatch)
+
+    async def scenario():
+        oid = await _queued_job(db)
+        await asyncio.gather(*(evaluation_jobs._run_job(str(oid), True) for _ in range(3)))
+        return await db.evaluations.find_one({'_id': oid}), await db.user_daily_stats.find_one({'_id': 'u1:all'})
+
+    item, rollup = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert item['status'] == 'Completed'
+    assert 'lease_id' not in item and 'lease_until' not in item
+    assert rollup['all']['count'] == 1
+
+
+def test_only_expired_leases_are_requeued(db, monkeypatch):
+    now = datetime.now(timezone.utc)
+    enqueued = []
+    monkeypatch.setattr(evaluation_jobs, 'enqueue', lambda evaluation_id, use_cache=True: enqueued.append(evaluation_id))
+
+    async def scenario():
+        queued = await _queued_job(db)
+        live = await _queued_job(db, status='Running', lease_until=now + timedelta(minutes=5))
+        expired = await _queued_job(db, status='Running', lease_until=now - timedelta(minutes=5))
+        done = await _queued_job(db, status='Completed')
+        await evaluation_jobs._requeue_pending()
+        return queued, live, expired, done
+
+    queued, live, expired, done = asyncio.run(scenario())
+    assert sorted(enqueued) == sorted([str(queued), str(expired)])
+
+
+def test_completion_is_dropped_when_the_lease_was_lost(db, monkeypatch):
+    _fake_agent(monkeypatch)
+
+    async def scenario():
+        oid = await _queued_job(db)
+        claimed = await evaluation_jobs._claim(str(oid))
+        # Another worker took the job over after the lease ran out.
+        await db.evaluations.update_one({'_id': oid}, {'$set': {'lease_id': ObjectId()}})
+        finished = await evaluation_jobs._finish(claimed, 'Completed', {})
+        return finished, await db.evaluations.find_one({'_id': oid})
+
+    finished, item = asyncio.run(scenario())
+    assert finished is False
+    assert item['status'] == 'Running'
+
+
+def test_failure_after_the_agent_call_fails_the_job(db, monkeypatch):
+    _fake_agent(monkeypatch)
+    released = []
+
+    async def save_payload(*args):
+        raise RuntimeError('payload store unavailable')
+
+    async def release(which, user_id):
+        released.append(user_id)
+
+    monkeypatch.setattr(evaluation_jobs, 'save_payload', save_payload)
+    monkeypatch.setattr(evaluation_jobs.quota, 'release', release)
+
+    async def scenario():
+        oid = await _queued_job(db)
+        await evaluation_jobs._run_job(str(oid), True)
+        return await db.evaluations.find_one({'_id': oid})
+
+    item = asyncio.run(scenario())
+    assert item['status'] == 'Failed'
+    assert item['agent_error'] == 'payload store unavailable'
+    assert 'lease_id' not in item
+    assert released == ['u1']
+
+
+def test_expired_leases_are_requeued_while_running(db, monkeypatch):
+    now = datetime.now(timezone.utc)
+    enqueued = []
+    monkeypatch.setattr(evaluation_jobs, 'enqueue', lambda evaluation_id, use_cache=True: enqueued.append(evaluation_id))
+    monkeypatch.setattr(settings, 'EVALUATION_REQUEUE_INTERVAL_SECONDS', 0.01)
+
+    async def scenario():
+        await _queued_job(db)
+        await _queued_job(db, status='Running', lease_until=now + timedelta(minutes=5))
+        expired = await _queued_job(db, status='Running', lease_until=now - timedelta(minutes=5))
+        task = asyncio.create_task(evaluation_jobs._requeue_expired())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return expired
+
+    expired = asyncio.run(scenario())
+    # Queued jobs are already in some process's queue; only the dead worker's job is picked up again.
+    assert enqueued and set(enqueued) == {str(expired)}
@@ -0,0 +1,176 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+from app.api import evaluations
+from app.core.config import settings
+from app.services.evaluation_payloads import save_payload
+
+NOW = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+USER = {'id': 'u1'}
+
+
+def _evaluation(n: int, **fields) -> dict:
+    # Pairs of rows share a created_at, so only the _id orders them.
+    return {
+        '_id': ObjectId(),
+        'user_id': 'u1',
+        'process_name': f'p{n}',
+        'created_at': NOW + timedelta(minutes=n // 2),
+        'status': 'Completed',
+        'summary': {'fitment': 'RPA' if n % 3 else 'Agentic AI'},
+        **fields,
+    }
+
+
+async def _list(**params) -> tuple[list[dict], str | None]:
+    response = Response()
+    options = {'limit': None, 'after': None, 'status': None, 'fitment': None, 'is_shortlisted': None, **params}
+    rows = await evaluations.my_evaluations(response, current_user=USER, **options)
+    return rows, response.headers.get('X-Next-Cursor')
+
+
+def _pages(**params) -> list[list[str]]:
+    async def scenario():
+        pages, after = [], None
+        while True:
+            rows, after = await _list(after=after, **params)
+            pages.append([row['process_name'] for row in rows])
+            if after is None:
+                return pages
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def listed(db):
+    docs = [_evaluation(n) for n in range(11)] + [{**_evaluation(20), 'user_id': 'u2'}]
+    asyncio.run(db.evaluations.insert_many(docs))
+    newest_first = sorted(docs[:11], key=lambda d: (d['created_at'], d['_id']), reverse=True)
+    return [doc['process_name'] for doc in newest_first]
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4, 11, 50])
+def test_keyset_pages_cover_the_list_without_gaps_or_repeats(listed, limit):
+    pages = _pages(limit=limit)
+
+    assert [name for page in pages for name in page] == listed
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_filters_apply_on_every_page(listed):
+    pages = _pages(limit=2, fitment='RPA')
+
+    assert [name for page in pages for name in page] == [name for name in listed if int(name[1:]) % 3]
+
+
+def test_unlimited_list_has_no_cursor(listed):
+    rows, after = asyncio.run(_list())
+
+    assert [row['process_name'] for row in rows] == listed
+    assert after is None
+
+
+def test_invalid_cursor_is_a_bad_request(listed):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(_list(limit=2, after='not-a-cursor'))
+    assert excinfo.value.status_code == 400
+
+
+SUBMITTED = {
+    'process_name': 'Invoice matching',
+    'description': 'Match each vendor invoice against its purchase order and goods receipt before approval.',
+    'volume': 'High',
+    'frequency': 'Daily',
+    'exception_rate': 5,
+    'complexity': 3,
+    'risk_tolerance': 'Low',
+    'compliance_sensitivity': 'High',
+    'decision_points': 'amount, vendor',
+    'sop_metadata': {'sha256': 'abc'},
+}
+CONTENT = {'automation_feasibility_score': 80, 'fitment': 'RPA'}
+
+
+def _reuse(changes: dict):
+    user = {'id': str(ObjectId())}
+
+    async def scenario():
+        prior = await evaluations._store_completed(
+            user, SUBMITTED, None, {'formatted_message': 'prompt', 'parsed_content': CONTENT}
+        )
+        reused = await evaluations._reuse_similar(user, {**SUBMITTED, **changes}, 'new prompt', None)
+        return prior, reused
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(
+    'changes',
+    [{}, {'description': SUBMITTED['description'] + ' '}, {'process_name': 'invoice MATCHING'}],
+)
+def test_near_identical_submission_reuses_the_earlier_result(db, changes):
+    prior, reused = _reuse(changes)
+
+    assert reused is not None
+    assert reused['reused_from'] == prior['id']
+    assert reused['similarity'] >= settings.SIMILARITY_REUSE_THRESHOLD
+    assert reused['parsed_content'] == CONTENT
+    assert reused['formatted_message'] == 'new prompt'
+    assert reused['id'] != prior['id']
+
+
+@pytest.mark.parametrize(
+    'changes',
+    [
+        {'description': 'Reconcile the monthly bank statement with the general ledger and flag gaps.'},
+        {'volume': 'Low'},
+        {'exception_rate': 6},
+        {'decision_points': 'amount'},
+        {'sop_metadata': {'sha256': 'other'}},
+        {'sop_metadata': None},
+    ],
+)
+def test_different_text_or_inputs_are_not_reused(db, changes):
+    _prior, reused = _reuse(changes)
+
+    assert reused is None
+
+
+def _get(evaluation_id, include=None) -> dict:
+    return asyncio.run(evaluations.get_evaluation(str(evaluation_id), current_user=USER, include=include))
+
+
+def test_detail_reads_the_payload_and_hides_bookkeeping(db):
+    doc = _evaluation(1, in_rollups=True, started_at=NOW, completed_at=NOW, lease_id=ObjectId(), lease_until=NOW)
+
+    async def fill():
+        await db.evaluations.insert_one(doc)
+        await save_payload(doc['_id'], 'u1', {'formatted_message': 'prompt', 'parsed_content': CONTENT})
+
+    asyncio.run(fill())
+    item = _get(doc['_id'])
+
+    assert item['parsed_content'] == CONTENT
+    assert item['process_name'] == 'p1'
+    assert not set(evaluations.INTERNAL_FIELDS) & set(item)
+    assert 'formatted_message' not in item
+    assert _get(doc['_id'], include='raw')['formatted_message'] == 'prompt'
+
+
+def test_detail_of_an_evaluation_from_before_the_payload_split(db):
+    # No evaluation_payloads document: the fields are still inline on the evaluation.
+    doc = _evaluation(1, parsed_content=CONTENT, agent_response={'choices': []}, formatted_message='prompt')
+    asyncio.run(db.evaluations.insert_one(doc))
+
+    item = _get(doc['_id'])
+    raw = _get(doc['_id'], include='raw')
+
+    assert item['parsed_content'] == CONTENT
+    assert 'agent_response' not in item and 'formatted_message' not in item
+    assert raw['parsed_content'] == CONTENT
+    assert (raw['agent_response'], raw['formatted_message']) == ({'choices': []}, 'prompt')
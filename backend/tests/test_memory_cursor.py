@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.db.memory import InMemoryDB
+
+NOW = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def _run(fill, read):
+    async def scenario():
+        collection = InMemoryDB().items
+        await fill(collection)
+        return await read(collection)
+
+    return asyncio.run(scenario())
+
+
+def _rows(docs):
+    async def fill(collection):
+        await collection.insert_many(docs)
+
+    return fill
+
+
+async def _ids(cursor) -> list:
+    return [row['_id'] async for row in cursor]
+
+
+# Five groups of four equal scores, inserted out of score order.
+TIED = [{'_id': i, 'score': (i * 3) % 5} for i in range(20)]
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 5, 19, 20, 25])
+def test_top_k_keeps_tied_rows_in_collection_order(limit):
+    async def read(collection):
+        full = await _ids(collection.find({}).sort('score', 1))
+        top = await _ids(collection.find({}).sort('score', 1).limit(limit))
+        return full, top
+
+    full, top = _run(_rows(TIED), read)
+    assert full == sorted(range(20), key=lambda i: ((i * 3) % 5, i))
+    # The bounded heap must pick the same rows, ties included, as sorting everything.
+    assert top == full[:limit]
+
+
+def test_descending_sort_with_id_tiebreak_pages_without_gaps_or_repeats():
+    ids = [ObjectId() for _ in range(23)]
+    # Pairs of rows share a created_at, so only the _id orders them.
+    docs = [{'_id': oid, 'created_at': NOW + timedelta(minutes=n // 2)} for n, oid in enumerate(ids)]
+    spec = [('created_at', -1), ('_id', -1)]
+
+    async def read(collection):
+        full = await _ids(collection.find({}).sort(spec))
+        pages = {}
+        for size in (1, 4, 5, 10, 23):
+            rows = []
+            for skip in range(0, 30, size):
+                rows += await _ids(collection.find({}).sort(spec).skip(skip).limit(size))
+            pages[size] = rows
+        return full, pages
+
+    full, pages = _run(_rows(docs), read)
+    assert full == [doc['_id'] for doc in sorted(docs, key=lambda d: (d['created_at'], d['_id']), reverse=True)]
+    for size, rows in pages.items():
+        assert rows == full, size
+
+
+@pytest.mark.parametrize('skip, limit', [(0, 0), (3, 0), (3, 4), (18, 4), (20, 4), (25, 4), (19, 1)])
+def test_skip_and_limit_across_the_heap_boundary(skip, limit):
+    async def read(collection):
+        return await _ids(collection.find({}).sort([('score', -1), ('_id', 1)]).skip(skip).limit(limit))
+
+    expected = sorted(range(20), key=lambda i: (-((i * 3) % 5), i))
+    assert _run(_rows(TIED), read) == expected[skip:skip + limit if limit else None]
+
+
+def test_missing_values_and_arrays_sort_like_mongo():
+    docs = [
+        {'_id': 1, 'v': 5},
+        {'_id': 2},
+        {'_id': 3, 'v': [7, 1]},
+        {'_id': 4, 'v': None},
+        {'_id': 5, 'v': 3},
+    ]
+
+    async def read(collection):
+        ascending = await _ids(collection.find({}).sort([('v', 1), ('_id', 1)]).limit(3))
+        descending = await _ids(collection.find({}).sort([('v', -1), ('_id', 1)]).limit(3))
+        return ascending, descending
+
+    # Missing and null sort first; an array sorts by its smallest element ascending, largest descending.
+    assert _run(_rows(docs), read) == ([2, 4, 3], [3, 1, 5])
+
+
+def test_mutating_returned_rows_leaves_the_store_alone():
+    doc = {'_id': 1, 'name': 'a', 'summary': {'score': 1}, 'tags': ['x']}
+
+    async def read(collection):
+        row = await collection.find_one({'_id': 1})
+        row['name'] = 'changed'
+        row.pop('summary')
+        row['id'] = str(row.pop('_id'))
+        projected = await collection.find({}, {'name': 1}).to_list(None)
+        projected[0]['name'] = 'changed'
+        updated = await collection.find_one_and_update({'_id': 1}, {'$set': {'extra': 1}}, return_document=True)
+        updated['name'] = 'changed'
+        return await collection.find_one({'_id': 1})
+
+    assert _run(_rows([doc]), read) == {**doc, 'extra': 1}
+
+
+def test_returned_rows_keep_their_values_after_later_writes():
+    doc = {'_id': 1, 'summary': {'score': 1, 'meta': {'v': 1}}, 'tags': ['x']}
+
+    async def read(collection):
+        before = await collection.find_one({'_id': 1})
+        update = {'$set': {'summary.meta.v': 2, 'tags': ['y']}, '$inc': {'summary.score': 1}}
+        await collection.update_one({'_id': 1}, update)
+        after = await collection.find_one({'_id': 1})
+        return before, after
+
+    before, after = _run(_rows([doc]), read)
+    # Writes store a new image instead of editing the old one, so earlier reads see a stable snapshot.
+    assert before == doc
+    assert after == {'_id': 1, 'summary': {'score': 2, 'meta': {'v': 2}}, 'tags': ['y']}
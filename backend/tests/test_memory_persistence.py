@@ -0,0 +1,51 @@
+import asyncio
+import os
+import threading
+
+from app.db.memory import InMemoryDB
+
+
+def test_reopen_and_close_leaves_no_empty_segment_or_thread(tmp_path):
+    async def write():
+        db = InMemoryDB(str(tmp_path))
+        await db.items.insert_one({'_id': 1, 'name': 'a'})
+        await db.close()
+
+    async def reopen():
+        db = InMemoryDB(str(tmp_path))
+        try:
+            return await db.items.find_one({'_id': 1})
+        finally:
+            await db.close()
+
+    asyncio.run(write())
+    files = sorted(os.listdir(tmp_path))
+    assert asyncio.run(reopen()) == {'_id': 1, 'name': 'a'}
+    assert asyncio.run(reopen()) == {'_id': 1, 'name': 'a'}
+    assert sorted(os.listdir(tmp_path)) == files
+    assert not [t for t in threading.enumerate() if t.name.startswith('memory-db-log')]
+
+
+def test_close_waits_for_a_snapshot_its_final_commit_starts(tmp_path):
+    async def write():
+        db = InMemoryDB(str(tmp_path))
+        await db.items.insert_many([{'_id': i} for i in range(3)])
+        await db.close()
+
+    async def reopen_and_close(snapshot_ops: int):
+        # The unsnapshotted log replayed on open already exceeds snapshot_ops, so closing starts a snapshot.
+        db = InMemoryDB(str(tmp_path), snapshot_ops=snapshot_ops)
+        await db.close()
+
+    async def read():
+        db = InMemoryDB(str(tmp_path))
+        try:
+            return [doc['_id'] async for doc in db.items.find({})]
+        finally:
+            await db.close()
+
+    asyncio.run(write())
+    asyncio.run(reopen_and_close(snapshot_ops=1))
+    assert [name for name in os.listdir(tmp_path) if name.startswith('snapshot')]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('oplog')]
+    assert asyncio.run(read()) == [0, 1, 2]
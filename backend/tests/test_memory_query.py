@@ -0,0 +1,197 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, WriteError
+
+from app.db.memory import InMemoryDB
+from app.db.memory.indexes import plan
+from app.db.memory.query import matches
+from app.db.memory.update import apply_update
+
+NOW = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+DOC = {
+    '_id': 1,
+    'status': 'Running',
+    'score': 7,
+    'tags': ['a', 'b'],
+    'summary': {'version': 2, 'fitment': 'RPA'},
+    'items': [{'n': 1}, {'n': 5}],
+    'created_at': NOW,
+    'note': None,
+}
+
+
+@pytest.mark.parametrize(
+    'query, expected',
+    [
+        ({'status': 'Running'}, True),
+        ({'summary.fitment': 'RPA'}, True),
+        ({'tags': 'b'}, True),
+        ({'tags': ['a', 'b']}, True),
+        ({'items.n': 5}, True),
+        ({'score': 7.0}, True),
+        ({'score': '7'}, False),
+        ({'missing': None}, True),
+        ({'note': None}, True),
+        ({'score': {'$gt': 6, '$lte': 7}}, True),
+        ({'score': {'$lt': 7}}, False),
+        # Comparisons stay within a BSON type: a number is never greater than a string.
+        ({'score': {'$gt': 'a'}}, False),
+        ({'created_at': {'$gte': NOW.replace(tzinfo=None)}}, True),
+        ({'created_at': {'$lt': NOW - timedelta(seconds=1)}}, False),
+        ({'status': {'$in': ['Queued', 'Running']}}, True),
+        ({'tags': {'$in': ['z', 'a']}}, True),
+        ({'status': {'$ne': 'Queued'}}, True),
+        ({'tags': {'$ne': 'a'}}, False),
+        ({'summary.version': {'$ne': 3}}, True),
+        ({'note': {'$exists': True}}, True),
+        ({'missing': {'$exists': False}}, True),
+        # The lease check: a missing or past lease is "not >= now".
+        ({'missing': {'$not': {'$gte': NOW}}}, True),
+        ({'created_at': {'$not': {'$gte': NOW}}}, False),
+        ({'$or': [{'status': 'Queued'}, {'status': 'Running', 'score': 7}]}, True),
+        ({'$and': [{'score': {'$gte': 7}}, {'tags': 'c'}]}, False),
+    ],
+)
+def test_query_operators(query, expected):
+    assert matches(DOC, query) is expected
+
+
+def test_quota_expression():
+    below = {
+        '$or': [
+            {'$eq': [{'$ifNull': ['$limit', 2]}, None]},
+            {'$lt': [{'$ifNull': ['$count', 0]}, {'$ifNull': ['$limit', 2]}]},
+        ]
+    }
+    assert matches({'count': 1}, {'$expr': below})
+    assert not matches({'count': 2}, {'$expr': below})
+    assert matches({'count': 9, 'limit': 10}, {'$expr': below})
+
+
+@pytest.mark.parametrize(
+    'query', [{'$nor': []}, {'tags': {'$size': 2}}, {'status': {'$regex': 'R'}}, {'$expr': {'$add': [1, 2]}}]
+)
+def test_unsupported_operators_fail_loudly(query):
+    with pytest.raises(OperationFailure):
+        matches(DOC, query)
+
+
+def test_update_copies_only_the_written_path():
+    before = {'_id': 1, 'summary': {'version': 1, 'meta': {'a': 1}}, 'other': {'x': 1}, 'count': 1}
+    after = dict(before)
+    apply_update(after, {'$set': {'summary.version': 2}, '$inc': {'count': 2, 'fresh': 1}, '$unset': {'other.x': ''}})
+
+    assert after == {'_id': 1, 'summary': {'version': 2, 'meta': {'a': 1}}, 'other': {}, 'count': 3, 'fresh': 1}
+    assert before == {'_id': 1, 'summary': {'version': 1, 'meta': {'a': 1}}, 'other': {'x': 1}, 'count': 1}
+    assert after['summary']['meta'] is before['summary']['meta']
+
+
+@pytest.mark.parametrize(
+    'update, error',
+    [
+        ({'$inc': {'name': 1}}, WriteError),
+        ({'$set': {'_id': 2}}, WriteError),
+        ({'$push': {'tags': 'c'}}, WriteError),
+        ({'name': 'replacement'}, ValueError),
+    ],
+)
+def test_invalid_updates(update, error):
+    with pytest.raises(error):
+        apply_update({'_id': 1, 'name': 'a'}, update)
+
+
+def test_upsert_seeds_from_the_query_and_set_on_insert():
+    async def scenario():
+        stats = InMemoryDB().stats
+        op = UpdateOne(
+            {'_id': 'u:day', 'user_id': {'$eq': 'u'}},
+            {'$inc': {'all.count': 1}, '$setOnInsert': {'day': 'day'}},
+            upsert=True,
+        )
+        await stats.bulk_write([op, op])
+        return await stats.find_one({'_id': 'u:day'})
+
+    assert asyncio.run(scenario()) == {'_id': 'u:day', 'user_id': 'u', 'all': {'count': 2}, 'day': 'day'}
+
+
+def test_unique_and_partial_ttl_indexes():
+    async def scenario():
+        users = InMemoryDB().users
+        await users.create_index('email', unique=True)
+        await users.create_index(
+            [('created_at', 1)], expireAfterSeconds=300, partialFilterExpression={'email_verified': False}
+        )
+        old = datetime.now(timezone.utc) - timedelta(seconds=400)
+        await users.insert_one({'email': 'new@x', 'email_verified': False, 'created_at': old})
+        await users.insert_one({'email': 'kept@x', 'email_verified': True, 'created_at': old})
+        with pytest.raises(DuplicateKeyError):
+            await users.insert_one({'email': 'kept@x'})
+        users._swept_at = 0.0
+        return [user['email'] async for user in users.find({})]
+
+    assert asyncio.run(scenario()) == ['kept@x']
+
+
+def test_indexed_reads_match_a_full_scan():
+    rng = random.Random(7)
+    docs = [
+        {
+            '_id': i,
+            'user_id': f'u{rng.randrange(5)}',
+            'status': rng.choice(['Queued', 'Running', 'Completed']),
+            'created_at': NOW + timedelta(minutes=rng.randrange(100)),
+            'day': f'2024-03-{rng.randrange(1, 10):02d}',
+            # A few array values make the index multikey for those documents.
+            **({'tags': ['x', 'y']} if i % 11 == 0 else {'tags': rng.choice(['x', 'z'])}),
+        }
+        for i in range(400)
+    ]
+    queries = [
+        {'user_id': 'u1'},
+        {'user_id': {'$in': ['u2', 'u3']}, 'status': 'Queued'},
+        {'user_id': 'u4', 'created_at': {'$gte': NOW + timedelta(minutes=50)}},
+        {'user_id': 'u0', 'created_at': {'$gt': NOW + timedelta(minutes=10), '$lt': NOW + timedelta(minutes=20)}},
+        {'user_id': 'u2', 'day': {'$gte': '2024-03-03', '$lte': '2024-03-05'}},
+        {'tags': 'y'},
+        {'$or': [{'status': 'Queued'}, {'user_id': 'u1'}], 'created_at': {'$lt': NOW + timedelta(minutes=30)}},
+    ]
+
+    async def scenario():
+        evaluations = InMemoryDB().evaluations
+        await evaluations.insert_many(docs)
+        for field in ('created_at', 'status', 'day'):
+            await evaluations.create_index([('user_id', 1), (field, 1)])
+        await evaluations.create_index('tags')
+        await evaluations.update_one({'_id': 3}, {'$set': {'user_id': 'u1'}})
+        await evaluations.delete_one({'_id': 4})
+        results = []
+        for query in queries:
+            results.append(sorted([doc['_id'] async for doc in evaluations.find(query)]))
+        stored = [doc async for doc in evaluations.find({})]
+        planned = [plan(evaluations._indexes.values(), query) is not None for query in queries]
+        return results, stored, planned
+
+    results, stored, planned = asyncio.run(scenario())
+    # Every query but the $or one is served from an index, so this compares index reads with a scan.
+    assert planned == [True] * 6 + [False]
+    for query, found in zip(queries, results):
+        assert found == sorted(doc['_id'] for doc in stored if matches(doc, query)), query
+        assert found
+
+
+def test_find_one_and_update_returns_the_requested_image():
+    async def scenario():
+        jobs = InMemoryDB().jobs
+        await jobs.insert_one({'_id': 1, 'status': 'Queued'})
+        before = await jobs.find_one_and_update({'_id': 1, 'status': 'Queued'}, {'$set': {'status': 'Running'}})
+        again = await jobs.find_one_and_update({'_id': 1, 'status': 'Queued'}, {'$set': {'status': 'Running'}})
+        after = await jobs.find_one_and_update(
+            {'_id': 1}, {'$unset': {'status': ''}}, return_document=ReturnDocument.AFTER
+        )
+        return before, again, after
+
+    assert asyncio.run(scenario()) == ({'_id': 1, 'status': 'Queued'}, None, {'_id': 1})
@@ -0,0 +1,26 @@
+import asyncio
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+
+
+def _get_metrics() -> httpx.Response:
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://t') as client:
+            return await client.get('/metrics')
+
+    return asyncio.run(send())
+
+
+def test_metrics_are_off_by_default():
+    assert _get_metrics().status_code == 404
+
+
+def test_metrics_when_enabled(monkeypatch):
+    monkeypatch.setattr(settings, 'METRICS_ENABLED', True)
+    response = _get_metrics()
+
+    assert response.status_code == 200
+    assert 'agent_cache' in response.json()
@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.db.migrations import rebuild_rollups
+from app.services.rollups import record_evaluations
+
+
+def _evaluation(user_id: str, day: int, score: float, **fields) -> dict:
+    return {
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'status': 'Completed',
+        'created_at': datetime(2024, 3, day, 12, tzinfo=timezone.utc),
+        'summary': {'automation_score': score, 'fitment': 'RPA'},
+        **fields,
+    }
+
+
+def test_rebuild_rewrites_only_drifted_users(db):
+    steady, drifted, emptied = (str(ObjectId()) for _ in range(3))
+
+    async def scenario():
+        await db.users.insert_many([{'_id': ObjectId(uid)} for uid in (steady, drifted, emptied)])
+        kept = [_evaluation(steady, 1, 40, in_rollups=True), _evaluation(drifted, 2, 60, in_rollups=True)]
+        lost = _evaluation(drifted, 3, 80, in_rollups=True)
+        gone = _evaluation(emptied, 4, 20, in_rollups=True)
+        await record_evaluations(kept + [lost, gone])
+        # The drifted user's evaluation and the emptied user's only one disappear without the rollups noticing.
+        await db.evaluations.insert_many(kept + [_evaluation(drifted, 5, 10, status='Failed', in_rollups=True)])
+        await db.users.update_many({}, {'$set': {'dashboard_generation': 0}})
+
+        changed = await rebuild_rollups(batch_size=2)
+        generations = {str(u['_id']): u['dashboard_generation'] async for u in db.users.find({})}
+        rows = {row['_id']: row async for row in db.user_daily_stats.find({})}
+        failed = await db.evaluations.find_one({'user_id': drifted, 'status': 'Failed'})
+        return changed, generations, rows, failed
+
+    changed, generations, rows, failed = asyncio.run(scenario())
+    assert changed == 2
+    assert generations == {steady: 0, drifted: 1, emptied: 1}
+    assert sorted(rows) == sorted([f'{steady}:all', f'{steady}:2024-03-01', f'{drifted}:all', f'{drifted}:2024-03-02'])
+    assert rows[f'{drifted}:all']['all'] == {'count': 1, 'score_sum': 60.0, 'score_count': 1, 'fitment': {'RPA': 1}}
+    assert 'in_rollups' not in failed
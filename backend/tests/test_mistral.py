@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services import mistral
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Route the shared client through a mock transport that records requests and plays queued replies."""
+    requests = []
+    replies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        reply = replies.pop(0) if replies else httpx.Response(200, json={'ok': True})
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(mistral, '_client', httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return SimpleNamespace(requests=requests, replies=replies)
+
+
+def test_client_is_created_once_and_closed():
+    async def scenario():
+        await mistral.init_client()
+        first = mistral.get_client()
+        await mistral.init_client()
+        same = mistral.get_client() is first
+        await mistral.close_client()
+        return first, same
+
+    first, same = asyncio.run(scenario())
+    assert same
+    assert first.is_closed
+    assert mistral._client is None
+
+
+def test_calls_reuse_the_shared_client_with_a_per_call_read_timeout(agent):
+    async def scenario():
+        client = mistral.get_client()
+        await mistral.call_agent('agent', 'one')
+        await mistral.call_agent('agent', 'two', timeout_seconds=5)
+        return client is mistral.get_client()
+
+    assert asyncio.run(scenario())
+    default, override = (request.extensions['timeout'] for request in agent.requests)
+    assert default['read'] == settings.MISTRAL_READ_TIMEOUT_SECONDS
+    assert override['read'] == 5
+    assert override['connect'] == settings.MISTRAL_CONNECT_TIMEOUT_SECONDS
+
+
+@pytest.mark.parametrize(
+    'reply, status_code',
+    [(httpx.ReadTimeout('slow'), 504), (httpx.Response(500, text='boom'), 502)],
+)
+def test_transport_errors_map_to_gateway_errors(agent, reply, status_code):
+    agent.replies.append(reply)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(mistral.call_agent('agent', 'prompt'))
+    assert excinfo.value.status_code == status_code
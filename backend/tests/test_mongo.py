@@ -0,0 +1,34 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.db.mongo import init_db
+
+
+def test_conflicting_text_index_does_not_skip_other_indexes(db):
+    async def scenario():
+        await db.evaluations.create_index([('process_name', 'text')], name='legacy_text')
+        await init_db()
+        return await db.email_outbox.index_information(), await db.agent_cache.index_information()
+
+    outbox, agent_cache = asyncio.run(scenario())
+    assert 'status_1_next_attempt_at_1' in outbox
+    assert 'expires_at_1' in agent_cache
+
+
+def test_finished_outbox_messages_expire(db):
+    old = datetime.now(timezone.utc) - timedelta(seconds=settings.EMAIL_OUTBOX_RETENTION_SECONDS + 60)
+
+    async def scenario():
+        await init_db()
+        await db.email_outbox.insert_many(
+            [
+                {'_id': 'sent', 'status': 'sent', 'created_at': old, 'finished_at': old},
+                {'_id': 'recent', 'status': 'failed', 'created_at': old, 'finished_at': datetime.now(timezone.utc)},
+                {'_id': 'pending', 'status': 'pending', 'created_at': old},
+            ]
+        )
+        db.email_outbox._swept_at = 0.0
+        return sorted([row['_id'] async for row in db.email_outbox.find({})])
+
+    assert asyncio.run(scenario()) == ['pending', 'recent']
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.services import quota, user_cache
+
+
+def _use(db, limits: dict, calls: int, which: quota.Quota = quota.USE_CASES) -> tuple[dict, int]:
+    """Make ``calls`` metered calls; returns the user document and how many were refused."""
+
+    async def scenario():
+        oid = ObjectId()
+        await db.users.insert_one({'_id': oid, **limits})
+        refused = 0
+        for _ in range(calls):
+            try:
+                async with quota.reserved(which, await user_cache.get_user(str(oid))):
+                    pass
+            except HTTPException:
+                refused += 1
+        return await db.users.find_one({'_id': oid}), refused
+
+    return asyncio.run(scenario())
+
+
+def test_unlimited_use_cases_skip_the_counter(db):
+    user, refused = _use(db, {}, 3)
+
+    assert quota.USE_CASES.default_limit is None
+    assert refused == 0
+    assert 'use_case_count' not in user
+
+
+def test_limited_use_cases_are_reserved(db):
+    user, refused = _use(db, {'use_case_limit': 2}, 3)
+
+    assert refused == 1
+    assert user['use_case_count'] == 2
+
+
+def test_unlimited_evaluations_are_still_counted(db, monkeypatch):
+    monkeypatch.setattr(quota, 'EVALUATIONS', quota.Quota('evaluation_count', 'evaluation_limit', None, 'limit'))
+    user, refused = _use(db, {}, 2, quota.EVALUATIONS)
+
+    assert refused == 0
+    assert user['evaluation_count'] == 2
+
+
+def test_failed_work_releases_its_unit(db):
+    async def scenario():
+        oid = ObjectId()
+        await db.users.insert_one({'_id': oid, 'use_case_limit': 1})
+        with pytest.raises(RuntimeError):
+            async with quota.reserved(quota.USE_CASES, await user_cache.get_user(str(oid))):
+                raise RuntimeError('agent failed')
+        return await db.users.find_one({'_id': oid})
+
+    assert asyncio.run(scenario())['use_case_count'] == 0
@@ -0,0 +1,31 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.services.rollups import day_of, load_dashboard_stats, record_evaluations
+
+
+def test_day_of_buckets_aware_datetimes_by_utc_day():
+    late_evening = datetime(2024, 3, 1, 23, 30, tzinfo=timezone(timedelta(hours=-5)))
+
+    assert day_of(late_evening) == '2024-03-02'
+    assert day_of(datetime(2024, 3, 1, 23, 30)) == '2024-03-01'
+
+
+def test_dashboard_stats_only_read_the_requested_window(db):
+    def evaluation(day: int, score: float) -> dict:
+        return {
+            'user_id': 'u1',
+            'created_at': datetime(2024, 3, day, 12, tzinfo=timezone.utc),
+            'summary': {'automation_score': score, 'fitment': 'RPA'},
+        }
+
+    async def scenario():
+        await record_evaluations([evaluation(1, 10), evaluation(5, 50), evaluation(9, 90)])
+        return await load_dashboard_stats('u1', '2024-03-02', '2024-03-08', 'all')
+
+    stats = asyncio.run(scenario())
+    assert stats['total_all'] == 3
+    assert stats['total'] == 1
+    assert stats['avg_score'] == 50
+    assert stats['trend'] == [('2024-03-05', 1, 50)]
+    assert stats['distribution'] == [('RPA', 1)]
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.config import settings
+
+
+@pytest.fixture
+def hashing():
+    yield
+    security.shutdown_hash_executor()
+
+
+def test_hashing_runs_off_the_event_loop(hashing):
+    async def scenario():
+        hashed = await security.hash_password_async('secret')
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.001)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        results = await asyncio.gather(
+            *(security.verify_password_async(password, hashed) for password in ('secret', 'wrong'))
+        )
+        task.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(scenario())
+    assert results == [True, False]
+    # The loop kept serving other coroutines while the hashes were computed.
+    assert ticks > 0
+
+
+def test_requests_past_the_queue_limit_are_shed(hashing, monkeypatch):
+    monkeypatch.setattr(settings, 'PASSWORD_HASH_WORKERS', 1)
+    monkeypatch.setattr(settings, 'PASSWORD_HASH_QUEUE_SIZE', 1)
+    release = threading.Event()
+    monkeypatch.setattr(security, 'verify_password', lambda plain, hashed: release.wait(5))
+
+    async def scenario():
+        admitted = [asyncio.ensure_future(security.verify_password_async('p', 'h')) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as excinfo:
+            await security.verify_password_async('p', 'h')
+        pending = security.hash_executor_stats()['pending']
+        release.set()
+        return excinfo.value, pending, await asyncio.gather(*admitted)
+
+    refused, pending, results = asyncio.run(scenario())
+    assert refused.status_code == 503
+    assert refused.headers == {'Retry-After': '1'}
+    assert pending == 2
+    assert results == [True, True]
+    assert security.hash_executor_stats()['pending'] == 0
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def _counted(result='done', error: Exception | None = None, delay: float = 0.01):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return fn, calls
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    fn, calls = _counted()
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do('k', fn) for _ in range(3)))
+
+    assert asyncio.run(scenario()) == ['done'] * 3
+    assert len(calls) == 1
+    assert flight.stats() == {'in_flight': 0, 'calls': 1, 'coalesced': 2}
+
+
+def test_cancelled_waiter_leaves_the_call_running_for_the_others():
+    flight = SingleFlight()
+    fn, calls = _counted(delay=0.05)
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do('k', fn))
+        second = asyncio.ensure_future(flight.do('k', fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == 'done'
+    assert len(calls) == 1
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight()
+    fn, calls = _counted(error=RuntimeError('agent down'))
+
+    async def scenario():
+        results = await asyncio.gather(flight.do('k', fn), flight.do('k', fn), return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await flight.do('k', fn)
+        return results
+
+    results = asyncio.run(scenario())
+    assert [str(result) for result in results] == ['agent down', 'agent down']
+    # The failed call was forgotten, so the next caller tried again.
+    assert len(calls) == 2
+
+
+def test_finished_keys_are_forgotten():
+    flight = SingleFlight()
+    fn, calls = _counted()
+
+    async def scenario():
+        await flight.do('a', fn)
+        in_flight = len(flight)
+        await asyncio.gather(flight.do('a', fn), flight.do('b', fn))
+        return in_flight
+
+    assert asyncio.run(scenario()) == 0
+    assert len(flight) == 0
+    assert len(calls) == 3
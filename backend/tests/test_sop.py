@@ -0,0 +1,123 @@
+import asyncio
+import io
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from app.core.lru import LRUCache
+from app.services import sop
+
+
+def _spin(cpu_limit: float) -> None:
+    # One long "page": never returns to a between-pages check.
+    with sop._cpu_limit(cpu_limit):
+        while True:
+            pass
+
+
+@pytest.fixture
+def pool():
+    sop.start_pool()
+    yield
+    sop._recycle_pool()
+
+
+@pytest.mark.skipif(sop.resource is None, reason='RLIMIT_CPU is not available on this platform')
+def test_cpu_limit_interrupts_a_running_task(pool):
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        with pytest.raises(sop._CpuLimitExceeded):
+            await loop.run_in_executor(sop._get_pool(), _spin, 1)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 5
+
+
+def _nap(seconds: float) -> str:
+    time.sleep(seconds)
+    return 'done'
+
+
+def test_timeout_kills_the_workers_and_restarts_the_pool(pool):
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        stuck = sop._get_pool()
+        calls = [sop._in_pool(time.sleep, 30) for _ in range(3)]
+        running = asyncio.ensure_future(sop._run_all(calls, loop.time() + 0.5))
+        await asyncio.sleep(0.2)
+        processes = list(stuck._processes.values())
+        with pytest.raises(sop.SopLimitError) as excinfo:
+            await running
+        return excinfo.value.status_code, stuck, processes
+
+    status_code, stuck, processes = asyncio.run(scenario())
+    assert status_code == 422
+    assert sop._pool is None
+    assert processes
+    for process in processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
+    # The next extraction gets a fresh pool.
+    assert sop._get_pool() is not stuck
+
+
+def test_timeout_only_fails_the_runaway_document(pool):
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        # Another request's work, running and queued on the pool that is about to be killed.
+        others = [asyncio.ensure_future(sop.run_in_pool(_nap, 0.5)) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        with pytest.raises(sop.SopLimitError):
+            await sop._run_all([sop._in_pool(time.sleep, 30)], loop.time() + 0.3)
+        return await asyncio.gather(*others)
+
+    assert asyncio.run(scenario()) == ['done'] * 3
+
+
+def test_unreadable_pdf_extracts_no_text(pool, tmp_path):
+    path = tmp_path / 'broken.pdf'
+    path.write_bytes(b'not a pdf')
+
+    assert asyncio.run(sop.extract_pdf_text(str(path))) == ''
+
+
+@pytest.mark.skipif(sop.resource is None, reason='RLIMIT_CPU is not available on this platform')
+def test_cpu_limit_restores_the_previous_soft_limit():
+    before = sop.resource.getrlimit(sop.resource.RLIMIT_CPU)
+    with sop._cpu_limit(60):
+        assert sop.resource.getrlimit(sop.resource.RLIMIT_CPU)[0] != before[0]
+    assert sop.resource.getrlimit(sop.resource.RLIMIT_CPU) == before
+
+
+def test_extracted_text_is_cached_by_content_hash(db, monkeypatch):
+    extracted = []
+
+    async def extract_pdf_text(path):
+        with open(path, 'rb') as fh:
+            extracted.append(fh.read())
+        return 'policy text' if extracted[-1] != b'%PDF blank' else ''
+
+    monkeypatch.setattr(sop, 'extract_pdf_text', extract_pdf_text)
+    monkeypatch.setattr(sop, '_texts', LRUCache(4))
+
+    def upload(data: bytes, name: str = 'sop.pdf') -> UploadFile:
+        return UploadFile(io.BytesIO(data), size=len(data), filename=name)
+
+    async def scenario():
+        first = await sop.read_sop_document(upload(b'%PDF one'))
+        renamed = await sop.read_sop_document(upload(b'%PDF one', 'copy.pdf'))
+        # A restarted process has an empty memory tier but still finds the text in Mongo.
+        sop._texts.clear()
+        restored = await sop.read_sop_document(upload(b'%PDF one'))
+        await sop.read_sop_document(upload(b'%PDF blank'))
+        await sop.read_sop_document(upload(b'%PDF blank'))
+        return first, renamed, restored, await db.sop_texts.count_documents({})
+
+    first, renamed, restored, stored = asyncio.run(scenario())
+    assert first.text == renamed.text == restored.text == 'policy text'
+    assert first.sha256 == restored.sha256
+    # Documents without text are not cached, so they are extracted every time.
+    assert extracted == [b'%PDF one', b'%PDF blank', b'%PDF blank']
+    assert stored == 1
@@ -0,0 +1,35 @@
+from app.services.sop_compaction import OMISSION_MARKER, compact_sop, estimate_tokens
+
+FILLER = 'Archive the signed form in the records room and update the shelf register. '
+RELEVANT = 'Match each vendor invoice against the purchase order before approval. '
+
+
+def test_short_text_is_kept_whole():
+    result = compact_sop('Step one.\nStep two.', 'steps', 1000)
+    assert result.text == 'Step one.\nStep two.'
+    assert result.sections_kept == result.sections_total == 1
+
+
+def test_long_text_without_newlines_keeps_relevant_sentences():
+    # PDF extraction often yields a whole document as one line.
+    text = FILLER * 400 + RELEVANT * 5 + FILLER * 400
+    result = compact_sop(text, 'vendor invoice purchase order approval', 500)
+
+    assert '\n' not in text
+    assert result.sections_total > 1
+    assert result.sections_kept > 0
+    assert result.compacted_tokens <= 500
+    assert 'vendor invoice' in result.text
+    assert result.text != OMISSION_MARKER
+
+
+def test_text_without_spaces_is_cut_into_windows():
+    result = compact_sop('x' * 40000, 'anything', 1000)
+    assert result.sections_kept > 0
+    assert estimate_tokens(result.text) <= 1000
+
+
+def test_budget_smaller_than_default_section_still_keeps_text():
+    result = compact_sop(RELEVANT * 50, 'vendor invoice', 40)
+    assert result.sections_kept > 0
+    assert result.compacted_tokens <= 40
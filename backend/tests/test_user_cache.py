@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.core import security
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.services import user_cache
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    monkeypatch.setattr(user_cache, '_tokens', LRUCache(8, settings.USER_CACHE_TTL_SECONDS))
+    monkeypatch.setattr(user_cache, '_users', LRUCache(8, settings.USER_CACHE_TTL_SECONDS))
+
+
+def test_user_document_is_cached_until_invalidated(db, caches):
+    oid = ObjectId()
+
+    async def scenario():
+        await db.users.insert_one({'_id': oid, 'email': 'a@example.com', 'plan': 'free'})
+        first = await user_cache.get_user(str(oid))
+        first['plan'] = 'edited by the caller'
+        await db.users.update_one({'_id': oid}, {'$set': {'plan': 'pro'}})
+        cached = await user_cache.get_user(str(oid))
+        user_cache.invalidate(oid)
+        fresh = await user_cache.get_user(str(oid))
+        missing = await user_cache.get_user(str(ObjectId()))
+        return cached, fresh, missing
+
+    cached, fresh, missing = asyncio.run(scenario())
+    # Callers get copies, and a write is only seen once the writer invalidates the entry.
+    assert cached == {'id': str(oid), 'email': 'a@example.com', 'plan': 'free'}
+    assert fresh['plan'] == 'pro'
+    assert missing is None
+
+
+def test_valid_tokens_are_decoded_once(caches, monkeypatch):
+    decoded = []
+
+    def decode_token(token):
+        decoded.append(token)
+        return security.decode_token(token)
+
+    monkeypatch.setattr(user_cache, 'decode_token', decode_token)
+    token = security.create_access_token('u1')
+
+    first = user_cache.decode_access_token(token)
+    second = user_cache.decode_access_token(token)
+    assert first == second and first['sub'] == 'u1'
+    assert user_cache.decode_access_token('not-a-token') is None
+    assert user_cache.decode_access_token('not-a-token') is None
+    # Only the valid token is cached, and under its hash rather than the token itself.
+    assert decoded == [token, 'not-a-token', 'not-a-token']
+    assert token not in user_cache._tokens
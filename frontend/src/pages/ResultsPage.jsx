@@ -8,7 +8,7 @@ const fields = ['automation_feasibility_score','business_benefit_score','fitment
 export default function ResultsPage() {
   const { id } = useParams();
   const [data, setData] = useState(null);
-  useEffect(() => { api.get(`/api/evaluations/${id}`).then((r) => setData(r.data)); }, [id]);
+  useEffect(() => { api.get(`/api/evaluations/${id}?include=raw`).then((r) => setData(r.data)); }, [id]);
   const content = data?.parsed_content || {};
   return <div><TopNav/><main className='page'><h1>Evaluation results: {data?.process_name}</h1>
     <div className='stats'>{fields.map((f)=><div className='card' key={f}><h3>{f}</h3><p>{typeof content[f] === 'object' ? JSON.stringify(content[f]) : String(content[f] ?? 'N/A')}</p></div>)}</div>